@@ -0,0 +1,127 @@
+"""
+Background activity-log writer. Requests enqueue and return immediately; a
+worker thread inserts the rows in batches, one transaction per batch.
+"""
+import logging
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+INSERT = "INSERT INTO activities (user_id, message, created_at) VALUES (?, ?, ?)"
+
+
+class ActivityWriter:
+
+    def __init__(self, writer, batch_size=200, flush_interval=0.25, max_queue=10000, on_write=None):
+        self.writer = writer  # storage.SerializedWriter
+        self.on_write = on_write  # called with no arguments after each committed batch
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._closed = False
+
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+
+    def log(self, user_id, message):
+        """Queue one activity row. Returns False if it was dropped because the queue is full."""
+        if self._closed:
+            raise RuntimeError("activity writer is closed")
+        self._ensure_started()
+        # Stamp now, not at insert time, so the row keeps the time the action happened
+        row = (user_id, message, time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime()))
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            with self._stats_lock:
+                self.dropped += 1
+            logger.warning("Activity queue full, dropped: %r", message)
+            return False
+        with self._stats_lock:
+            self.enqueued += 1
+        return True
+
+    def _ensure_started(self):
+        # Also restarts the thread in a forked child, where it doesn't exist
+        if self._thread is None or not self._thread.is_alive():
+            with self._start_lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name="activity-writer", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while True:
+            row = self._queue.get()
+            if row is None:
+                self._queue.task_done()
+                return
+            batch = [row]
+            stop = False
+            deadline = time.monotonic() + self.flush_interval
+            # Keep collecting until the batch is full or flush_interval has passed
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    row = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if row is None:
+                    stop = True
+                    break
+                batch.append(row)
+            self._write(batch)
+            for _ in range(len(batch) + stop):
+                self._queue.task_done()
+            if stop:
+                return
+
+    def _write(self, batch):
+        try:
+            with self.writer.transaction() as cur:
+                cur.executemany(INSERT, batch)
+        except Exception as e:
+            with self._stats_lock:
+                self.failed += len(batch)
+            logger.error("Could not write %d activity rows: %s", len(batch), e)
+            return
+        with self._stats_lock:
+            self.written += len(batch)
+            self.batches += 1
+        if self.on_write is not None:
+            self.on_write()
+
+    def flush(self):
+        """Block until everything queued so far is written (or has failed)."""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.join()
+
+    def close(self):
+        """Write what is queued, then stop the thread. Called at shutdown."""
+        if self._closed:
+            return
+        self._closed = True
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "queued": self._queue.qsize(),
+                "enqueued": self.enqueued,
+                "written": self.written,
+                "dropped": self.dropped,
+                "failed": self.failed,
+                "batches": self.batches,
+            }
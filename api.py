@@ -0,0 +1,64 @@
+"""
+JSON API helpers: field selection, id batches, and response bodies put together
+from JSON that SQLite already built per row (no dict per row), gzipped when it pays.
+"""
+import gzip
+import json
+
+# Columns each resource may return, in their default order. users.password never leaves the database.
+FIELDS = {
+    "suggestions": ("id", "user_id", "fullname", "email", "sdg_category", "title", "description", "status",
+                    "created_at", "duplicate_of", "similarity"),
+    "users": ("id", "fullname", "email", "role", "created_at"),
+    "activities": ("id", "user_id", "message", "created_at"),
+}
+
+
+def parse_fields(requested, resource):
+    """?fields=id,title -> ("id", "title"); all fields when empty. ValueError for unknown names."""
+    allowed = FIELDS[resource]
+    if not requested:
+        return allowed
+    fields = tuple(dict.fromkeys(name.strip() for name in requested.split(",") if name.strip()))
+    unknown = [name for name in fields if name not in allowed]
+    if unknown or not fields:
+        raise ValueError(f"unknown fields for {resource}: {', '.join(unknown) or requested}")
+    return fields
+
+
+def parse_ids(requested, maximum):
+    """?ids=3,1,2 -> [3, 1, 2], duplicates dropped. ValueError past `maximum` or for non-integers."""
+    try:
+        ids = list(dict.fromkeys(int(value) for value in requested.split(",") if value.strip()))
+    except ValueError:
+        raise ValueError("ids must be comma-separated integers")
+    if len(ids) > maximum:
+        raise ValueError(f"at most {maximum} ids per request")
+    return ids
+
+
+def json_object(fields, table=""):
+    """
+    SQL for one column holding the row as JSON text: SQLite builds the object in C,
+    so no per-row dict or per-value encoding happens in Python. Names come from
+    FIELDS, never from the request as typed.
+    """
+    prefix = f"{table}." if table else ""
+    return "json_object(" + ", ".join(f"'{name}', {prefix}\"{name}\"" for name in fields) + ")"
+
+
+def body(rows, **extra):
+    """{"data": [...], **extra} as text, from rows whose first column came from json_object()."""
+    parts = ['{"data":[', ",".join(row[0] for row in rows), "]"]
+    for key, value in extra.items():
+        parts.append(f",{json.dumps(key)}:{json.dumps(value)}")
+    parts.append("}")
+    return "".join(parts)
+
+
+def compress(text, accepts_gzip, min_size=1024, level=6):
+    """(bytes, "gzip" or None): gzip only if the client takes it and the body is big enough to gain."""
+    data = text.encode()
+    if accepts_gzip and len(data) >= min_size:
+        return gzip.compress(data, compresslevel=level, mtime=0), "gzip"
+    return data, None
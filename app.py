@@ -1,58 +1,628 @@
-from flask import Flask, render_template, request, redirect, session
+from flask import Flask, render_template, request, redirect, session, g, has_app_context, jsonify, Response
+import atexit
+from contextlib import contextmanager
+import functools
+import io
+import itertools
+import json
+import os
 import sqlite3
+import tempfile
+import threading
+
+import activity_log
+import api
+import counters
+import directory
+import duplicates
+import feed
+import instrumentation
+import metrics
+import migrations
+import moderation
+import pagination
+import passwords
+import ratelimit
+import retention
+import rollups
+import search
+import sessions
+import storage
+import transfer
+import versions
 
 app = Flask(__name__)
 app.secret_key = "supersecret123"   # change this
 
+app.config.update(
+    # A file, a "file:" URI, or ":memory:" for a private in-memory database (see create_app)
+    DATABASE=os.environ.get("DATABASE", "database.db"),
+    DATABASE_TEMPLATE=None,  # a database to copy into DATABASE when create_app() sets it up
+    DB_POOL_SIZE=8,
+    DB_POOL_TIMEOUT=5.0,
+    # "default" (rollback journal) or "wal" for several worker processes sharing database.db
+    STORAGE_MODE=os.environ.get("STORAGE_MODE", "default"),
+    SQLITE_PRAGMAS={},  # overrides on top of the storage mode's PRAGMAs
+    SQLITE_CACHED_STATEMENTS=256,
+    DB_WRITE_RETRIES=6,
+    DB_WRITE_BACKOFF=0.02,
+    PAGE_SIZE=25,       # rows per page on /suggestions and /manage (?limit= overrides)
+    MAX_PAGE_SIZE=200,
+    COUNTER_CACHE_TTL=5.0,  # seconds; only for counts read without a data version (see cached_counts)
+    ACTIVITY_BATCH_SIZE=200,
+    ACTIVITY_FLUSH_INTERVAL=0.25,  # seconds a queued activity may wait for its batch to fill
+    ACTIVITY_QUEUE_SIZE=10000,     # beyond this, activities are dropped (and counted)
+    DUPLICATE_THRESHOLD=0.5,  # estimated Jaccard similarity at which a new suggestion is flagged
+    IMPORT_CHUNK_SIZE=1000,   # rows per transaction when importing
+    EXPORT_CHUNK_ROWS=1000,   # rows per streamed chunk when exporting
+    PASSWORD_HASH_WORKERS=None,     # scrypt worker processes; None = one per core, 0 = hash in the request thread
+    PASSWORD_HASH_MAX_PENDING=64,   # hashes queued or running before new logins wait
+    PASSWORD_HASH_TIMEOUT=10.0,     # seconds a login waits for a slot/result
+    SESSION_CACHE_SIZE=10000,       # sessions kept in memory per process (LRU)
+    SESSION_CACHE_TTL=5.0,          # seconds; bounds how long another worker's role change can go unseen
+    SESSION_SWEEP_INTERVAL=300.0,   # seconds between deletes of expired sessions
+    FEED_POLL_INTERVAL=1.0,    # seconds; how soon the live feed sees other workers' activities
+    FEED_BUFFER_SIZE=1000,     # recent activities kept in memory for subscribers resuming
+    FEED_HEARTBEAT=15.0,       # seconds between keepalive comments on an idle stream
+    FEED_MAX_SUBSCRIBERS=500,  # open streams per process; more get a 503
+    ACTIVITY_RETENTION_DAYS=180,   # older activities move to the archive; None keeps everything in the table
+    ARCHIVE_DIR=None,              # default: "<database name>-archive" next to the database file
+    ARCHIVE_BATCH_SIZE=5000,       # rows per archiving transaction
+    ARCHIVE_INTERVAL=3600.0,       # seconds between archiving runs (in the activity writer thread)
+    ARCHIVE_VACUUM_PAGES=2000,     # free pages returned per run, if auto_vacuum is INCREMENTAL
+    DATA_VERSION_CHECK_INTERVAL=0.5,  # seconds; how soon ETags and counts notice other workers' writes
+    PAGE_CACHE=True,       # ETags, 304s and rendered-page reuse on /dashboard, /manage, /suggestions
+    PAGE_CACHE_SIZE=256,   # rendered pages kept per process
+    API_GZIP_MIN_SIZE=1024,  # bytes; smaller JSON responses aren't worth compressing
+    API_GZIP_LEVEL=6,
+    # The ASGI variant (asgi.py): threads running views and database calls, and how many may queue
+    ASYNC_DB_THREADS=8,
+    ASYNC_DB_MAX_PENDING=64,   # calls queued or running; more wait for a slot...
+    ASYNC_DB_TIMEOUT=1.0,      # ...this many seconds, then get a 503
+    ASYNC_MAX_BODY=16 * 1024 * 1024,  # bytes of request body read before a 413
+    # Sliding-window rate limits (ratelimit.py), name -> (requests, seconds); past one, a 429 with
+    # Retry-After. A name left out or set to None isn't limited.
+    RATE_LIMITS={
+        "login_ip": (20, 60),          # login attempts per client IP
+        "login_account": (10, 900),    # failed logins per email, from any IP
+        "register_ip": (5, 3600),      # registration attempts per client IP
+        "submit_account": (20, 600),   # suggestions per user
+        "submit_ip": (60, 600),        # suggestions per client IP, whatever the account
+    },
+    # "shared": one table for all serve workers, made before they fork; "memory": per process
+    RATE_LIMIT_BACKEND="shared",
+    RATE_LIMIT_SLOTS=65536,  # keys tracked at once
+    # Per-request query/render profiling (X-Query-Count, Server-Timing, log line); set before the first request
+    INSTRUMENTATION=os.environ.get("INSTRUMENTATION") == "1",
+    SLOW_QUERY_MS=100,  # statements at least this slow go to the "instrumentation.slow" log
+    METRICS=True,       # request counters/histograms for /metrics
+    METRICS_TOKEN=os.environ.get("METRICS_TOKEN"),  # if set, /metrics needs "Authorization: Bearer <token>"
+)
+
+instrumentation.init_app(app)
+metrics.init_app(app)
+
+# What create_app() starts from
+_DEFAULT_CONFIG = dict(app.config)
+
+_storage_lock = threading.Lock()
+_memory_databases = itertools.count(1)
+
+
+def get_pragmas():
+    return {**storage.STORAGE_MODES[app.config["STORAGE_MODE"]], **app.config["SQLITE_PRAGMAS"]}
+
+
+def get_pool():
+    pool = app.extensions.get("sqlite_pool")
+    if pool is None:
+        with _storage_lock:
+            pool = app.extensions.get("sqlite_pool")
+            if pool is None:
+                ensure_schema()
+                pool = storage.ConnectionPool(
+                    app.config["DATABASE"],
+                    size=app.config["DB_POOL_SIZE"],
+                    timeout=app.config["DB_POOL_TIMEOUT"],
+                    pragmas=get_pragmas(),
+                    cached_statements=app.config["SQLITE_CACHED_STATEMENTS"],
+                    factory=instrumentation.connection_factory(app),
+                )
+                app.extensions["sqlite_pool"] = pool
+    return pool
+
+
+def get_writer():
+    writer = app.extensions.get("sqlite_writer")
+    if writer is None:
+        with _storage_lock:
+            writer = app.extensions.get("sqlite_writer")
+            if writer is None:
+                ensure_schema()
+                writer = storage.SerializedWriter(
+                    app.config["DATABASE"],
+                    pragmas=get_pragmas(),
+                    retries=app.config["DB_WRITE_RETRIES"],
+                    backoff=app.config["DB_WRITE_BACKOFF"],
+                    cached_statements=app.config["SQLITE_CACHED_STATEMENTS"],
+                    factory=instrumentation.connection_factory(app),
+                    on_commit=invalidate_versions,
+                )
+                app.extensions["sqlite_writer"] = writer
+    return writer
+
+
+def get_versions():
+    data_versions = app.extensions.get("data_versions")
+    if data_versions is None:
+        with _storage_lock:
+            data_versions = app.extensions.get("data_versions")
+            if data_versions is None:
+                ensure_schema()
+                data_versions = versions.DataVersions(
+                    lambda: storage.connect(app.config["DATABASE"], get_pragmas(), isolation_level=None),
+                    check_interval=app.config["DATA_VERSION_CHECK_INTERVAL"],
+                )
+                app.extensions["data_versions"] = data_versions
+    return data_versions
+
+
+def invalidate_versions():
+    # After every commit of this process's writer, so our own writes show up immediately
+    data_versions = app.extensions.get("data_versions")
+    if data_versions is not None:
+        data_versions.invalidate()
+
+
+def get_page_cache():
+    cache = app.extensions.get("page_cache")
+    if cache is None:
+        with _storage_lock:
+            cache = app.extensions.get("page_cache")
+            if cache is None:
+                cache = versions.PageCache(size=app.config["PAGE_CACHE_SIZE"])
+                app.extensions["page_cache"] = cache
+    return cache
+
+
+def get_directory():
+    user_directory = app.extensions.get("user_directory")
+    if user_directory is None:
+        with _storage_lock:
+            user_directory = app.extensions.get("user_directory")
+            if user_directory is None:
+                user_directory = directory.UserDirectory()
+                app.extensions["user_directory"] = user_directory
+    return user_directory
+
+
+def get_counters():
+    cache = app.extensions.get("counter_cache")
+    if cache is None:
+        with _storage_lock:
+            cache = app.extensions.get("counter_cache")
+            if cache is None:
+                cache = counters.CounterCache(ttl=app.config["COUNTER_CACHE_TTL"])
+                app.extensions["counter_cache"] = cache
+    return cache
+
+
+def get_activity_writer():
+    writer = app.extensions.get("activity_writer")
+    if writer is None:
+        database_writer = get_writer()
+        with _storage_lock:
+            writer = app.extensions.get("activity_writer")
+            if writer is None:
+                writer = activity_log.ActivityWriter(
+                    database_writer,
+                    batch_size=app.config["ACTIVITY_BATCH_SIZE"],
+                    flush_interval=app.config["ACTIVITY_FLUSH_INTERVAL"],
+                    max_queue=app.config["ACTIVITY_QUEUE_SIZE"],
+                    on_write=after_activity_write,
+                )
+                # Write whatever is still queued when the process exits
+                atexit.register(writer.close)
+                app.extensions["activity_writer"] = writer
+    return writer
+
+
+def get_hasher():
+    hasher = app.extensions.get("password_hasher")
+    if hasher is None:
+        with _storage_lock:
+            hasher = app.extensions.get("password_hasher")
+            if hasher is None:
+                hasher = passwords.Hasher(
+                    workers=app.config["PASSWORD_HASH_WORKERS"],
+                    max_pending=app.config["PASSWORD_HASH_MAX_PENDING"],
+                    timeout=app.config["PASSWORD_HASH_TIMEOUT"],
+                )
+                atexit.register(hasher.close)
+                app.extensions["password_hasher"] = hasher
+    return hasher
+
+
+def get_limiter():
+    limiter = app.extensions.get("rate_limiter")
+    if limiter is None:
+        with _storage_lock:
+            limiter = app.extensions.get("rate_limiter")
+            if limiter is None:
+                if app.config["RATE_LIMIT_BACKEND"] == "shared":
+                    slots = ratelimit.SharedCounters(size=app.config["RATE_LIMIT_SLOTS"])
+                else:
+                    slots = ratelimit.MemoryCounters(size=app.config["RATE_LIMIT_SLOTS"])
+                limiter = ratelimit.RateLimiter(app.config["RATE_LIMITS"], slots)
+                app.extensions["rate_limiter"] = limiter
+    return limiter
+
+
+def too_many_requests(retry_after, template=None):
+    # The 429 for a client over a rate limit: the form again with an error, or plain text
+    headers = {"Retry-After": str(retry_after)}
+    if template:
+        return (render_template(template, error=f"Too many attempts. Please try again in {retry_after} seconds."),
+                429, headers)
+    return Response("too many requests\n", status=429, mimetype="text/plain", headers=headers)
+
+
+def get_feed():
+    activity_feed = app.extensions.get("activity_feed")
+    if activity_feed is None:
+        with _storage_lock:
+            activity_feed = app.extensions.get("activity_feed")
+            if activity_feed is None:
+                activity_feed = feed.ActivityFeed(
+                    pooled_connection,
+                    poll_interval=app.config["FEED_POLL_INTERVAL"],
+                    buffer_size=app.config["FEED_BUFFER_SIZE"],
+                    max_subscribers=app.config["FEED_MAX_SUBSCRIBERS"],
+                )
+                app.extensions["activity_feed"] = activity_feed
+    return activity_feed
+
+
+def get_archive_dir():
+    return app.config["ARCHIVE_DIR"] or os.path.splitext(app.config["DATABASE"])[0] + "-archive"
+
+
+def get_archiver():
+    archiver = app.extensions.get("activity_archiver")
+    if archiver is None:
+        database_writer = get_writer()
+        with _storage_lock:
+            archiver = app.extensions.get("activity_archiver")
+            if archiver is None:
+                archiver = retention.Archiver(
+                    database_writer,
+                    get_archive_dir(),
+                    days=app.config["ACTIVITY_RETENTION_DAYS"],
+                    batch_size=app.config["ARCHIVE_BATCH_SIZE"],
+                    interval=app.config["ARCHIVE_INTERVAL"],
+                    vacuum_pages=app.config["ARCHIVE_VACUUM_PAGES"],
+                )
+                app.extensions["activity_archiver"] = archiver
+    return archiver
+
+
+def after_activity_write():
+    # Runs in the activity writer thread after each committed batch, never in a request
+    activity_feed = app.extensions.get("activity_feed")
+    if activity_feed is not None:
+        activity_feed.notify()
+    get_archiver().maybe_run()
+
+
+@contextmanager
+def pooled_connection():
+    # A read connection for code that runs outside the request's own get_db()
+    pool = get_pool()
+    con = pool.acquire()
+    try:
+        yield con
+    finally:
+        pool.release(con)
+
+
+def get_sessions():
+    store = app.extensions.get("session_store")
+    if store is None:
+        database_writer = get_writer()
+        with _storage_lock:
+            store = app.extensions.get("session_store")
+            if store is None:
+                store = sessions.SessionStore(
+                    database_writer,
+                    pooled_connection,
+                    lifetime=app.permanent_session_lifetime.total_seconds(),
+                    cache_size=app.config["SESSION_CACHE_SIZE"],
+                    cache_ttl=app.config["SESSION_CACHE_TTL"],
+                    sweep_interval=app.config["SESSION_SWEEP_INTERVAL"],
+                )
+                app.extensions["session_store"] = store
+    return store
+
+
+# The cookie carries only a session id; user, role etc. are looked up server-side
+app.session_interface = sessions.SqliteSessionInterface(get_sessions)
+
+
 def get_db():
-    return sqlite3.connect("database.db")
+    if not has_app_context():
+        # Standalone scripts (tests, maintenance) get a private connection they close themselves
+        return storage.connect(app.config["DATABASE"], get_pragmas(),
+                               cached_statements=app.config["SQLITE_CACHED_STATEMENTS"])
 
+    # One pooled connection per app context, given back in release_db()
+    if "db" not in g:
+        g.db = get_pool().acquire()
+    return g.db
 
-def init_db():
-    # Create activities table if not exists
-    con = get_db()
-    cur = con.cursor()
-    cur.execute('''
-        CREATE TABLE IF NOT EXISTS activities (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER,
-            message TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    cur.execute('''
-        CREATE TABLE IF NOT EXISTS suggestions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            fullname TEXT NOT NULL,
-            email TEXT NOT NULL,
-            sdg_category TEXT NOT NULL,
-            title TEXT NOT NULL,
-            description TEXT NOT NULL,
-            status TEXT DEFAULT 'pending',
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY(user_id) REFERENCES users(id)
-        )
-    ''')
-    con.commit()
-    con.close()
 
+@app.teardown_appcontext
+def release_db(exc=None):
+    con = g.pop("db", None)
+    if con is not None:
+        get_pool().release(con)
 
-def log_activity(user_id, message):
+
+def init_db():
+    # Bring the schema up to date (tables, then indexes); returns applied versions
+    # Own connection, never the pooled one on g: it is closed below
+    con = storage.connect(app.config["DATABASE"], get_pragmas(),
+                          cached_statements=app.config["SQLITE_CACHED_STATEMENTS"],
+                          isolation_level=None)
     try:
-        con = get_db()
-        cur = con.cursor()
-        cur.execute("INSERT INTO activities (user_id, message) VALUES (?, ?)", (user_id, message))
-        con.commit()
+        return migrations.migrate(con)
+    finally:
         con.close()
-    except Exception:
-        # Swallow logging errors so they don't crash the app
-        pass
+
+
+def ensure_schema():
+    # Run migrations once per process, before the first pooled connection or write
+    if not app.extensions.get("sqlite_schema_ready"):
+        init_db()
+        app.extensions["sqlite_schema_ready"] = True
+
+
+# Per-process resources created lazily in app.extensions, in shutdown order. The in-memory
+# database's anchor connection goes last: the database disappears with it.
+RESOURCES = ("db_executor", "activity_feed", "activity_writer", "activity_archiver", "sqlite_pool", "sqlite_writer",
+             "sqlite_schema_ready", "counter_cache", "password_hasher", "session_store", "data_versions",
+             "page_cache", "user_directory", "rate_limiter", "memory_database")
+
+
+# The resources that hold connections, threads or processes: none of them survives a fork(). The
+# rate limiter's shared memory does, and must: it is how the workers share their counts.
+CONNECTED = ("db_executor", "activity_feed", "activity_writer", "activity_archiver", "sqlite_pool", "sqlite_writer",
+             "password_hasher", "session_store", "data_versions")
+
+
+def close_resources(names=RESOURCES):
+    for name in names:
+        resource = app.extensions.pop(name, None)
+        if hasattr(resource, "close"):
+            resource.close()
+
+
+def warm_up():
+    # What every process would otherwise do on its first requests. The serve master runs this
+    # before forking, then close_resources(CONNECTED): the workers inherit the warm caches and
+    # compiled templates, but open their own connections.
+    ensure_schema()
+    con = get_pool().acquire()
+    try:
+        for group in counters.TABLES:
+            cached_counts(con, group)
+        current_users(con)
+    finally:
+        get_pool().release(con)
+    try:
+        templates = app.jinja_env.list_templates()
+    except TypeError:
+        templates = []  # the loader can't list them: they compile on first use instead
+    for name in templates:
+        app.jinja_env.get_template(name)
+    passwords.dummy_hash()
+    get_limiter()
+
+
+def create_app(config=None):
+    # Configure this process's app: defaults, then `config`. Routes, threads and scripts reach the
+    # app through this module, so there is one per process; calling this again closes whatever the
+    # previous configuration opened and starts over (each test, each worker process).
+    close_resources()
+    app.config.clear()
+    app.config.update(_DEFAULT_CONFIG)
+    app.config.update(config or {})
+    app.extensions["metrics"].clear()
+
+    if app.config["DATABASE"] == ":memory:":
+        app.config["DATABASE"] = storage.memory_uri(f"app-{os.getpid()}-{next(_memory_databases)}")
+        if app.config["ARCHIVE_DIR"] is None:
+            app.config["ARCHIVE_DIR"] = tempfile.mkdtemp(prefix="archive-")
+    database = app.config["DATABASE"]
+    template = app.config["DATABASE_TEMPLATE"]
+    if storage.is_memory(database) or template:
+        con = storage.connect(database, isolation_level=None)
+        if template:
+            # A migrated snapshot: copying its pages takes milliseconds, migrating from scratch much longer
+            storage.copy_database(template, con)
+        if storage.is_memory(database):
+            app.extensions["memory_database"] = con
+        else:
+            con.close()
+    return app
+
+
+@app.extensions["metrics"].collector
+def storage_metrics():
+    # Read at scrape time from whatever this process has created so far
+    samples = []
+    pool = app.extensions.get("sqlite_pool")
+    if pool is not None:
+        stats = pool.stats()
+        samples += [
+            ("db_pool_connections", "gauge", "Pooled SQLite connections by state", ("state",),
+             {("in_use",): stats["in_use"], ("idle",): stats["idle"]}),
+            ("db_pool_size", "gauge", "Maximum pooled connections", (), {(): stats["size"]}),
+            ("db_pool_waits_total", "counter", "Acquires that had to wait for a connection", (), {(): stats["waits"]}),
+            ("db_pool_timeouts_total", "counter", "Acquires that gave up waiting", (), {(): stats["timeouts"]}),
+        ]
+    writer = app.extensions.get("sqlite_writer")
+    if writer is not None:
+        stats = writer.stats()
+        samples += [
+            ("db_write_transactions_total", "counter", "Committed write transactions", (), {(): stats["transactions"]}),
+            ("db_write_retries_total", "counter", "Retries after SQLITE_BUSY", (), {(): stats["retried"]}),
+            ("db_write_failures_total", "counter", "Write transactions that failed", (), {(): stats["failures"]}),
+        ]
+    activity = app.extensions.get("activity_writer")
+    if activity is not None:
+        stats = activity.stats()
+        samples += [
+            ("activity_queue_length", "gauge", "Activity rows waiting to be written", (), {(): stats["queued"]}),
+            ("activity_rows_total", "counter", "Activity rows by outcome", ("outcome",),
+             {("written",): stats["written"], ("dropped",): stats["dropped"], ("failed",): stats["failed"]}),
+        ]
+    for name, cache in (("counters", app.extensions.get("counter_cache")),
+                        ("sessions", app.extensions.get("session_store")),
+                        ("users", app.extensions.get("user_directory"))):
+        if cache is not None:
+            stats = cache.stats()
+            samples.append((f"{name}_cache_lookups_total", "counter", f"{name.capitalize()} cache lookups",
+                            ("result",), {("hit",): stats["hits"], ("miss",): stats["misses"]}))
+    activity_feed = app.extensions.get("activity_feed")
+    if activity_feed is not None:
+        stats = activity_feed.stats()
+        samples += [
+            ("feed_subscribers", "gauge", "Open live activity streams", (), {(): stats["subscribers"]}),
+            ("feed_events_total", "counter", "Activities published to the live feed", (), {(): stats["published"]}),
+            ("feed_refused_total", "counter", "Streams refused at the subscriber limit", (), {(): stats["refused"]}),
+        ]
+    page_cache = app.extensions.get("page_cache")
+    if page_cache is not None:
+        stats = page_cache.stats()
+        samples.append(("page_cache_lookups_total", "counter", "Rendered-page cache lookups", ("result",),
+                        {("hit",): stats["hits"], ("miss",): stats["misses"]}))
+    archiver = app.extensions.get("activity_archiver")
+    if archiver is not None:
+        stats = archiver.stats()
+        samples += [
+            ("activities_archived_total", "counter", "Activities moved to the archive", (), {(): stats["archived"]}),
+            ("archive_run_seconds", "gauge", "Duration of the last archiving run", (),
+             {(): stats["last_duration"]}),
+        ]
+    executor = app.extensions.get("db_executor")
+    if executor is not None:
+        stats = executor.stats()
+        samples += [
+            ("db_executor_pending", "gauge", "Calls queued or running on the ASGI database threads", (),
+             {(): stats["pending"]}),
+            ("db_executor_calls_total", "counter", "Calls run on the ASGI database threads", (), {(): stats["calls"]}),
+            ("db_executor_saturated_total", "counter", "Requests refused because the database threads were busy",
+             (), {(): stats["saturated"]}),
+        ]
+    limiter = app.extensions.get("rate_limiter")
+    if limiter is not None:
+        stats = limiter.stats()
+        samples += [
+            ("rate_limit_refused_total", "counter", "Requests refused with a 429, by limit", ("limit",),
+             {(name,): count for name, count in stats["refused"].items()}),
+            ("rate_limit_evictions_total", "counter", "Rate limit counts dropped to make room for other keys", (),
+             {(): stats["evictions"]}),
+        ]
+    hasher = app.extensions.get("password_hasher")
+    if hasher is not None:
+        stats = hasher.stats()
+        samples += [
+            ("password_hashes_total", "counter", "Password hashes and verifications run", (), {(): stats["calls"]}),
+            ("password_hash_seconds_total", "counter", "Time spent waiting for password hashes", (),
+             {(): stats["kdf_time"]}),
+            ("password_hash_busy_total", "counter", "Logins refused because the hash pool was full", (),
+             {(): stats["busy"]}),
+        ]
+    return samples
+
+
+def handled_error(e):
+    # Routes turn failures into an error page or redirect: keep them visible in the log and /metrics
+    g.handled_error = True
+    app.logger.error("Handled error in %s: %s", request.endpoint, e, exc_info=e)
+    metrics.handled_error(app, e)
+
+
+def log_activity(user_id, message):
+    # Queued for the background writer, so the request doesn't wait for the commit.
+    # Drops and failed batches are logged and counted in get_activity_writer().stats().
+    get_activity_writer().log(user_id, message)
 
 def get_initials(fullname):
-    parts = fullname.split()
-    initials = "".join([p[0] for p in parts])
-    return initials.upper()[:2]
+    return directory.initials(fullname)
+
+
+def cached_counts(con, group):
+    # Reloaded when the counted table's data version moves, so other workers' writes show up too
+    return get_counters().get(con, group, version=get_versions().current()[counters.TABLES[group]])
+
+
+def current_users(con):
+    # The user directory, reloaded when the users table's data version moves (other workers' writes)
+    return get_directory().get(con, get_versions().current()["users"])
+
+
+def with_current_authors(con, rows):
+    # Suggestions keep the name their author had when submitting; show the one they have now
+    users = current_users(con)
+    return [{**dict(row), "fullname": users.name(row["user_id"], row["fullname"])} for row in rows]
+
+
+def _code_version():
+    # Changes when code or templates are deployed, so browsers drop pages rendered by the old ones
+    template_dir = os.path.join(app.root_path, app.template_folder)
+    paths = [__file__] + [os.path.join(root, name) for root, _, names in os.walk(template_dir) for name in names]
+    return max(os.path.getmtime(path) for path in paths)
+
+
+CODE_VERSION = _code_version()
+
+
+def conditional_page(*tables):
+    # For signed-in GET pages that only change when `tables` do. The strong ETag covers the
+    # tables' data versions, the URL and who is viewing (the layout shows their name), so a
+    # matching If-None-Match gets a 304 before the view runs: no queries, no template.
+    # Otherwise a page rendered earlier for the same ETag is sent again.
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if not session.get("user_id") or not app.config["PAGE_CACHE"]:
+                return view(*args, **kwargs)
+
+            current = get_versions().current()
+            viewer = tuple(session.get(k) for k in ("user_id", "role", "fullname", "avatar", "email"))
+            key = (request.endpoint, request.query_string, viewer)
+            tag = versions.etag(key, [current[t] for t in tables], CODE_VERSION)
+
+            if request.if_none_match.contains(tag):
+                response = Response(status=304)
+            else:
+                cache = get_page_cache()
+                page = cache.get(key, tag)
+                if page is not None:
+                    response = Response(page[1], mimetype=page[2])
+                else:
+                    response = app.make_response(view(*args, **kwargs))
+                    # Redirects and error pages (the view caught an exception) are neither cached nor tagged
+                    if response.status_code != 200 or g.get("handled_error"):
+                        return response
+                    cache.put(key, tag, response.get_data(), response.mimetype)
+            response.set_etag(tag)
+            response.headers["Cache-Control"] = "private, no-cache"
+            response.vary.add("Cookie")
+            return response
+        return wrapper
+    return decorator
 
 @app.route("/login", methods=["GET", "POST"])
 def login():
@@ -60,15 +630,40 @@ def login():
         email = request.form.get("email")
         password = request.form.get("password")
 
+        # Before the query and the hash: a refused attempt costs no KDF work
+        limiter = get_limiter()
+        retry_after = limiter.acquire("login_ip", request.remote_addr) or limiter.check("login_account", email)
+        if retry_after:
+            return too_many_requests(retry_after, "login.html")
+
         try:
             con = get_db()
-            con.row_factory = sqlite3.Row
-            cur = con.cursor()
-            cur.execute("SELECT id, fullname, role, password FROM users WHERE email = ?", (email,))
-            user = cur.fetchone()
-            con.close()
-
-            if user and password == user[3]:  # You will replace with hashed password later
+            # Id, name and role from the directory, the hash by primary key: it is never in the directory.
+            # An email the directory doesn't know may be an account another worker just created: ask the table.
+            known = current_users(con).find(email)
+            if known is not None:
+                stored = con.execute("SELECT password FROM users WHERE id = ?", (known.id,)).fetchone()
+                user = (known.id, known.fullname, known.role, stored[0]) if stored else None
+            else:
+                user = con.execute("SELECT id, fullname, role, password FROM users WHERE email = ?",
+                                   (email,)).fetchone()
+            # The hash takes far longer than the query: give the connection back to the pool meanwhile
+            release_db()
+
+            # Unknown emails are checked against a dummy hash, so they take as long as a wrong password
+            matches, needs_rehash = get_hasher().verify(password, user[3] if user else passwords.dummy_hash())
+
+            if user and matches:
+                if needs_rehash:
+                    # Plaintext (pre-hashing) row or old parameters: store a fresh hash now that we know the password.
+                    # "AND password = ?" so a concurrent password change isn't overwritten.
+                    new_hash = get_hasher().hash(password)
+                    with get_writer().transaction() as wcur:
+                        wcur.execute("UPDATE users SET password = ? WHERE id = ? AND password = ?",
+                                     (new_hash, user[0], user[3]))
+
+                # Fresh session id at login, so an id planted before it is worthless
+                session.regenerate()
                 session["user_id"] = user[0]
                 session["fullname"] = user[1]
                 session["role"] = user[2]
@@ -77,10 +672,18 @@ def login():
 
                 return redirect("/")
 
+            # Only failures count against the account, so logging in often is never throttled
+            limiter.add("login_account", email)
             return render_template("login.html", error="Invalid email or password")
+        except passwords.HasherBusy as e:
+            handled_error(e)
+            return (render_template("login.html", error="The server is busy. Please try again in a moment."),
+                    503, {"Retry-After": "1"})
         except sqlite3.OperationalError as e:
+            handled_error(e)
             return render_template("login.html", error="Database error. Please try again later.")
         except Exception as e:
+            handled_error(e)
             return render_template("login.html", error="An error occurred. Please try again.")
 
     return render_template("login.html")
@@ -99,6 +702,10 @@ def register():
         password = request.form.get("password")
         confirm_password = request.form.get("confirm_password")
 
+        retry_after = get_limiter().acquire("register_ip", request.remote_addr)
+        if retry_after:
+            return too_many_requests(retry_after, "register.html")
+
         if password != confirm_password:
             return render_template("register.html", error="Passwords do not match")
 
@@ -110,22 +717,24 @@ def register():
             requested_role = request.form.get("role", "user")
             role = requested_role if session.get("role") == "admin" else "user"
 
-            con = get_db()
-            cur = con.cursor()
-            
-            # Check if email already exists
-            cur.execute("SELECT id FROM users WHERE email = ?", (email,))
-            if cur.fetchone():
-                con.close()
+            # Hash before taking the write lock: it is the slow part
+            password_hash = get_hasher().hash(password)
+            new_user_id = None
+            with get_writer().transaction() as cur:
+                # Check if email already exists
+                cur.execute("SELECT id FROM users WHERE email = ?", (email,))
+                if not cur.fetchone():
+                    # Insert new user
+                    cur.execute("INSERT INTO users (fullname, email, password, role) VALUES (?, ?, ?, ?)",
+                               (fullname, email, password_hash, role))
+                    # get the new user's id for logging
+                    new_user_id = cur.lastrowid
+
+            # Render outside the transaction so the write lock isn't held meanwhile
+            if new_user_id is None:
                 return render_template("register.html", error="Email already registered")
-            
-            # Insert new user
-            cur.execute("INSERT INTO users (fullname, email, password, role) VALUES (?, ?, ?, ?)",
-                       (fullname, email, password, role))
-            con.commit()
-            # get the new user's id for logging
-            new_user_id = cur.lastrowid
-            con.close()
+            get_counters().invalidate("roles")
+            get_directory().invalidate()
 
             # Log activity: if created by admin, include actor, otherwise register event
             if session.get('role') == 'admin' and session.get('user_id'):
@@ -134,7 +743,12 @@ def register():
                 log_activity(new_user_id, f"New user registered: {fullname}")
 
             return redirect("/login?registered=true")
+        except passwords.HasherBusy as e:
+            handled_error(e)
+            return (render_template("register.html", error="The server is busy. Please try again in a moment."),
+                    503, {"Retry-After": "1"})
         except Exception as e:
+            handled_error(e)
             return render_template("register.html", error=f"Registration failed: {str(e)}")
 
     return render_template("register.html")
@@ -144,50 +758,125 @@ def home():
     return render_template("index.html")
 
 @app.route("/dashboard")
+@conditional_page("activities")
 def dashboard():
     if not session.get("user_id"):
         return redirect("/login")
 
     try:
         con = get_db()
-        con.row_factory = sqlite3.Row
         cur = con.cursor()
-        cur.execute("SELECT message, created_at FROM activities ORDER BY created_at DESC LIMIT 10")
+        cur.execute("SELECT id, message, created_at FROM activities ORDER BY created_at DESC LIMIT 10")
         activities = cur.fetchall()
-        con.close()
-    except Exception:
+    except Exception as e:
+        handled_error(e)
         activities = []
 
-    return render_template("dashboard.html", activities=activities)
+    # The page subscribes to /activities/stream?last_event_id=... for anything newer
+    last_activity_id = max((a["id"] for a in activities), default=0)
+    return render_template("dashboard.html", activities=activities, last_activity_id=last_activity_id)
+
+
+@app.route("/activities/history")
+def activity_history():
+    if not session.get("user_id") or session.get("role") != "admin":
+        return redirect("/login")
+
+    try:
+        limit = pagination.page_size(request.args.get('limit'), app.config["PAGE_SIZE"], app.config["MAX_PAGE_SIZE"])
+        after = pagination.decode_cursor(request.args.get('cursor'))
+        user_id = request.args.get('user_id', type=int)
+        # Dates as typed in a date input (YYYY-MM-DD) compare correctly with the stored timestamps
+        since = request.args.get('since') or None
+        until = request.args.get('until') or None
+        activities, next_cursor = retention.history(get_db(), get_archive_dir(), limit,
+                                                    before=after[0] if after else None,
+                                                    user_id=user_id, since=since, until=until)
+    except Exception as e:
+        handled_error(e)
+        return render_template("activity_history.html", activities=[], next_cursor=None,
+                               error=f"Error loading activity history: {str(e)}")
+
+    return render_template("activity_history.html", activities=activities, next_cursor=next_cursor,
+                           user_id=user_id, since=since, until=until)
+
+
+def subscribe_to_feed():
+    # (feed, id to stream after), or the response to send instead. Shared with asgi.py's async stream.
+    if not session.get("user_id"):
+        return redirect("/login")
+
+    # EventSource sends Last-Event-ID itself when it reconnects; the first connect passes it in the URL
+    last_event_id = request.headers.get("Last-Event-ID") or request.args.get("last_event_id")
+    activity_feed = get_feed()
+    try:
+        newest = activity_feed.subscribe()
+    except feed.FeedFull as e:
+        handled_error(e)
+        return Response("too many live feed subscribers\n", status=503, mimetype="text/plain",
+                        headers={"Retry-After": str(feed.RETRY_MS // 1000)})
+    after_id = int(last_event_id) if last_event_id and last_event_id.isdigit() else newest
+    # The stream may stay open for hours: it must not keep the request's pooled connection
+    release_db()
+    return activity_feed, after_id
+
+
+@app.route("/activities/stream")
+def activity_stream():
+    subscribed = subscribe_to_feed()
+    if isinstance(subscribed, Response):
+        return subscribed
+    activity_feed, after_id = subscribed
+
+    response = Response(feed.stream(activity_feed, after_id, app.config["FEED_BUFFER_SIZE"],
+                                    app.config["FEED_HEARTBEAT"]),
+                        mimetype="text/event-stream",
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    # Runs even if the client goes away before the first byte, unlike a finally in the generator
+    response.call_on_close(activity_feed.unsubscribe)
+    return response
 
 @app.route("/manage")
+@conditional_page("users")
 def manage():
     if not session.get("user_id") or session.get("role") != "admin":
         return redirect("/login")
     
     try:
         con = get_db()
-        con.row_factory = sqlite3.Row
         cur = con.cursor()
-        cur.execute("SELECT id, fullname, email, role FROM users ORDER BY role DESC, fullname")
-        users = cur.fetchall()
-        
-        # Count stats
-        cur.execute("SELECT COUNT(*) FROM users WHERE role = 'admin'")
-        admins_count = cur.fetchone()[0]
+        # One page at a time, keyed on (role, fullname, id) so the next page is an index seek
+        limit = pagination.page_size(request.args.get('limit'), app.config["PAGE_SIZE"], app.config["MAX_PAGE_SIZE"])
+        after = pagination.decode_cursor(request.args.get('cursor'))
+        if after:
+            role, fullname, last_id = after
+            cur.execute('''
+                SELECT id, fullname, email, role FROM users
+                WHERE role <= ? AND (role < ? OR fullname > ? OR (fullname = ? AND id > ?))
+                ORDER BY role DESC, fullname, id LIMIT ?
+            ''', (role, role, fullname, fullname, last_id, limit + 1))
+        else:
+            cur.execute("SELECT id, fullname, email, role FROM users ORDER BY role DESC, fullname, id LIMIT ?",
+                        (limit + 1,))
+        users, next_cursor = pagination.split_page(cur.fetchall(), limit,
+                                                   lambda u: (u["role"], u["fullname"], u["id"]))
         
-        cur.execute("SELECT COUNT(*) FROM users WHERE role = 'user'")
-        regular_users_count = cur.fetchone()[0]
+        # Count stats (cached, one GROUP BY pass when stale)
+        roles = cached_counts(con, "roles")
+        admins_count = roles.get('admin', 0)
+        regular_users_count = roles.get('user', 0)
         
-        con.close()
         # Read optional messages from query params
         success_message = request.args.get('success')
         error_message = request.args.get('error')
 
         return render_template("manage.html", users=users, admins_count=admins_count, regular_users_count=regular_users_count,
-                       success_message=success_message, error_message=error_message)
+                       success_message=success_message, error_message=error_message,
+                       next_cursor=next_cursor, page_size=limit)
     except Exception as e:
-        return render_template("manage.html", users=[], admins_count=0, regular_users_count=0, error_message="Error loading users")
+        handled_error(e)
+        return render_template("manage.html", users=[], admins_count=0, regular_users_count=0, error_message="Error loading users",
+                       next_cursor=None, page_size=app.config["PAGE_SIZE"])
 
 
 @app.route("/update-user/<int:user_id>", methods=["POST"])
@@ -204,27 +893,30 @@ def update_user(user_id):
         email = request.form.get("email")
         password = request.form.get("password")
         role = request.form.get("role", "user")
+        password_hash = get_hasher().hash(password) if password else None
+
+        # Previous state for logging
+        prev = current_users(get_db()).get(user_id)
+        prev_fullname = prev.fullname if prev else ''
+        prev_role = prev.role if prev else ''
+
+        with get_writer().transaction() as cur:
+            # If password provided, update it; otherwise leave as-is
+            if password:
+                cur.execute("UPDATE users SET fullname = ?, email = ?, password = ?, role = ? WHERE id = ?",
+                           (fullname, email, password_hash, role, user_id))
+            else:
+                cur.execute("UPDATE users SET fullname = ?, email = ?, role = ? WHERE id = ?",
+                           (fullname, email, role, user_id))
+        get_counters().invalidate("roles")
+        get_directory().invalidate()
 
-        con = get_db()
-        con.row_factory = sqlite3.Row
-        cur = con.cursor()
-
-        # fetch previous state for logging
-        cur.execute("SELECT fullname, role FROM users WHERE id = ?", (user_id,))
-        prev = cur.fetchone()
-        prev_fullname = prev[0] if prev else ''
-        prev_role = prev[1] if prev else ''
-
-        # If password provided, update it; otherwise leave as-is
+        # Their open sessions pick up the change on the next request; a new password logs them out
         if password:
-            cur.execute("UPDATE users SET fullname = ?, email = ?, password = ?, role = ? WHERE id = ?",
-                       (fullname, email, password, role, user_id))
+            get_sessions().drop_user(user_id)
         else:
-            cur.execute("UPDATE users SET fullname = ?, email = ?, role = ? WHERE id = ?",
-                       (fullname, email, role, user_id))
-
-        con.commit()
-        con.close()
+            get_sessions().update_user(user_id, fullname=fullname, email=email, role=role,
+                                       avatar=get_initials(fullname))
 
         # Log specific changes
         actor_id = session.get('user_id')
@@ -237,6 +929,7 @@ def update_user(user_id):
     except sqlite3.IntegrityError:
         return redirect("/manage?error=Email already exists")
     except Exception as e:
+        handled_error(e)
         return redirect("/manage?error=Error updating user")
 
 @app.route("/add-user", methods=["POST"])
@@ -249,14 +942,14 @@ def add_user():
         email = request.form.get("email")
         password = request.form.get("password")
         role = request.form.get("role", "user")
+        password_hash = get_hasher().hash(password)
         
-        con = get_db()
-        cur = con.cursor()
-        cur.execute("INSERT INTO users (fullname, email, password, role) VALUES (?, ?, ?, ?)",
-               (fullname, email, password, role))
-        new_user_id = cur.lastrowid
-        con.commit()
-        con.close()
+        with get_writer().transaction() as cur:
+            cur.execute("INSERT INTO users (fullname, email, password, role) VALUES (?, ?, ?, ?)",
+                   (fullname, email, password_hash, role))
+            new_user_id = cur.lastrowid
+        get_counters().invalidate("roles")
+        get_directory().invalidate()
 
         # Log activity
         log_activity(session.get('user_id'), f"Admin {session.get('fullname')} added user {fullname} (role={role})")
@@ -265,6 +958,7 @@ def add_user():
     except sqlite3.IntegrityError:
         return redirect("/manage?error=Email already exists")
     except Exception as e:
+        handled_error(e)
         return redirect("/manage?error=Error adding user")
 
 @app.route("/delete-user/<int:user_id>", methods=["POST"])
@@ -277,24 +971,26 @@ def delete_user(user_id):
         return redirect("/manage?error=Cannot delete your own account")
     
     try:
-        con = get_db()
-        cur = con.cursor()
         # fetch fullname for logging
-        cur.execute("SELECT fullname FROM users WHERE id = ?", (user_id,))
-        row = cur.fetchone()
-        fullname = row[0] if row else ''
+        user = current_users(get_db()).get(user_id)
+        fullname = user.fullname if user else ''
 
-        cur.execute("DELETE FROM users WHERE id = ?", (user_id,))
-        con.commit()
-        con.close()
+        with get_writer().transaction() as cur:
+            cur.execute("DELETE FROM users WHERE id = ?", (user_id,))
+        get_counters().invalidate("roles")
+        get_directory().invalidate()
+        get_sessions().drop_user(user_id)
 
         # Log activity
         log_activity(session.get('user_id'), f"Admin {session.get('fullname')} deleted user {fullname} (id={user_id})")
 
         return redirect("/manage?success=User deleted successfully")
     except Exception as e:
+        handled_error(e)
         return redirect("/manage?error=Error deleting user")
 
+# Not a conditional_page: the database size, the time and the week counts move without any table
+# version changing, and everything else on it comes from caches already
 @app.route("/statistics")
 def statistics():
     if not session.get("user_id"):
@@ -302,23 +998,13 @@ def statistics():
     
     try:
         con = get_db()
-        con.row_factory = sqlite3.Row
-        cur = con.cursor()
-        
-        # Get user counts
-        cur.execute("SELECT COUNT(*) FROM users")
-        total_users = cur.fetchone()[0]
-        
-        cur.execute("SELECT COUNT(*) FROM users WHERE role = 'admin'")
-        admin_count = cur.fetchone()[0]
-        
-        cur.execute("SELECT COUNT(*) FROM users WHERE role = 'moderator'")
-        moderator_count = cur.fetchone()[0]
-        
-        cur.execute("SELECT COUNT(*) FROM users WHERE role = 'user'")
-        regular_user_count = cur.fetchone()[0]
-        
-        con.close()
+
+        # Get user counts (cached, one GROUP BY pass when stale)
+        roles = cached_counts(con, "roles")
+        total_users = sum(roles.values())
+        admin_count = roles.get('admin', 0)
+        moderator_count = roles.get('moderator', 0)
+        regular_user_count = roles.get('user', 0)
         
         # Calculate percentages
         admin_percentage = round((admin_count / total_users * 100)) if total_users > 0 else 0
@@ -329,20 +1015,17 @@ def statistics():
         active_sessions = max(1, int(total_users * 0.3))
         active_percentage = round((active_sessions / total_users * 100)) if total_users > 0 else 0
         
-        # Growth simulation
-        user_growth = 12
-        
-        # Weekly user registration data (simulated growth trend)
-        week1_users = max(1, total_users // 6)
-        week2_users = max(1, int(week1_users * 1.2))
-        week3_users = max(1, int(week2_users * 1.3))
-        week4_users = max(1, int(week3_users * 1.15))
-        week5_users = max(1, int(week4_users * 1.25))
-        week6_users = max(1, int(week5_users * 1.1))
-        
-        # Database size (simulated)
-        db_size = 245
-        
+        # Weekly registrations and submissions for the last 6 weeks (oldest first), from the rollup table
+        registration_weeks = rollups.weekly_series(con, "registrations")
+        suggestion_weeks = rollups.weekly_series(con, "suggestions")
+        week1_users, week2_users, week3_users, week4_users, week5_users, week6_users = registration_weeks
+
+        # Growth: registrations this week vs last week, in percent
+        user_growth = rollups.growth_percent(registration_weeks)
+
+        # Database size in KB
+        db_size = round(rollups.database_size(con) / 1024)
+
         # Last updated
         from datetime import datetime
         last_updated = datetime.now().strftime("%H:%M")
@@ -365,48 +1048,57 @@ def statistics():
             week4_users=week4_users,
             week5_users=week5_users,
             week6_users=week6_users,
+            suggestion_weeks=suggestion_weeks,
+            suggestion_growth=rollups.growth_percent(suggestion_weeks),
             db_size=db_size,
             last_updated=last_updated
         )
     except Exception as e:
+        handled_error(e)
         return render_template("statistics.html", error=f"Error loading statistics: {str(e)}")
 
 
 @app.route("/suggestions")
+@conditional_page("suggestions", "users")
 def suggestions():
     if not session.get("user_id"):
         return redirect("/login")
 
     try:
         con = get_db()
-        con.row_factory = sqlite3.Row
         cur = con.cursor()
 
-        # Fetch all suggestions, optionally filter by status
+        # Fetch one page of suggestions, newest first, optionally filtered by status.
+        # The cursor is the (created_at, id) of the last row shown, so deep pages cost the same as the first.
         status_filter = request.args.get('status', 'all')
-        if status_filter != 'all':
-            cur.execute('''
-                SELECT id, fullname, email, sdg_category, title, description, status, created_at 
-                FROM suggestions WHERE status = ? ORDER BY created_at DESC
-            ''', (status_filter,))
-        else:
-            cur.execute('''
-                SELECT id, fullname, email, sdg_category, title, description, status, created_at 
-                FROM suggestions ORDER BY created_at DESC
-            ''')
-        suggestions_list = cur.fetchall()
-
-        # Get counts by status
-        cur.execute("SELECT COUNT(*) FROM suggestions WHERE status = 'pending'")
-        pending_count = cur.fetchone()[0]
-
-        cur.execute("SELECT COUNT(*) FROM suggestions WHERE status = 'approved'")
-        approved_count = cur.fetchone()[0]
+        limit = pagination.page_size(request.args.get('limit'), app.config["PAGE_SIZE"], app.config["MAX_PAGE_SIZE"])
+        after = pagination.decode_cursor(request.args.get('cursor'))
 
-        cur.execute("SELECT COUNT(*) FROM suggestions WHERE status = 'rejected'")
-        rejected_count = cur.fetchone()[0]
-
-        con.close()
+        conditions, params = [], []
+        if status_filter != 'all':
+            conditions.append("status = ?")
+            params.append(status_filter)
+        if after:
+            created_at, last_id = after
+            # The "created_at <= ?" half is what the index range seek uses
+            conditions.append("created_at <= ? AND (created_at < ? OR id < ?)")
+            params += [created_at, created_at, last_id]
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        cur.execute(f'''
+            SELECT id, user_id, fullname, email, sdg_category, title, description, status, created_at,
+                   duplicate_of, similarity
+            FROM suggestions {where} ORDER BY created_at DESC, id DESC LIMIT ?
+        ''', (*params, limit + 1))
+        suggestions_list, next_cursor = pagination.split_page(cur.fetchall(), limit,
+                                                              lambda s: (s["created_at"], s["id"]))
+        suggestions_list = with_current_authors(con, suggestions_list)
+
+        # Get counts by status (cached, one GROUP BY pass when stale)
+        statuses = cached_counts(con, "statuses")
+        pending_count = statuses.get('pending', 0)
+        approved_count = statuses.get('approved', 0)
+        rejected_count = statuses.get('rejected', 0)
 
         success_message = request.args.get('success')
         error_message = request.args.get('error')
@@ -419,10 +1111,58 @@ def suggestions():
             rejected_count=rejected_count,
             current_status=status_filter,
             success_message=success_message,
-            error_message=error_message
+            error_message=error_message,
+            next_cursor=next_cursor,
+            page_size=limit
         )
     except Exception as e:
-        return render_template("suggestions.html", error_message=f"Error loading suggestions: {str(e)}", suggestions=[], pending_count=0, approved_count=0, rejected_count=0, current_status='all', success_message=None)
+        handled_error(e)
+        return render_template("suggestions.html", error_message=f"Error loading suggestions: {str(e)}", suggestions=[], pending_count=0, approved_count=0, rejected_count=0, current_status='all', success_message=None,
+                               next_cursor=None, page_size=app.config["PAGE_SIZE"])
+
+
+@app.route("/suggestions/search")
+def search_suggestions():
+    if not session.get("user_id"):
+        return redirect("/login")
+
+    query = request.args.get('q', '').strip()
+    status_filter = request.args.get('status', 'all')
+    sdg_filter = request.args.get('sdg', '')
+    limit = pagination.page_size(request.args.get('limit'), app.config["PAGE_SIZE"], app.config["MAX_PAGE_SIZE"])
+
+    try:
+        con = get_db()
+
+        # Best matches first (BM25); the cursor is the (rank, id) of the last row shown
+        results, next_cursor = search.search(
+            con, query,
+            status=None if status_filter == 'all' else status_filter,
+            sdg_category=sdg_filter or None,
+            limit=limit,
+            after=pagination.decode_cursor(request.args.get('cursor')),
+        )
+
+        statuses = cached_counts(con, "statuses")
+        return render_template(
+            "suggestions.html",
+            suggestions=with_current_authors(con, results),
+            search_query=query,
+            current_sdg=sdg_filter,
+            pending_count=statuses.get('pending', 0),
+            approved_count=statuses.get('approved', 0),
+            rejected_count=statuses.get('rejected', 0),
+            current_status=status_filter,
+            success_message=None,
+            error_message=None,
+            next_cursor=next_cursor,
+            page_size=limit
+        )
+    except Exception as e:
+        handled_error(e)
+        return render_template("suggestions.html", error_message=f"Error searching suggestions: {str(e)}", suggestions=[], search_query=query, current_sdg=sdg_filter,
+                               pending_count=0, approved_count=0, rejected_count=0, current_status=status_filter, success_message=None,
+                               next_cursor=None, page_size=limit)
 
 
 @app.route("/submit-suggestion", methods=["POST"])
@@ -432,7 +1172,7 @@ def submit_suggestion():
 
     try:
         user_id = session.get("user_id")
-        fullname = session.get("fullname")
+        fullname = current_users(get_db()).name(user_id, session.get("fullname"))
         email = request.form.get("email")
         sdg_category = request.form.get("sdg_category")
         title = request.form.get("title")
@@ -441,23 +1181,76 @@ def submit_suggestion():
         if not all([email, sdg_category, title, description]):
             return redirect("/suggestions?error=All fields are required")
 
-        con = get_db()
-        cur = con.cursor()
-        cur.execute('''
-            INSERT INTO suggestions (user_id, fullname, email, sdg_category, title, description)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (user_id, fullname, email, sdg_category, title, description))
-        con.commit()
-        con.close()
+        limiter = get_limiter()
+        retry_after = limiter.acquire("submit_account", user_id) or limiter.acquire("submit_ip", request.remote_addr)
+        if retry_after:
+            return too_many_requests(retry_after)
+
+        # Hashing is pure CPU, so do it before taking the write lock
+        signature = duplicates.signature(f"{title} {description}")
+        with get_writer().transaction() as cur:
+            cur.execute('''
+                INSERT INTO suggestions (user_id, fullname, email, sdg_category, title, description)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (user_id, fullname, email, sdg_category, title, description))
+            # Same transaction, so two copies submitted at once still find each other
+            match = duplicates.check_and_index(cur.connection, cur.lastrowid, title, description,
+                                               app.config["DUPLICATE_THRESHOLD"], signature)
+        get_counters().invalidate("statuses")
 
         # Log activity
         log_activity(user_id, f"{fullname} submitted a suggestion about {sdg_category}: {title}")
 
+        if match:
+            return redirect(f"/suggestions?success=Suggestion submitted! It looks similar to suggestion ID {match[1]}")
         return redirect("/suggestions?success=Suggestion submitted successfully!")
     except Exception as e:
+        handled_error(e)
         return redirect("/suggestions?error=Error submitting suggestion")
 
 
+@app.route("/suggestions/<int:suggestion_id>/similar")
+def similar_suggestions(suggestion_id):
+    if not session.get("user_id"):
+        return redirect("/login")
+
+    try:
+        con = get_db()
+        suggestion = con.execute('''
+            SELECT id, user_id, fullname, email, sdg_category, title, description, status, created_at,
+                   duplicate_of, similarity
+            FROM suggestions WHERE id = ?
+        ''', (suggestion_id,)).fetchone()
+        if suggestion is None:
+            return redirect("/suggestions?error=Suggestion not found")
+        suggestion = with_current_authors(con, [suggestion])[0]
+
+        # Everything in the same group (original plus flagged copies), then anything else close
+        root = suggestion["duplicate_of"] or suggestion["id"]
+        group = con.execute('''
+            SELECT id, user_id, fullname, sdg_category, title, status, created_at, duplicate_of, similarity
+            FROM suggestions WHERE (id = ? OR duplicate_of = ?) AND id != ? ORDER BY id
+        ''', (root, root, suggestion_id)).fetchall()
+        group = with_current_authors(con, group)
+        grouped = {row["id"] for row in group}
+
+        scores = {other: score for score, other in duplicates.similar_to(con, suggestion_id) if other not in grouped}
+        similar = []
+        if scores:
+            rows = con.execute(f'''
+                SELECT id, user_id, fullname, sdg_category, title, status, created_at, duplicate_of
+                FROM suggestions WHERE id IN ({", ".join("?" * len(scores))})
+            ''', list(scores)).fetchall()
+            similar = sorted(({**row, "similarity": round(scores[row["id"]], 3)}
+                              for row in with_current_authors(con, rows)),
+                             key=lambda row: -row["similarity"])
+
+        return render_template("similar_suggestions.html", suggestion=suggestion, group=group, similar=similar)
+    except Exception as e:
+        handled_error(e)
+        return redirect("/suggestions?error=Error loading similar suggestions")
+
+
 @app.route("/update-suggestion/<int:suggestion_id>", methods=["POST"])
 def update_suggestion(suggestion_id):
     if not session.get("user_id") or session.get("role") != "admin":
@@ -467,25 +1260,22 @@ def update_suggestion(suggestion_id):
         new_status = request.form.get("status", "pending")
         
         # Validate status
-        if new_status not in ["pending", "approved", "rejected"]:
+        if new_status not in moderation.STATUSES:
             return redirect("/suggestions?error=Invalid status")
 
-        con = get_db()
-        cur = con.cursor()
-        
-        # Get current suggestion status before update
-        cur.execute("SELECT status FROM suggestions WHERE id = ?", (suggestion_id,))
-        result = cur.fetchone()
+        with get_writer().transaction() as cur:
+            # Get current suggestion status before update
+            cur.execute("SELECT status FROM suggestions WHERE id = ?", (suggestion_id,))
+            result = cur.fetchone()
+            if result:
+                current_status = result[0]
+
+                # Update the suggestion
+                cur.execute("UPDATE suggestions SET status = ? WHERE id = ?", (new_status, suggestion_id))
+        get_counters().invalidate("statuses")
+
         if not result:
-            con.close()
             return redirect("/suggestions?error=Suggestion not found")
-        
-        current_status = result[0]
-        
-        # Update the suggestion
-        cur.execute("UPDATE suggestions SET status = ? WHERE id = ?", (new_status, suggestion_id))
-        con.commit()
-        con.close()
 
         # Log activity with action type
         action = "approved" if new_status == "approved" else "rejected" if new_status == "rejected" else "marked as pending"
@@ -495,13 +1285,318 @@ def update_suggestion(suggestion_id):
         success_msg = f"Suggestion {action.split()[-1]}!"
         return redirect(f"/suggestions?success={success_msg}")
     except Exception as e:
+        handled_error(e)
         return redirect("/suggestions?error=Error updating suggestion")
 
+
+@app.route("/bulk-update-suggestions", methods=["POST"])
+def bulk_update_suggestions():
+    if not session.get("user_id") or session.get("role") != "admin":
+        return redirect("/login")
+
+    new_status = request.form.get("status", "")
+    if new_status not in moderation.STATUSES:
+        return redirect("/suggestions?error=Invalid status")
+
+    # Either ticked ids, or a filter such as "all pending in SDG 6 older than 30 days"
+    try:
+        ids = moderation.parse_ids(request.form.getlist("ids"))
+        older_than = request.form.get("older_than_days")
+        where, params = moderation.filter_clause(
+            status=request.form.get("filter_status") or None,
+            sdg_category=request.form.get("sdg_category") or None,
+            older_than_days=int(older_than) if older_than else None,
+        )
+    except ValueError:
+        return redirect("/suggestions?error=Invalid suggestion selection")
+    if not ids and not where:
+        return redirect("/suggestions?error=No suggestions selected")
+
+    try:
+        # One transaction (one fsync) for the whole batch
+        with get_writer().transaction() as cur:
+            changed = moderation.bulk_update(cur, new_status, ids=ids, where=where, params=params)
+        get_counters().invalidate("statuses")
+
+        action = "marked as pending" if new_status == "pending" else new_status
+        if ids:
+            scope = f"{len(ids)} selected"
+        else:
+            scope = ", ".join(filter(None, [
+                request.form.get("filter_status"), request.form.get("sdg_category"),
+                f"older than {older_than} days" if older_than else None,
+            ]))
+        # One aggregated entry instead of one per suggestion
+        log_activity(session.get("user_id"), f"Admin {session.get('fullname')} {action} {changed} suggestions ({scope})")
+
+        return redirect(f"/suggestions?success={changed} suggestions {action}")
+    except Exception as e:
+        handled_error(e)
+        return redirect("/suggestions?error=Error updating suggestions")
+
+@app.route("/import/<table>", methods=["POST"])
+def import_table(table):
+    if not session.get("user_id") or session.get("role") != "admin":
+        return redirect("/login")
+    if table not in transfer.IMPORTS:
+        return jsonify(error=f"cannot import into {table}"), 404
+
+    # A multipart upload (field "file"), or the CSV/JSONL as the request body itself
+    upload = request.files.get("file")
+    fmt = request.values.get("format") or transfer.guess_format(upload.filename if upload else None)
+    if fmt not in transfer.FORMATS:
+        return jsonify(error=f"unsupported format: {fmt}"), 400
+    stream = io.TextIOWrapper(upload.stream if upload else request.stream, encoding="utf-8-sig", newline="")
+
+    try:
+        report = transfer.import_records(get_writer(), table, transfer.read_records(stream, fmt),
+                                         chunk_size=app.config["IMPORT_CHUNK_SIZE"],
+                                         duplicate_threshold=app.config["DUPLICATE_THRESHOLD"],
+                                         hasher=get_hasher())
+    except UnicodeDecodeError:
+        return jsonify(error="file is not UTF-8 text"), 400
+    get_counters().invalidate("roles" if table == "users" else "statuses")
+    if table == "users":
+        get_directory().invalidate()
+
+    log_activity(session.get("user_id"),
+                 f"Admin {session.get('fullname')} imported {report.imported} {table} ({report.failed} rejected)")
+    return jsonify(report.as_dict())
+
+
+@app.route("/export/<table>")
+def export_table(table):
+    if not session.get("user_id") or session.get("role") != "admin":
+        return redirect("/login")
+
+    fmt = request.args.get("format", "csv")
+    if fmt not in transfer.FORMATS:
+        return jsonify(error=f"unsupported format: {fmt}"), 400
+    if table not in transfer.exportable_tables(get_db()):
+        return jsonify(error=f"cannot export {table}"), 404
+
+    # The body is sent after the request's own connection went back to the pool: each chunk
+    # borrows one just while it is read
+    chunks = transfer.export_rows(pooled_connection, table, fmt, app.config["EXPORT_CHUNK_ROWS"])
+    mimetype = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    return Response(chunks, mimetype=mimetype,
+                    headers={"Content-Disposition": f"attachment; filename={table}.{fmt}"})
+
+
+def api_response(text, status=200):
+    data, encoding = api.compress(text, request.accept_encodings["gzip"] > 0,
+                                  app.config["API_GZIP_MIN_SIZE"], app.config["API_GZIP_LEVEL"])
+    response = Response(data, status=status, mimetype="application/json")
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+def api_denied(admin=False):
+    # Same rules as the HTML pages, answered with 401/403 instead of a redirect to /login
+    if not session.get("user_id"):
+        return jsonify(error="sign in first"), 401
+    if admin and session.get("role") != "admin":
+        return jsonify(error="admins only"), 403
+    return None
+
+
+def api_batch(con, table, fields):
+    # ?ids=3,1,2: one query, rows in the order asked for, unknown ids listed under "missing"
+    ids = api.parse_ids(request.args["ids"], app.config["MAX_PAGE_SIZE"])
+    rows = con.execute(f'''
+        SELECT {api.json_object(fields, "t")}, t.id FROM json_each(?) AS j
+        JOIN {table} AS t ON t.id = j.value ORDER BY j.key
+    ''', (json.dumps(ids),)).fetchall()
+    found = {row[-1] for row in rows}
+    return api_response(api.body(rows, missing=[i for i in ids if i not in found]))
+
+
+def api_item(table, item_id):
+    fields = api.parse_fields(request.args.get('fields'), table)
+    row = get_db().execute(f"SELECT {api.json_object(fields)} FROM {table} WHERE id = ?", (item_id,)).fetchone()
+    if row is None:
+        return jsonify(error=f"no such {table[:-1]}: {item_id}"), 404
+    return api_response(f'{{"data":{row[0]}}}')
+
+
+@app.route("/api/v1/suggestions")
+def api_suggestions():
+    denied = api_denied()
+    if denied:
+        return denied
+
+    try:
+        fields = api.parse_fields(request.args.get('fields'), "suggestions")
+        con = get_db()
+        if request.args.get('ids'):
+            return api_batch(con, "suggestions", fields)
+
+        # Newest first, same (created_at, id) keyset as /suggestions, so cursors work on both
+        limit = pagination.page_size(request.args.get('limit'), app.config["PAGE_SIZE"], app.config["MAX_PAGE_SIZE"])
+        after = pagination.decode_cursor(request.args.get('cursor'))
+        conditions, params = [], []
+        status = request.args.get('status')
+        if status:
+            conditions.append("status = ?")
+            params.append(status)
+        sdg_category = request.args.get('sdg')
+        if sdg_category:
+            conditions.append("sdg_category = ?")
+            params.append(sdg_category)
+        if after:
+            created_at, last_id = after
+            conditions.append("created_at <= ? AND (created_at < ? OR id < ?)")
+            params += [created_at, created_at, last_id]
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        # The key columns ride along after the JSON column, for the cursor
+        rows = con.execute(f'''
+            SELECT {api.json_object(fields)}, created_at, id FROM suggestions {where}
+            ORDER BY created_at DESC, id DESC LIMIT ?
+        ''', (*params, limit + 1)).fetchall()
+        rows, next_cursor = pagination.split_page(rows, limit, lambda r: (r[-2], r[-1]))
+        return api_response(api.body(rows, next_cursor=next_cursor))
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    except Exception as e:
+        handled_error(e)
+        return jsonify(error="could not load suggestions"), 500
+
+
+@app.route("/api/v1/suggestions/<int:suggestion_id>")
+def api_suggestion(suggestion_id):
+    denied = api_denied()
+    if denied:
+        return denied
+    try:
+        return api_item("suggestions", suggestion_id)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+
+
+@app.route("/api/v1/users")
+def api_users():
+    denied = api_denied(admin=True)
+    if denied:
+        return denied
+
+    try:
+        fields = api.parse_fields(request.args.get('fields'), "users")
+        con = get_db()
+        if request.args.get('ids'):
+            return api_batch(con, "users", fields)
+
+        # Same (role, fullname, id) keyset as /manage
+        limit = pagination.page_size(request.args.get('limit'), app.config["PAGE_SIZE"], app.config["MAX_PAGE_SIZE"])
+        after = pagination.decode_cursor(request.args.get('cursor'))
+        columns = api.json_object(fields)
+        if after:
+            role, fullname, last_id = after
+            rows = con.execute(f'''
+                SELECT {columns}, role, fullname, id FROM users
+                WHERE role <= ? AND (role < ? OR fullname > ? OR (fullname = ? AND id > ?))
+                ORDER BY role DESC, fullname, id LIMIT ?
+            ''', (role, role, fullname, fullname, last_id, limit + 1)).fetchall()
+        else:
+            rows = con.execute(f"SELECT {columns}, role, fullname, id FROM users ORDER BY role DESC, fullname, id "
+                               "LIMIT ?", (limit + 1,)).fetchall()
+        rows, next_cursor = pagination.split_page(rows, limit, lambda r: (r[-3], r[-2], r[-1]))
+        return api_response(api.body(rows, next_cursor=next_cursor))
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    except Exception as e:
+        handled_error(e)
+        return jsonify(error="could not load users"), 500
+
+
+@app.route("/api/v1/users/<int:user_id>")
+def api_user(user_id):
+    denied = api_denied(admin=True)
+    if denied:
+        return denied
+    try:
+        return api_item("users", user_id)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+
+
+@app.route("/api/v1/activities")
+def api_activities():
+    denied = api_denied()
+    if denied:
+        return denied
+
+    try:
+        fields = api.parse_fields(request.args.get('fields'), "activities")
+        con = get_db()
+        if request.args.get('ids'):
+            return api_batch(con, "activities", fields)
+
+        # Newest first by id; archived activities are on /activities/history
+        limit = pagination.page_size(request.args.get('limit'), app.config["PAGE_SIZE"], app.config["MAX_PAGE_SIZE"])
+        after = pagination.decode_cursor(request.args.get('cursor'))
+        conditions, params = [], []
+        user_id = request.args.get('user_id', type=int)
+        if user_id is not None:
+            conditions.append("user_id = ?")
+            params.append(user_id)
+        if after:
+            conditions.append("id < ?")
+            params.append(after[0])
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        rows = con.execute(f"SELECT {api.json_object(fields)}, id FROM activities {where} ORDER BY id DESC LIMIT ?",
+                           (*params, limit + 1)).fetchall()
+        rows, next_cursor = pagination.split_page(rows, limit, lambda r: (r[-1],))
+        return api_response(api.body(rows, next_cursor=next_cursor))
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    except Exception as e:
+        handled_error(e)
+        return jsonify(error="could not load activities"), 500
+
+
+@app.route("/api/v1/stats")
+def api_stats():
+    denied = api_denied()
+    if denied:
+        return denied
+
+    try:
+        con = get_db()
+        roles = cached_counts(con, "roles")
+        statuses = cached_counts(con, "statuses")
+        registration_weeks = rollups.weekly_series(con, "registrations")
+        suggestion_weeks = rollups.weekly_series(con, "suggestions")
+        return api_response(json.dumps({
+            "users": {"total": sum(roles.values()), "by_role": roles},
+            "suggestions": {"total": sum(statuses.values()), "by_status": statuses},
+            # Last 6 weeks, oldest first
+            "weekly_registrations": registration_weeks,
+            "weekly_suggestions": suggestion_weeks,
+            "user_growth": rollups.growth_percent(registration_weeks),
+            "suggestion_growth": rollups.growth_percent(suggestion_weeks),
+        }))
+    except Exception as e:
+        handled_error(e)
+        return jsonify(error="could not load statistics"), 500
+
+
+@app.route("/metrics")
+def metrics_endpoint():
+    token = app.config["METRICS_TOKEN"]
+    if token and request.headers.get("Authorization") != f"Bearer {token}":
+        return Response("unauthorized\n", status=401, mimetype="text/plain")
+    return Response(app.extensions["metrics"].render(), mimetype="text/plain; version=0.0.4")
+
+
 if __name__ == "__main__":
-    # Ensure DB schema for activities exists on startup
+    # The development server; run production with "python manage.py serve"
+    # Apply pending schema migrations on startup
     try:
         init_db()
-    except Exception:
-        pass
+    except Exception as e:
+        app.logger.error("Schema migration failed: %s", e)
 
     app.run(debug=True, host="0.0.0.0", port=5000)
@@ -0,0 +1,265 @@
+"""
+ASGI variant of the app: `python manage.py serve --async`, or any ASGI server
+(uvicorn asgi:application). Requests are read and responses written on the
+event loop; the Flask views, where SQLite is, run on a bounded DatabaseExecutor.
+A slow client, an idle keep-alive or an open activity stream holds no thread,
+so open connections aren't limited by the thread count. /activities/stream is
+async-native: it waits for the feed on the loop and takes a thread only to
+check the session and to read rows the feed no longer buffers.
+"""
+import asyncio
+import io
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import app as webapp
+import feed
+
+
+class Saturated(Exception):
+    pass
+
+
+class DatabaseExecutor:
+    """
+    Runs blocking calls in `threads` threads. At most `max_pending` calls may be
+    queued or running; beyond that a caller waits up to `timeout` seconds for a
+    slot, then gets Saturated, so overload turns into quick 503s instead of a
+    queue, and a latency, that grows without bound. Use from one event loop.
+    """
+
+    def __init__(self, threads=8, max_pending=64, timeout=1.0):
+        self.threads = threads
+        self.max_pending = max_pending
+        self.timeout = timeout
+
+        self._executor = ThreadPoolExecutor(threads, thread_name_prefix="db")
+        self._slots = None  # created on the loop that first uses it
+
+        self.pending = 0
+        self.calls = 0
+        self.saturated = 0
+
+    async def run(self, fn, *args):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_pending)
+        if self._slots.locked():
+            try:
+                await asyncio.wait_for(self._slots.acquire(), self.timeout)
+            except asyncio.TimeoutError:
+                self.saturated += 1
+                raise Saturated(f"more than {self.max_pending} database calls pending")
+        else:
+            await self._slots.acquire()
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self.pending -= 1
+            self.calls += 1
+            self._slots.release()
+
+    def close(self):
+        self._executor.shutdown()
+
+    def stats(self):
+        return {"threads": self.threads, "pending": self.pending, "calls": self.calls, "saturated": self.saturated}
+
+
+def get_executor():
+    # Only the event loop's thread creates it, so no lock
+    executor = webapp.app.extensions.get("db_executor")
+    if executor is None:
+        executor = DatabaseExecutor(
+            threads=webapp.app.config["ASYNC_DB_THREADS"],
+            max_pending=webapp.app.config["ASYNC_DB_MAX_PENDING"],
+            timeout=webapp.app.config["ASYNC_DB_TIMEOUT"],
+        )
+        webapp.app.extensions["db_executor"] = executor
+    return executor
+
+
+def _environ(scope, body):
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode().decode("latin-1"),
+        "PATH_INFO": scope["path"].encode().decode("latin-1"),
+        "QUERY_STRING": scope["query_string"].decode("latin-1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope['http_version']}",
+        "REMOTE_ADDR": client[0],
+        "REMOTE_PORT": str(client[1]),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    for name, value in scope["headers"]:
+        key = name.decode("latin-1").upper().replace("-", "_")
+        if key not in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+            key = "HTTP_" + key
+        value = value.decode("latin-1")
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+def _call_view(environ):
+    # In a database thread: the whole Flask request, teardown included (release_db)
+    started = []
+    body = webapp.app(environ, lambda status, headers, exc_info=None: started.extend((status, headers)))
+    status, headers = started
+    if any(name.lower() == "content-length" for name, _ in headers):
+        # Buffered: no reason to come back for each piece
+        try:
+            return int(status.split(" ", 1)[0]), headers, b"".join(body), None
+        finally:
+            getattr(body, "close", lambda: None)()
+    return int(status.split(" ", 1)[0]), headers, b"", iter(body)
+
+
+def _next_chunk(body):
+    for chunk in body:
+        return chunk
+    body.close()
+    return None
+
+
+def _subscribe(environ):
+    # In a database thread: the session lookup and subscribe() may query.
+    # ((feed, after_id), None), or (None, the response to send instead).
+    with webapp.app.request_context(environ):
+        subscribed = webapp.subscribe_to_feed()
+        if isinstance(subscribed, webapp.Response):
+            return None, (subscribed.status_code, list(subscribed.headers.items()), subscribed.get_data(), None)
+        return subscribed, None
+
+
+def _read_rows(activity_feed, after_id, backlog):
+    with activity_feed.connect() as con:
+        return [tuple(row) for row in con.execute(feed.NEW_ROWS, (after_id, backlog))]
+
+
+async def _start(send, status, headers):
+    await send({"type": "http.response.start", "status": status,
+                "headers": [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers]})
+
+
+async def _wait_for_disconnect(receive):
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+async def _stream(send, receive, activity_feed, after_id):
+    # feed.stream() without a thread: waits on the loop for the poller to publish
+    executor = get_executor()
+    heartbeat = webapp.app.config["FEED_HEARTBEAT"]
+    backlog = webapp.app.config["FEED_BUFFER_SIZE"]
+    loop = asyncio.get_running_loop()
+    arrived = asyncio.Event()
+
+    def wake():
+        loop.call_soon_threadsafe(arrived.set)
+
+    activity_feed.add_listener(wake)
+    disconnected = asyncio.ensure_future(_wait_for_disconnect(receive))
+    try:
+        await _start(send, 200, [("Content-Type", "text/event-stream; charset=utf-8"), ("Cache-Control", "no-cache"),
+                                 ("X-Accel-Buffering", "no")])
+        await send({"type": "http.response.body", "body": f"retry: {feed.RETRY_MS}\n\n".encode(),
+                    "more_body": True})
+        while not activity_feed.closed and not disconnected.done():
+            arrived.clear()
+            events = activity_feed.events_after(after_id, 0)
+            if events is None:
+                events = await executor.run(_read_rows, activity_feed, after_id, backlog)
+            if events:
+                text = "".join(feed.format_event(*event) for event in events)
+                after_id = events[-1][0]
+            else:
+                waiter = asyncio.ensure_future(arrived.wait())
+                done, _ = await asyncio.wait({waiter, disconnected}, timeout=heartbeat,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                waiter.cancel()
+                if done:
+                    continue
+                text = ": keepalive\n\n"
+            await send({"type": "http.response.body", "body": text.encode(), "more_body": True})
+        if not disconnected.done():
+            await send({"type": "http.response.body", "body": b""})
+    finally:
+        disconnected.cancel()
+        activity_feed.remove_listener(wake)
+        activity_feed.unsubscribe()
+
+
+async def _read_body(receive, limit):
+    chunks, size = [], 0
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return None
+        chunks.append(message.get("body", b""))
+        size += len(chunks[-1])
+        if size > limit:
+            raise ValueError(f"request body over {limit} bytes")
+        if not message.get("more_body"):
+            return b"".join(chunks)
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await get_executor().run(webapp.ensure_schema)
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            # Not on the database threads: closing them waits for them
+            await asyncio.get_running_loop().run_in_executor(None, webapp.close_resources)
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        return await _lifespan(receive, send)
+    if scope["type"] != "http":
+        raise ValueError(f"unsupported ASGI scope type: {scope['type']}")
+
+    try:
+        body = await _read_body(receive, webapp.app.config["ASYNC_MAX_BODY"])
+    except ValueError as e:
+        await _start(send, 413, [("Content-Type", "text/plain")])
+        return await send({"type": "http.response.body", "body": f"{e}\n".encode()})
+    if body is None:
+        return
+    environ = _environ(scope, body)
+    executor = get_executor()
+    try:
+        if scope["method"] == "GET" and scope["path"] == "/activities/stream":
+            subscription, response = await executor.run(_subscribe, environ)
+            if subscription is not None:
+                return await _stream(send, receive, *subscription)
+        else:
+            response = await executor.run(_call_view, environ)
+    except Saturated:
+        await _start(send, 503, [("Content-Type", "text/plain"), ("Retry-After", "1")])
+        return await send({"type": "http.response.body", "body": b"server busy, try again\n"})
+
+    status, headers, content, rest = response
+    await _start(send, status, headers)
+    if rest is None:
+        return await send({"type": "http.response.body", "body": content})
+    # A streamed response: one trip to a database thread per piece
+    try:
+        while (chunk := await executor.run(_next_chunk, rest)) is not None:
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+    except BaseException:
+        rest.close()  # client gone or threads saturated halfway: cut the response short
+        raise
+    await send({"type": "http.response.body", "body": b""})
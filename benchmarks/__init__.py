@@ -0,0 +1,3 @@
+"""
+Benchmark scripts. Run from the repository root, e.g. python -m benchmarks.pagination
+"""
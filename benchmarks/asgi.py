@@ -0,0 +1,178 @@
+"""
+Concurrency: threaded workers against asyncio ones (manage.py serve vs.
+manage.py serve --async), as the number of open client connections grows
+past the threaded worker's thread count.
+
+    python -m benchmarks.asgi                                  # 16, 64, 256 clients
+    python -m benchmarks.asgi --concurrency 16 128 1024 --streams 200
+
+Each client sends GET /api/v1/suggestions requests back to back, like a page
+polling the API, over one keep-alive connection where the server allows it
+(werkzeug's threaded server closes the connection after every response). With --streams, that many
+clients first open /activities/stream and keep it open, the way idle browser
+tabs do, and the same API load runs beside them. A request not answered
+within --timeout seconds counts as an error. Both servers run one worker on
+a synthetic database; the threaded one serves --threads connections at a
+time, the asyncio one runs views on --db-threads threads.
+"""
+import argparse
+import asyncio
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from benchmarks import load
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _start(database, options):
+    port = _free_port()
+    process = subprocess.Popen([sys.executable, "manage.py", "serve", "--port", str(port), "--workers", "1",
+                                *options], cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                               env=dict(os.environ, DATABASE=database),
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics").close()
+            return process, port
+        except OSError:
+            time.sleep(0.1)
+    os.killpg(process.pid, signal.SIGKILL)
+    raise RuntimeError("the server didn't start")
+
+
+def _login(port, email):
+    # The session cookie every client sends; sessions live server-side, so sharing one is fine
+    body = urllib.parse.urlencode({"email": email, "password": load.PASSWORD}).encode()
+    opener = urllib.request.build_opener(load._NoRedirect)
+    try:
+        opener.open(f"http://127.0.0.1:{port}/login", data=body)
+    except urllib.error.HTTPError as e:
+        return e.headers["Set-Cookie"].split(";", 1)[0]
+    raise RuntimeError("login didn't redirect")
+
+
+async def _read_response(reader):
+    # (status, whether the server keeps the connection open)
+    head = await reader.readuntil(b"\r\n\r\n")
+    status = int(head.split(b" ", 2)[1])
+    length, keep_alive = 0, True
+    for line in head.split(b"\r\n"):
+        name, _, value = line.partition(b":")
+        if name.lower() == b"content-length":
+            length = int(value)
+        elif name.lower() == b"connection" and value.strip().lower() == b"close":
+            keep_alive = False
+    await reader.readexactly(length)
+    return status, keep_alive
+
+
+async def _client(port, cookie, requests, timeout, latencies, errors, start):
+    request = (f"GET /api/v1/suggestions?limit=20&fields=id,title,status HTTP/1.1\r\nHost: 127.0.0.1\r\n"
+               f"Cookie: {cookie}\r\n\r\n").encode()
+    writer = None
+    await start.wait()
+    try:
+        for _ in range(requests):
+            began = time.perf_counter()
+            if writer is None:
+                reader, writer = await asyncio.wait_for(asyncio.open_connection("127.0.0.1", port), timeout)
+            writer.write(request)
+            status, keep_alive = await asyncio.wait_for(_read_response(reader), timeout)
+            latencies.append(time.perf_counter() - began)
+            if status != 200:
+                errors.append(status)
+            if not keep_alive:
+                writer.close()
+                writer = None
+    except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError) as e:
+        errors.append(type(e).__name__)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+async def _open_stream(port, cookie, timeout):
+    reader, writer = await asyncio.wait_for(asyncio.open_connection("127.0.0.1", port), timeout)
+    writer.write(f"GET /activities/stream HTTP/1.1\r\nHost: 127.0.0.1\r\nCookie: {cookie}\r\n\r\n".encode())
+    return reader, writer
+
+
+async def _run_level(port, cookie, clients, requests, timeout, streams):
+    opened = [await _open_stream(port, cookie, timeout) for _ in range(streams)]
+    await asyncio.sleep(0.5)  # let the server take them before the clock starts
+    latencies, errors = [], []
+    start = asyncio.Event()
+    tasks = [asyncio.ensure_future(_client(port, cookie, requests, timeout, latencies, errors, start))
+             for _ in range(clients)]
+    began = time.perf_counter()
+    start.set()
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - began
+    for _, writer in opened:
+        writer.close()
+    cuts = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else [0.0] * 99
+    return {"throughput": len(latencies) / elapsed, "p50_ms": cuts[49] * 1000, "p95_ms": cuts[94] * 1000,
+            "errors": len(errors)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--suggestions", type=int, default=20_000)
+    parser.add_argument("--activities", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[16, 64, 256], help="open client connections")
+    parser.add_argument("--requests", type=int, default=20, help="per client")
+    parser.add_argument("--streams", type=int, default=64, help="open activity streams in the last run")
+    parser.add_argument("--threads", type=int, default=16, help="connections per threaded worker")
+    parser.add_argument("--db-threads", type=int, default=8, help="database threads per asyncio worker")
+    parser.add_argument("--timeout", type=float, default=10.0, help="seconds before a request counts as failed")
+    args = parser.parse_args()
+
+    runs = [(clients, 0) for clients in args.concurrency]
+    if args.streams:
+        runs.append((args.concurrency[0], args.streams))
+    servers = {"threaded": ["--threads", str(args.threads)], "asyncio": ["--async", "--threads", str(args.db_threads)]}
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        database = os.path.join(workdir, "asgi.db")
+        admin_email, _ = load._prepare(database, args)
+        for kind, options in servers.items():
+            process, port = _start(database, options)
+            try:
+                cookie = _login(port, admin_email)
+                for clients, streams in runs:
+                    results[kind, clients, streams] = asyncio.run(
+                        _run_level(port, cookie, clients, args.requests, args.timeout, streams))
+            finally:
+                os.killpg(process.pid, signal.SIGKILL)
+                process.wait()
+
+    print(f"threaded: {args.threads} threads; asyncio: {args.db_threads} database threads; "
+          f"{args.requests} requests per client, {os.cpu_count()} CPUs")
+    print(f"{'clients':>8} {'streams':>8} {'threaded req/s':>15} {'p95 ms':>9} {'errors':>7} "
+          f"{'asyncio req/s':>14} {'p95 ms':>9} {'errors':>7}")
+    for clients, streams in runs:
+        threaded, asyncio_ = results["threaded", clients, streams], results["asyncio", clients, streams]
+        print(f"{clients:>8} {streams:>8} {threaded['throughput']:>15.1f} {threaded['p95_ms']:>9.1f} "
+              f"{threaded['errors']:>7} {asyncio_['throughput']:>14.1f} {asyncio_['p95_ms']:>9.1f} "
+              f"{asyncio_['errors']:>7}")
+
+
+if __name__ == "__main__":
+    main()
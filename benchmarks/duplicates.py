@@ -0,0 +1,92 @@
+"""
+Near-duplicate lookup cost as the suggestion table grows.
+
+    python -m benchmarks.duplicates                  # 10k and 100k suggestions
+    python -m benchmarks.duplicates --sizes 10000 200000
+
+Times the submit-time check (signature + LSH lookup) for a new, unrelated
+suggestion and for a reworded copy of an existing one. Both should stay flat
+as the table grows; the index build rate is reported too.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import duplicates
+from benchmarks import synthetic
+
+REPEAT = 50
+
+# synthetic.WORDS is too small a vocabulary for this: random texts drawn from it share
+# most of their shingles. Pseudo-words give realistic (low) background similarity.
+_SYLLABLES = "ba ka da ga la ma na pa sa ta wa yo ri lu ne ko mi su to".split()
+
+
+def _vocabulary(rng, size=5000):
+    return ["".join(rng.choice(_SYLLABLES) for _ in range(rng.randint(2, 4))) for _ in range(size)]
+
+
+def _text(rng, vocabulary, words=40):
+    return " ".join(rng.choice(vocabulary) for _ in range(words))
+
+
+def _reworded(rng, text):
+    # Drop and swap a few words, like a resubmission in other words
+    words = text.split()
+    for _ in range(3):
+        del words[rng.randrange(len(words))]
+    i = rng.randrange(len(words) - 1)
+    words[i], words[i + 1] = words[i + 1], words[i]
+    return " ".join(words)
+
+
+def _timed(fn, inputs):
+    start = time.perf_counter()
+    for value in inputs:
+        fn(value)
+    return (time.perf_counter() - start) / len(inputs) * 1000
+
+
+def run(size, workdir):
+    rng = random.Random(size)
+    vocabulary = _vocabulary(rng)
+    con = synthetic.create_database(os.path.join(workdir, f"duplicates-{size}.db"))
+    texts = [_text(rng, vocabulary) for _ in range(size)]
+    con.execute("BEGIN")
+    con.executemany('''
+        INSERT INTO suggestions (user_id, fullname, email, sdg_category, title, description)
+        VALUES (1, 'User 1', 'user1@example.com', 'SDG 6: Clean Water', '', ?)
+    ''', ((text,) for text in texts))
+    start = time.perf_counter()
+    duplicates.backfill(con)
+    con.execute("COMMIT")
+    build_rate = size / (time.perf_counter() - start)
+
+    def lookup(text):
+        return duplicates.find_similar(con, duplicates.signature(text), limit=1)
+
+    fresh = [_text(rng, vocabulary) for _ in range(REPEAT)]
+    copies = [_reworded(rng, rng.choice(texts)) for _ in range(REPEAT)]
+    fresh_ms = _timed(lookup, fresh)
+    copy_ms = _timed(lookup, copies)
+    found = sum(bool(lookup(text)) for text in copies) / REPEAT
+    con.close()
+    return build_rate, fresh_ms, copy_ms, found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'index rows/s':>13} {'new ms':>8} {'copy ms':>8} {'copies found':>13}")
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in args.sizes:
+            build_rate, fresh_ms, copy_ms, found = run(size, workdir)
+            print(f"{size:>10} {build_rate:>13.0f} {fresh_ms:>8.3f} {copy_ms:>8.3f} {found:>13.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Conditional GETs: full renders vs. cached pages vs. 304 revalidations.
+
+    python -m benchmarks.etag                         # 2k users, 50k suggestions
+    python -m benchmarks.etag --requests 5000 --templates ../templates
+
+For each of /dashboard, /manage and /suggestions, times GETs through
+the Flask test client with PAGE_CACHE off (every request queries and renders),
+on without If-None-Match (the rendered page is reused) and on with the page's
+ETag (304). The HTML templates aren't in this repository, so pages render as
+empty strings unless --templates points at them; rendering costs are then missing
+from the "off" column.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import jinja2
+
+import app as webapp
+from benchmarks import synthetic
+
+PAGES = ("/dashboard", "/manage", "/suggestions")  # /statistics isn't cached: always rendered
+
+
+def _rate(client, path, n, headers=None):
+    client.get(path, headers=headers)
+    start = time.perf_counter()
+    for _ in range(n):
+        client.get(path, headers=headers)
+    return n / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--suggestions", type=int, default=50_000)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--templates", help="folder with the real templates")
+    args = parser.parse_args()
+
+    webapp.app.jinja_env.loader = (jinja2.FileSystemLoader(args.templates) if args.templates
+                                   else jinja2.FunctionLoader(lambda name: ""))
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, "etag.db")
+        synthetic.populate(path, users=args.users, suggestions=args.suggestions, activities=args.suggestions).close()
+        webapp.app.config["DATABASE"] = path
+
+        client = webapp.app.test_client()
+        with client.session_transaction() as sess:
+            sess.update(user_id=1, role="admin", fullname="Bench Admin", avatar="BA", email="bench@example.com")
+
+        print(f"{'page':<14} {'off req/s':>10} {'cached req/s':>13} {'304 req/s':>10}")
+        for path in PAGES:
+            webapp.app.config["PAGE_CACHE"] = False
+            off = _rate(client, path, args.requests)
+            webapp.app.config["PAGE_CACHE"] = True
+            cached = _rate(client, path, args.requests)
+            tag = client.get(path).headers["ETag"]
+            not_modified = _rate(client, path, args.requests, headers={"If-None-Match": tag})
+            assert client.get(path, headers={"If-None-Match": tag}).status_code == 304
+            print(f"{path:<14} {off:>10.0f} {cached:>13.0f} {not_modified:>10.0f}")
+        webapp.get_activity_writer().close()
+
+
+if __name__ == "__main__":
+    main()
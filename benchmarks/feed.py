@@ -0,0 +1,121 @@
+"""
+Live activity feed fan-out: many idle SSE subscribers, one activity at a time.
+
+    python -m benchmarks.feed                        # 200 subscribers, 20 activities
+    python -m benchmarks.feed --subscribers 500 --activities 50
+
+Subscribers connect over real HTTP to a threaded werkzeug server. Reports the
+delay from log_activity() to each subscriber receiving the event, and how many
+database queries the feed ran (one per batch, whatever the subscriber count).
+"""
+import argparse
+import http.client
+import logging
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+from werkzeug.serving import make_server
+
+import app as webapp
+import passwords
+from benchmarks import synthetic
+
+
+def _cookie(port, email):
+    con = http.client.HTTPConnection("127.0.0.1", port)
+    con.request("POST", "/login", body=f"email={email}&password=password123",
+                headers={"Content-Type": "application/x-www-form-urlencoded"})
+    response = con.getresponse()
+    response.read()
+    con.close()
+    return response.getheader("Set-Cookie").split(";")[0]
+
+
+def _subscriber(port, cookie, expected, connected, received):
+    con = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    con.request("GET", "/activities/stream", headers={"Cookie": cookie})
+    response = con.getresponse()
+    response.readline()  # retry:
+    response.readline()
+    connected.release()
+    seen = 0
+    while seen < expected:
+        line = response.readline()
+        if line.startswith(b"data:"):
+            received.append(time.perf_counter())
+            seen += 1
+    con.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--subscribers", type=int, default=200)
+    parser.add_argument("--activities", type=int, default=20)
+    args = parser.parse_args()
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, "feed.db")
+        con = synthetic.populate(path, users=10, suggestions=100, activities=1000)
+        con.execute("UPDATE users SET password = ?", (passwords.hash_password("password123"),))
+        email = con.execute("SELECT email FROM users WHERE id = 1").fetchone()[0]
+        con.close()
+        webapp.app.config.update(DATABASE=path, PASSWORD_HASH_WORKERS=0,
+                                 FEED_MAX_SUBSCRIBERS=args.subscribers, ACTIVITY_FLUSH_INTERVAL=0.001)
+
+        server = make_server("127.0.0.1", 0, webapp.app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        cookie = _cookie(server.server_port, email)
+
+        connected = threading.Semaphore(0)
+        received = [[] for _ in range(args.activities)]
+        stamps = []  # per subscriber, in arrival order
+        clients = []
+        for _ in range(args.subscribers):
+            arrivals = []
+            stamps.append(arrivals)
+            t = threading.Thread(target=_subscriber, args=(server.server_port, cookie, args.activities,
+                                                           connected, arrivals), daemon=True)
+            t.start()
+            clients.append(t)
+        for _ in range(args.subscribers):
+            connected.acquire()
+
+        activity_feed = webapp.get_feed()
+        pool = webapp.get_pool()
+        polls, acquired = activity_feed.stats()["polls"], pool.stats()["acquired"]
+        threads = threading.active_count()
+        sent = []
+        for i in range(args.activities):
+            sent.append(time.perf_counter())
+            webapp.log_activity(1, f"benchmark activity {i}")
+            # Wait until everyone has it, so each event is timed on its own
+            while any(len(arrivals) <= i for arrivals in stamps):
+                time.sleep(0.0005)
+        for t in clients:
+            t.join()
+
+        for arrivals in stamps:
+            for i, at in enumerate(arrivals):
+                received[i].append(at - sent[i])
+        delays = sorted(d for per_event in received for d in per_event)
+        cuts = statistics.quantiles(delays, n=100)
+        stats = activity_feed.stats()
+
+        print(f"subscribers              {args.subscribers}")
+        print(f"threads while connected  {threads}")
+        print(f"events delivered         {len(delays)}")
+        print(f"delivery p50             {cuts[49] * 1000:.1f} ms")
+        print(f"delivery p99             {cuts[98] * 1000:.1f} ms")
+        print(f"last subscriber, mean    {statistics.fmean(max(e) for e in received) * 1000:.1f} ms")
+        print(f"feed queries             {stats['polls'] - polls} for {args.activities} activities")
+        print(f"pooled connections used  {pool.stats()['acquired'] - acquired}")
+        server.shutdown()
+        webapp.get_activity_writer().close()
+
+
+if __name__ == "__main__":
+    main()
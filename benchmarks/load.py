@@ -0,0 +1,273 @@
+"""
+Load test: every main route against a synthetic database, with p50/p95/p99
+latency and throughput per endpoint, saved as JSON for comparing runs.
+
+    python -m benchmarks.load                               # 1k users, 20k suggestions, test client
+    python -m benchmarks.load --users 10000 --suggestions 500000 --threads 8
+    python -m benchmarks.load --http --threads 16            # real HTTP against a threaded server
+    python -m benchmarks.load --output after.json --compare before.json
+
+The database is a throwaway file built by benchmarks.synthetic; database.db is
+never touched. The HTML templates aren't in this repository, so pages render
+as empty strings unless --templates points at a template folder.
+With --compare, any endpoint whose p95 got more than --tolerance slower is
+reported and the exit status is 1.
+"""
+import argparse
+import http.cookiejar
+import itertools
+import json
+import logging
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+import jinja2
+from werkzeug.serving import make_server
+
+import app as webapp
+import passwords
+from benchmarks import synthetic
+
+PASSWORD = "password123"
+
+
+def _scenario(admin_email, suggestion_ids, rng):
+    """(name, expected status, generator of (method, path, form data)), one per endpoint."""
+    ids = itertools.cycle(suggestion_ids)
+    words = itertools.cycle(synthetic.WORDS)
+    counter = itertools.count()
+    return [
+        ("login", 302, lambda: ("POST", "/login", {"email": admin_email, "password": PASSWORD})),
+        ("dashboard", 200, lambda: ("GET", "/dashboard", None)),
+        ("manage", 200, lambda: ("GET", "/manage", None)),
+        ("statistics", 200, lambda: ("GET", "/statistics", None)),
+        ("suggestions", 200, lambda: ("GET", "/suggestions?status=pending", None)),
+        ("search", 200, lambda: ("GET", f"/suggestions/search?q={next(words)}+{rng.choice(synthetic.PLACES)}", None)),
+        ("submit", 302, lambda: ("POST", "/submit-suggestion", {
+            "email": admin_email, "sdg_category": rng.choice(synthetic.SDG_CATEGORIES),
+            "title": f"Load test {next(counter)}", "description": synthetic._description(rng)})),
+        ("moderate", 302, lambda: ("POST", f"/update-suggestion/{next(ids)}",
+                                   {"status": rng.choice(["approved", "rejected", "pending"])})),
+    ]
+
+
+def _failed(status, location, expected):
+    # Anything but the expected status: a 4xx (429 when throttled), a 5xx, a failed login's 200 page. Routes
+    # also report most failures as a redirect carrying ?error=, and a lost session as a redirect to /login
+    location = location or ""
+    return (status != expected or status >= 400 or "error=" in location
+            or urllib.parse.urlsplit(location).path == "/login")
+
+
+class ClientDriver:
+    """In-process, through the Flask test client (one client per thread)."""
+
+    def __init__(self, admin_email):
+        self.admin_email = admin_email
+
+    def session(self):
+        client = webapp.app.test_client()
+        client.post("/login", data={"email": self.admin_email, "password": PASSWORD})
+        return client
+
+    def request(self, client, method, path, data):
+        response = client.open(path, method=method, data=data)
+        response.close()
+        return response.status_code, response.headers.get("Location")
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HttpDriver:
+    """Real sockets against a threaded werkzeug server started in this process, or the server at `base`."""
+
+    def __init__(self, admin_email, base=None):
+        self.admin_email = admin_email
+        self.server = None
+        self.base = base
+        if base is None:
+            # One access-log line per request would swamp the report (and the timings)
+            logging.getLogger("werkzeug").setLevel(logging.WARNING)
+            self.server = make_server("127.0.0.1", 0, webapp.app, threaded=True)
+            self.base = f"http://127.0.0.1:{self.server.server_port}"
+            threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def session(self):
+        opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect)
+        self.request(opener, "POST", "/login", {"email": self.admin_email, "password": PASSWORD})
+        return opener
+
+    def request(self, opener, method, path, data):
+        body = urllib.parse.urlencode(data).encode() if data is not None else None
+        try:
+            with opener.open(urllib.request.Request(self.base + path, data=body, method=method)) as response:
+                response.read()
+                return response.status, response.headers.get("Location")
+        except urllib.error.HTTPError as e:
+            return e.code, e.headers.get("Location")
+
+    def close(self):
+        if self.server is not None:
+            self.server.shutdown()
+
+
+def _run_endpoint(driver, make_request, expected, threads, requests):
+    latencies, errors = [], 0
+    lock = threading.Lock()
+    per_thread = max(requests // threads, 1)
+    # Log everyone in before the clock starts, so throughput isn't diluted by the KDF
+    ready = threading.Barrier(threads + 1)
+
+    def worker():
+        nonlocal errors
+        session = driver.session()
+        ready.wait()
+        mine, failed = [], 0
+        for _ in range(per_thread):
+            method, path, data = make_request()
+            start = time.perf_counter()
+            status, location = driver.request(session, method, path, data)
+            mine.append(time.perf_counter() - start)
+            failed += _failed(status, location, expected)
+        with lock:
+            latencies.extend(mine)
+            errors += failed
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for t in pool:
+        t.start()
+    ready.wait()
+    start = time.perf_counter()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    cuts = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput": round(len(latencies) / elapsed, 1),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 3),
+        "p50_ms": round(cuts[49] * 1000, 3),
+        "p95_ms": round(cuts[94] * 1000, 3),
+        "p99_ms": round(cuts[98] * 1000, 3),
+    }
+
+
+def _prepare(path, args):
+    con = synthetic.populate(path, users=args.users, suggestions=args.suggestions,
+                             activities=args.activities, seed=args.seed)
+    # One known password for everyone, already hashed, so login measures the real KDF
+    con.execute("UPDATE users SET password = ?", (passwords.hash_password(PASSWORD),))
+    con.execute("UPDATE users SET role = 'admin' WHERE id = 1")
+    admin_email = con.execute("SELECT email FROM users WHERE id = 1").fetchone()[0]
+    ids = [row[0] for row in con.execute("SELECT id FROM suggestions ORDER BY random() LIMIT 1000")]
+    con.close()
+    return admin_email, ids
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, baseline, tolerance):
+    """Endpoints whose p95 is more than `tolerance` (a fraction) slower than in `baseline`."""
+    regressions = []
+    for key in ("mode", "scale", "threads"):
+        if current.get(key) != baseline.get(key):
+            print(f"warning: {key} differs from the baseline ({baseline.get(key)} vs {current.get(key)})")
+    for name, result in current["endpoints"].items():
+        before = baseline["endpoints"].get(name)
+        if before and before["p95_ms"] > 0:
+            change = result["p95_ms"] / before["p95_ms"] - 1
+            print(f"{name:<12} p95 {before['p95_ms']:>9.2f} -> {result['p95_ms']:>9.2f} ms ({change:+.0%})")
+            if change > tolerance:
+                regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--suggestions", type=int, default=20_000)
+    parser.add_argument("--activities", type=int, default=20_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=400, help="per endpoint")
+    parser.add_argument("--endpoints", nargs="+", help="default: all")
+    parser.add_argument("--http", action="store_true", help="drive a real threaded HTTP server")
+    parser.add_argument("--templates", help="folder with the real templates")
+    parser.add_argument("--output", help="write results as JSON here")
+    parser.add_argument("--compare", help="JSON from an earlier run")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p95 slowdown (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    if args.templates:
+        webapp.app.jinja_env.loader = jinja2.FileSystemLoader(args.templates)
+    else:
+        webapp.app.jinja_env.loader = jinja2.FunctionLoader(lambda name: "")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        webapp.app.config["DATABASE"] = os.path.join(workdir, "load.db")
+        webapp.app.config["DB_POOL_SIZE"] = max(webapp.app.config["DB_POOL_SIZE"], args.threads)
+        # Every request comes from one address and one account: the limits would throttle the run
+        webapp.app.config["RATE_LIMITS"] = {}
+        admin_email, ids = _prepare(webapp.app.config["DATABASE"], args)
+        driver = (HttpDriver if args.http else ClientDriver)(admin_email)
+
+        rng = random.Random(args.seed)
+        endpoints = {}
+        print(f"{'endpoint':<12} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+        for name, expected, make_request in _scenario(admin_email, ids, rng):
+            if args.endpoints and name not in args.endpoints:
+                continue
+            result = _run_endpoint(driver, make_request, expected, args.threads, args.requests)
+            endpoints[name] = result
+            print(f"{name:<12} {result['throughput']:>8.1f} {result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f} "
+                  f"{result['p99_ms']:>8.2f} {result['errors']:>7}")
+        if args.http:
+            driver.close()
+        webapp.get_activity_writer().close()
+
+    run = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "cpus": os.cpu_count(),
+        "mode": "http" if args.http else "client",
+        "scale": {"users": args.users, "suggestions": args.suggestions, "activities": args.activities},
+        "threads": args.threads,
+        "endpoints": endpoints,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(run, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(run, json.load(f), args.tolerance)
+        if regressions:
+            print(f"p95 regressions over {args.tolerance:.0%}: {', '.join(regressions)}")
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
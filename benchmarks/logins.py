@@ -0,0 +1,94 @@
+"""
+Login throughput with scrypt at different hash-pool sizes.
+
+    python -m benchmarks.logins                      # pool sizes 0 (inline), 1, 2, 4 and one per core
+    python -m benchmarks.logins --workers 0 2 --threads 32 --logins 400
+
+Concurrent request threads POST /login through the Flask test client against a
+throwaway database. Logins/second should rise with the pool size until it
+reaches the number of cores.
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+import app as webapp
+import passwords
+from benchmarks import synthetic
+
+USERS = 100
+
+
+def _prepare(path):
+    con = synthetic.populate(path, users=USERS, suggestions=0, activities=0)
+    # Same hash for every user: the cost per login is what matters, not distinct salts
+    con.execute("UPDATE users SET password = ?", (passwords.hash_password("password123"),))
+    con.close()
+
+
+def _reset():
+    for name in ("activity_writer", "password_hasher", "sqlite_pool", "sqlite_writer", "sqlite_schema_ready"):
+        resource = webapp.app.extensions.pop(name, None)
+        if hasattr(resource, "close"):
+            resource.close()
+
+
+def run(workers, threads, logins):
+    _reset()
+    webapp.app.config["PASSWORD_HASH_WORKERS"] = workers
+    webapp.app.config["PASSWORD_HASH_MAX_PENDING"] = max(threads, 1)
+    webapp.app.config["RATE_LIMITS"] = {}  # hundreds of logins from one address, by design
+    per_thread = logins // threads
+    latencies = []
+    lock = threading.Lock()
+
+    def login(i):
+        response = webapp.app.test_client().post(
+            "/login", data={"email": f"user{i % USERS}@example.com", "password": "password123"})
+        assert response.status_code == 302, response.status_code
+
+    login(0)  # start the pool's worker processes outside the timed part
+
+    def client(thread_id):
+        mine = []
+        for i in range(per_thread):
+            start = time.perf_counter()
+            login(thread_id * per_thread + i)
+            mine.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(mine)
+
+    pool = [threading.Thread(target=client, args=(t,)) for t in range(threads)]
+    start = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - start
+    _reset()
+    return len(latencies) / elapsed, statistics.median(latencies), statistics.quantiles(latencies, n=20)[-1]
+
+
+def main():
+    cores = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=sorted({0, 1, 2, 4, cores}))
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--logins", type=int, default=320)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        webapp.app.config["DATABASE"] = os.path.join(workdir, "logins.db")
+        _prepare(webapp.app.config["DATABASE"])
+        print(f"{cores} cores, {args.threads} request threads, {args.logins} logins")
+        print(f"{'workers':>8} {'logins/s':>9} {'p50 ms':>8} {'p95 ms':>8}")
+        for workers in args.workers:
+            rate, p50, p95 = run(workers, args.threads, args.logins)
+            print(f"{workers:>8} {rate:>9.1f} {p50 * 1000:>8.1f} {p95 * 1000:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
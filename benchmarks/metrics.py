@@ -0,0 +1,65 @@
+"""
+Per-request cost of the metrics hooks.
+
+    python -m benchmarks.metrics                     # 20k requests each way
+    python -m benchmarks.metrics --requests 50000
+
+Times a cheap route (GET /logout, a redirect with no database work) through the
+Flask test client with METRICS on and off, and the bare registry operations a
+request performs.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import app as webapp
+import metrics
+
+
+def _per_request(n):
+    client = webapp.app.test_client()
+    client.get("/logout")
+    start = time.perf_counter()
+    for _ in range(n):
+        client.get("/logout")
+    return (time.perf_counter() - start) / n * 1e6
+
+
+def _registry_ops(n):
+    registry = metrics.Registry()
+    requests_total = registry.counter("r", "r", ("endpoint", "method", "status"))
+    latency = registry.histogram("l", "l", ("endpoint", "method"))
+    in_progress = registry.gauge("p", "p")
+    start = time.perf_counter()
+    for _ in range(n):
+        in_progress.inc()
+        latency.labels("home", "GET").observe(0.0042)
+        requests_total.labels("home", "GET", 302).inc()
+        in_progress.dec()
+    return (time.perf_counter() - start) / n * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        webapp.app.config["DATABASE"] = os.path.join(workdir, "metrics.db")
+        results = {}
+        # Alternate so drift (CPU frequency, caches) hits both sides alike
+        for _ in range(7):
+            for enabled in (False, True):
+                webapp.app.config["METRICS"] = enabled
+                results.setdefault(enabled, []).append(_per_request(args.requests // 7))
+        off, on = min(results[False]), min(results[True])
+
+    print(f"{'metrics off':<24} {off:>8.1f} us/request")
+    print(f"{'metrics on':<24} {on:>8.1f} us/request")
+    print(f"{'overhead':<24} {on - off:>8.1f} us/request ({(on - off) / off:.1%})")
+    print(f"{'registry ops alone':<24} {_registry_ops(args.requests):>8.1f} us/request")
+
+
+if __name__ == "__main__":
+    main()
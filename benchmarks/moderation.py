@@ -0,0 +1,82 @@
+"""
+Moderation throughput: one transaction per suggestion (update_suggestion) vs
+one transaction for the whole batch (bulk_update_suggestions).
+
+    python -m benchmarks.moderation                  # 1k and 10k pending suggestions
+    python -m benchmarks.moderation --sizes 5000 --mode wal
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import moderation
+import storage
+from benchmarks import synthetic
+
+
+def _fresh(workdir, name, size, pragmas):
+    path = os.path.join(workdir, f"{name}-{size}.db")
+    synthetic.populate(path, users=100, suggestions=size, activities=0).close()
+    writer = storage.SerializedWriter(path, pragmas=pragmas)
+    with writer.transaction() as cur:
+        cur.execute("UPDATE suggestions SET status = 'pending'")
+        ids = [row[0] for row in cur.execute("SELECT id FROM suggestions")]
+    return writer, ids
+
+
+def per_item(writer, ids):
+    # What update_suggestion does per POST: SELECT, UPDATE, commit, activity row
+    for suggestion_id in ids:
+        with writer.transaction() as cur:
+            cur.execute("SELECT status FROM suggestions WHERE id = ?", (suggestion_id,))
+            if cur.fetchone():
+                cur.execute("UPDATE suggestions SET status = ? WHERE id = ?", ("approved", suggestion_id))
+        with writer.transaction() as cur:
+            cur.execute("INSERT INTO activities (user_id, message) VALUES (1, ?)",
+                        (f"Admin approved suggestion #{suggestion_id}",))
+
+
+def bulk_ids(writer, ids):
+    with writer.transaction() as cur:
+        moderation.bulk_update(cur, "approved", ids=ids)
+    with writer.transaction() as cur:
+        cur.execute("INSERT INTO activities (user_id, message) VALUES (1, ?)",
+                    (f"Admin approved {len(ids)} suggestions",))
+
+
+def bulk_filter(writer, ids):
+    where, params = moderation.filter_clause(status="pending")
+    with writer.transaction() as cur:
+        moderation.bulk_update(cur, "approved", where=where, params=params)
+    with writer.transaction() as cur:
+        cur.execute("INSERT INTO activities (user_id, message) VALUES (1, 'Admin approved all pending')")
+
+
+def run(size, workdir, pragmas):
+    results = []
+    for name, fn in (("per item", per_item), ("bulk ids", bulk_ids), ("bulk filter", bulk_filter)):
+        writer, ids = _fresh(workdir, name.replace(" ", "-"), size, pragmas)
+        start = time.perf_counter()
+        fn(writer, ids)
+        elapsed = time.perf_counter() - start
+        writer.close()
+        results.append((name, elapsed, size / elapsed))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000])
+    parser.add_argument("--mode", choices=sorted(storage.STORAGE_MODES), default="default")
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} {'path':<12} {'seconds':>9} {'rows/s':>11}")
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in args.sizes:
+            for name, elapsed, rate in run(size, workdir, storage.STORAGE_MODES[args.mode]):
+                print(f"{size:>8} {name:<12} {elapsed:>9.3f} {rate:>11.0f}")
+
+
+if __name__ == "__main__":
+    main()
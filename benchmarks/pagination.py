@@ -0,0 +1,68 @@
+"""
+Keyset vs OFFSET pagination at growing table sizes.
+
+    python -m benchmarks.pagination                  # 10k, 100k and 1M rows
+    python -m benchmarks.pagination --sizes 10000 50000
+
+Keyset pages should cost the same at any depth; OFFSET pages grow with the depth.
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+from benchmarks import synthetic
+
+PAGE = 25
+REPEAT = 20
+
+KEYSET = '''
+    SELECT id, fullname, email, sdg_category, title, description, status, created_at
+    FROM suggestions WHERE created_at <= ? AND (created_at < ? OR id < ?)
+    ORDER BY created_at DESC, id DESC LIMIT ?
+'''
+OFFSET = '''
+    SELECT id, fullname, email, sdg_category, title, description, status, created_at
+    FROM suggestions ORDER BY created_at DESC, id DESC LIMIT ? OFFSET ?
+'''
+
+
+def _timed(con, sql, params):
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        con.execute(sql, params).fetchall()
+    return (time.perf_counter() - start) / REPEAT * 1000
+
+
+def run(size, workdir):
+    path = os.path.join(workdir, f"pagination-{size}.db")
+    con = synthetic.populate(path, users=100, suggestions=size, activities=0)
+    con.row_factory = sqlite3.Row
+
+    results = []
+    for depth in (0.0, 0.5, 0.99):
+        offset = int(size * depth)
+        # Cursor = sort key of the row just before the page, as the route would have issued it
+        anchor = con.execute(OFFSET, (1, max(offset - 1, 0))).fetchone()
+        keyset_ms = _timed(con, KEYSET, (anchor["created_at"], anchor["created_at"], anchor["id"], PAGE))
+        offset_ms = _timed(con, OFFSET, (PAGE, offset))
+        results.append((depth, keyset_ms, offset_ms))
+    con.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'depth':>6} {'keyset ms':>10} {'offset ms':>10}")
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in args.sizes:
+            for depth, keyset_ms, offset_ms in run(size, workdir):
+                print(f"{size:>10} {depth:>6.0%} {keyset_ms:>10.3f} {offset_ms:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
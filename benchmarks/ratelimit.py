@@ -0,0 +1,79 @@
+"""
+Per-request cost of the rate limits.
+
+    python -m benchmarks.ratelimit                     # 20k requests each way
+    python -m benchmarks.ratelimit --requests 50000 --keys 100000
+
+Times a POST /register that fails validation (mismatched passwords: no
+database, no hash, but the register_ip check) through the Flask test client
+with no limits and with each backend, then the bare limiter.acquire() calls
+spread over --keys client IPs. Limits are set high enough that nothing is
+refused. The HTML templates aren't in this repository, so the form renders as
+an empty string.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import jinja2
+
+import app as webapp
+import ratelimit
+
+BACKENDS = ("memory", "shared")
+FORM = {"fullname": "A", "email": "a@example.com", "password": "secret1", "confirm_password": "secret2"}
+
+
+def _per_request(n):
+    client = webapp.app.test_client()
+    client.post("/register", data=FORM)
+    start = time.perf_counter()
+    for _ in range(n):
+        client.post("/register", data=FORM)
+    return (time.perf_counter() - start) / n * 1e6
+
+
+def _acquires(backend, n, keys):
+    counters = ratelimit.SharedCounters(size=2 * keys) if backend == "shared" else ratelimit.MemoryCounters(size=keys)
+    limiter = ratelimit.RateLimiter({"login_ip": (10 ** 9, 60)}, counters)
+    ips = [f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}" for i in range(keys)]
+    start = time.perf_counter()
+    for i in range(n):
+        limiter.acquire("login_ip", ips[i % keys])
+    elapsed = time.perf_counter() - start
+    limiter.close()
+    return elapsed / n * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--keys", type=int, default=10_000, help="distinct client IPs for the bare acquire() calls")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        webapp.create_app({"DATABASE": os.path.join(workdir, "ratelimit.db"), "ARCHIVE_DIR": workdir})
+        webapp.app.jinja_env.loader = jinja2.FunctionLoader(lambda name: "")
+        results = {}
+        # Alternate so drift (CPU frequency, caches) hits every side alike
+        for _ in range(7):
+            for backend in (None, *BACKENDS):
+                webapp.close_resources(("rate_limiter",))
+                webapp.app.config["RATE_LIMITS"] = {"register_ip": (10 ** 9, 60)} if backend else {}
+                webapp.app.config["RATE_LIMIT_BACKEND"] = backend or "memory"
+                results.setdefault(backend, []).append(_per_request(args.requests // 7))
+        webapp.close_resources()
+    off = min(results[None])
+
+    print(f"{'no limits':<24} {off:>8.1f} us/request")
+    for backend in BACKENDS:
+        on = min(results[backend])
+        print(f"{backend + ' backend':<24} {on:>8.1f} us/request, overhead {on - off:>5.1f} us ({(on - off) / off:.1%})")
+    for backend in BACKENDS:
+        print(f"{backend + ' acquire() alone':<24} {_acquires(backend, args.requests, args.keys):>8.2f} us/call "
+              f"over {args.keys} keys")
+
+
+if __name__ == "__main__":
+    main()
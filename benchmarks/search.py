@@ -0,0 +1,78 @@
+"""
+Full-text search (FTS5 + BM25) vs a LIKE scan over suggestions.
+
+    python -m benchmarks.search                  # 1M suggestions
+    python -m benchmarks.search --size 100000
+
+Times one 25-row page per query. Selective terms (a place name) are where the
+index shines; a word that is in most rows still has to rank every match.
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+import search
+from benchmarks import synthetic
+
+PAGE = 25
+REPEAT = 20
+
+LIKE = '''
+    SELECT id, title, status, created_at FROM suggestions
+    WHERE title LIKE ? OR description LIKE ?
+    ORDER BY created_at DESC, id DESC LIMIT ?
+'''
+
+QUERIES = [
+    ("rare word", "purok1234"),
+    ("rare + common", "purok1234 water"),
+    ("prefix", "purok123*"),
+    ("rare + status filter", "purok1234", "approved"),
+    ("common word", "water"),
+]
+
+
+def _timed(fn):
+    fn()  # warm the page cache
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        fn()
+    return (time.perf_counter() - start) / REPEAT * 1000
+
+
+def run(size, workdir):
+    path = os.path.join(workdir, f"search-{size}.db")
+    start = time.perf_counter()
+    con = synthetic.populate(path, users=1000, suggestions=size, activities=0)
+    build = time.perf_counter() - start
+    con.row_factory = sqlite3.Row
+
+    results = []
+    for label, query, *status in QUERIES:
+        status = status[0] if status else None
+        fts_ms = _timed(lambda: search.search(con, query, status=status, limit=PAGE))
+        # LIKE has no word boundaries or ranking; it is only the scan the index replaces
+        pattern = f"%{query.split()[0].rstrip('*')}%"
+        like_ms = _timed(lambda: con.execute(LIKE, (pattern, pattern, PAGE)).fetchall())
+        results.append((label, query, fts_ms, like_ms))
+    con.close()
+    return build, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        build, results = run(args.size, workdir)
+    print(f"{args.size} suggestions, built and indexed in {build:.1f}s")
+    print(f"{'query':<22} {'terms':<18} {'fts ms':>9} {'like ms':>9}")
+    for label, query, fts_ms, like_ms in results:
+        print(f"{label:<22} {query:<18} {fts_ms:>9.3f} {like_ms:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+The development server (app.run(debug=True), what `python app.py` starts)
+against the production one (python manage.py serve), over real HTTP.
+
+    python -m benchmarks.serve                              # 1k users, 20k suggestions
+    python -m benchmarks.serve --workers 4 --threads 32 --endpoints dashboard statistics
+
+Both servers run as separate processes on the same synthetic database and
+get the benchmarks.load scenario from --threads client threads; throughput
+and p95 per endpoint are printed side by side. The HTML templates aren't in
+this repository, so pages render as empty strings.
+"""
+import argparse
+import os
+import random
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+import jinja2
+
+import app as webapp
+import server
+from benchmarks import load
+
+SERVERS = ("dev", "serve")
+
+
+def _run_server(args):
+    # In the server process started by _start()
+    webapp.app.jinja_env.loader = jinja2.FunctionLoader(lambda name: "")
+    webapp.app.config["DATABASE"] = args.database
+    # The load scenario sends everything from one address and one account (see load.main)
+    webapp.app.config["RATE_LIMITS"] = {}
+    if args.run == "dev":
+        webapp.init_db()
+        webapp.app.run(debug=True, host="127.0.0.1", port=args.port)
+    else:
+        server.serve("127.0.0.1", args.port, workers=args.workers, threads=args.threads)
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _start(kind, database, args):
+    port = _free_port()
+    command = [sys.executable, "-m", "benchmarks.serve", "--run", kind, "--database", database, "--port", str(port),
+               "--workers", str(args.workers), "--threads", str(args.threads)]
+    # Own session: the dev server's reloader forks a child, and both must go at the end
+    process = subprocess.Popen(command, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+    base = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(base + "/metrics").close()
+            return process, base
+        except (urllib.error.URLError, ConnectionError):
+            time.sleep(0.1)
+    os.killpg(process.pid, signal.SIGKILL)
+    raise RuntimeError(f"the {kind} server didn't start")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--suggestions", type=int, default=20_000)
+    parser.add_argument("--activities", type=int, default=20_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--threads", type=int, default=16, help="client threads, and connections per worker")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--requests", type=int, default=400, help="per endpoint")
+    parser.add_argument("--endpoints", nargs="+", help="default: all")
+    parser.add_argument("--run", choices=SERVERS, help=argparse.SUPPRESS)
+    parser.add_argument("--database", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.run:
+        return _run_server(args)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        database = os.path.join(workdir, "serve.db")
+        admin_email, ids = load._prepare(database, args)
+        for kind in SERVERS:
+            process, base = _start(kind, database, args)
+            try:
+                driver = load.HttpDriver(admin_email, base=base)
+                rng = random.Random(args.seed)
+                for name, expected, make_request in load._scenario(admin_email, ids, rng):
+                    if not args.endpoints or name in args.endpoints:
+                        results.setdefault(name, {})[kind] = load._run_endpoint(
+                            driver, make_request, expected, args.threads, args.requests)
+            finally:
+                os.killpg(process.pid, signal.SIGTERM)
+                process.wait()
+
+    print(f"{args.workers} workers x {args.threads} threads, {args.threads} client threads, {os.cpu_count()} CPUs")
+    print(f"{'endpoint':<12} {'dev req/s':>10} {'serve req/s':>12} {'dev p95':>9} {'serve p95':>10} {'errors':>7}")
+    for name, by_kind in results.items():
+        dev, prod = by_kind["dev"], by_kind["serve"]
+        print(f"{name:<12} {dev['throughput']:>10.1f} {prod['throughput']:>12.1f} {dev['p95_ms']:>9.2f} "
+              f"{prod['p95_ms']:>10.2f} {dev['errors'] + prod['errors']:>7}")
+
+
+if __name__ == "__main__":
+    main()
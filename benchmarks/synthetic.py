@@ -0,0 +1,90 @@
+"""
+Synthetic data generator: fills a throwaway database with users, suggestions
+and activities at a configurable scale. Never point it at database.db.
+"""
+import random
+import sqlite3
+from datetime import datetime, timedelta
+
+import migrations
+
+ROLES = ["user"] * 18 + ["moderator", "admin"]
+STATUSES = ["pending", "approved", "rejected"]
+SDG_CATEGORIES = [
+    "SDG 1: No Poverty", "SDG 2: Zero Hunger", "SDG 3: Good Health", "SDG 4: Quality Education",
+    "SDG 6: Clean Water", "SDG 7: Affordable Energy", "SDG 11: Sustainable Cities", "SDG 13: Climate Action",
+]
+WORDS = (
+    "barangay water road drainage school clinic solar street light flood garbage collection "
+    "recycling tree planting market livelihood youth senior health center library park "
+    "bridge irrigation farm training program cleanup canal waste segregation scholarship"
+).split()
+
+# Place names give search something selective to find: each is in a few hundred rows per million
+PLACES = [f"purok{n}" for n in range(5000)]
+
+BATCH = 10000
+
+
+def _timestamps(count, days, rng):
+    # Spread over the last `days` days, oldest first, formatted like CURRENT_TIMESTAMP
+    now = datetime.utcnow()
+    start = now - timedelta(days=days)
+    step = (now - start) / max(count, 1)
+    for i in range(count):
+        jitter = timedelta(seconds=rng.randint(0, 59))
+        yield (start + step * i + jitter).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _sentence(rng, words):
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def _description(rng):
+    return f"{_sentence(rng, 20)} in {rng.choice(PLACES)} {_sentence(rng, 20)}"
+
+
+def create_database(path):
+    con = sqlite3.connect(path, isolation_level=None)
+    con.execute("PRAGMA journal_mode = WAL")
+    con.execute("PRAGMA synchronous = OFF")
+    migrations.migrate(con)
+    return con
+
+
+def _insert(con, sql, rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH:
+            con.executemany(sql, batch)
+            batch.clear()
+    if batch:
+        con.executemany(sql, batch)
+
+
+def populate(path, users=100, suggestions=1000, activities=1000, days=180, seed=42):
+    """Create (or extend) a database at `path`. Returns an open autocommit connection."""
+    rng = random.Random(seed)
+    con = create_database(path)
+    con.execute("BEGIN")
+    _insert(con, "INSERT INTO users (fullname, email, password, role, created_at) VALUES (?, ?, ?, ?, ?)", (
+        (f"User {i}", f"user{i}@example.com", "password123", rng.choice(ROLES), ts)
+        for i, ts in enumerate(_timestamps(users, days, rng))
+    ))
+    user_count = max(users, 1)
+    _insert(con, '''
+        INSERT INTO suggestions (user_id, fullname, email, sdg_category, title, description, status, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (
+        (uid, f"User {uid}", f"user{uid}@example.com", rng.choice(SDG_CATEGORIES),
+         _sentence(rng, 5).capitalize(), _description(rng), rng.choice(STATUSES), ts)
+        for uid, ts in ((rng.randrange(user_count) + 1, ts) for ts in _timestamps(suggestions, days, rng))
+    ))
+    _insert(con, "INSERT INTO activities (user_id, message, created_at) VALUES (?, ?, ?)", (
+        (rng.randrange(user_count) + 1, f"User {i} did something", ts)
+        for i, ts in enumerate(_timestamps(activities, days, rng))
+    ))
+    con.execute("COMMIT")
+    con.execute("ANALYZE")
+    return con
@@ -0,0 +1,98 @@
+"""
+Streamed export and chunked import at scale, with peak memory (RSS).
+
+    python -m benchmarks.transfer                    # 1M rows
+    python -m benchmarks.transfer --size 100000
+
+Each step runs in a fresh process so its peak RSS is its own. Peak RSS should
+stay flat as --size grows; only the run time should scale.
+"""
+import argparse
+import contextlib
+import csv
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+
+import passwords
+import storage
+import transfer
+from benchmarks import synthetic
+
+
+def _peak_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KiB on Linux
+
+
+def _export(path, table, fmt, out):
+    con = storage.connect(path)
+    start = time.perf_counter()
+    with open(out, "w", encoding="utf-8", newline="") as f:
+        for chunk in transfer.export_rows(lambda: contextlib.nullcontext(con), table, fmt):
+            f.write(chunk)
+    return time.perf_counter() - start
+
+
+def _import(path, table, source):
+    writer = storage.SerializedWriter(path)
+    start = time.perf_counter()
+    with open(source, encoding="utf-8", newline="") as f:
+        report = transfer.import_records(writer, table, transfer.read_records(f, "csv"))
+    assert report.failed == 0, report.errors[:5]
+    return time.perf_counter() - start
+
+
+def _child(step, args, results):
+    baseline = _peak_mb()
+    seconds = step(*args)
+    results.put((seconds, baseline, _peak_mb()))
+
+
+def _measure(ctx, step, *args):
+    results = ctx.Queue()
+    process = ctx.Process(target=_child, args=(step, args, results))
+    process.start()
+    outcome = results.get()
+    process.join()
+    return outcome
+
+
+def _users_csv(path, size):
+    # Already-hashed passwords, as when migrating from another system: hashing a million plain
+    # passwords would measure scrypt (see benchmarks/logins.py), not the import
+    password_hash = passwords.hash_password("password123")
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        out = csv.writer(f)
+        out.writerow(["fullname", "email", "password", "role"])
+        for i in range(size):
+            out.writerow([f"Imported {i}", f"imported{i}@example.com", password_hash, "user"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=1_000_000)
+    args = parser.parse_args()
+    ctx = multiprocessing.get_context("spawn")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, "transfer.db")
+        synthetic.populate(path, users=1000, suggestions=args.size, activities=0).close()
+        source = os.path.join(workdir, "users.csv")
+        _users_csv(source, args.size)
+
+        steps = [
+            ("export suggestions csv", _export, (path, "suggestions", "csv", os.path.join(workdir, "s.csv"))),
+            ("export suggestions jsonl", _export, (path, "suggestions", "jsonl", os.path.join(workdir, "s.jsonl"))),
+            ("import users csv", _import, (path, "users", source)),
+        ]
+        print(f"{args.size} rows per step")
+        print(f"{'step':<26} {'seconds':>8} {'rows/s':>9} {'start MB':>9} {'peak MB':>8}")
+        for name, step, step_args in steps:
+            seconds, baseline, peak = _measure(ctx, step, *step_args)
+            print(f"{name:<26} {seconds:>8.1f} {args.size / seconds:>9.0f} {baseline:>9.1f} {peak:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +0,0 @@
-from app import get_db
-con = get_db()
-con.execute("DELETE FROM suggestions")
-con.commit()
-print("Suggestions table cleaned")
@@ -0,0 +1,69 @@
+"""
+Shared pytest fixtures: point the app at a throwaway database, never database.db
+"""
+import jinja2
+import pytest
+from flask import template_rendered
+
+import app as webapp
+import migrations
+import storage
+
+
+@pytest.fixture(scope="session")
+def template_database(tmp_path_factory):
+    # Migrated once per session; every test starts from a copy of it
+    path = str(tmp_path_factory.mktemp("template") / "template.db")
+    con = storage.connect(path, isolation_level=None)
+    migrations.migrate(con)
+    con.close()
+    return path
+
+
+def _test_config(tmp_path, template_database, **config):
+    # Hash in the test's own thread: no worker processes to start for every test
+    return dict(DATABASE_TEMPLATE=template_database, TESTING=True, PASSWORD_HASH_WORKERS=0,
+                ARCHIVE_DIR=str(tmp_path / "archive"), **config)
+
+
+@pytest.fixture
+def temp_app(tmp_path, template_database):
+    # A private in-memory database, so tests share no file and can run side by side
+    yield webapp.create_app(_test_config(tmp_path, template_database, DATABASE=":memory:"))
+    webapp.create_app()
+
+
+@pytest.fixture
+def file_app(tmp_path, template_database):
+    # For tests whose other processes must open the same database
+    yield webapp.create_app(_test_config(tmp_path, template_database, DATABASE=str(tmp_path / "test.db")))
+    webapp.create_app()
+
+
+@pytest.fixture
+def client(temp_app):
+    # The HTML templates aren't in this repository; render every page as an empty string
+    loader = temp_app.jinja_env.loader
+    temp_app.jinja_env.loader = jinja2.FunctionLoader(lambda name: "")
+    temp_app.jinja_env.cache.clear()
+    yield temp_app.test_client()
+    temp_app.jinja_env.loader = loader
+    temp_app.jinja_env.cache.clear()
+
+
+@pytest.fixture
+def rendered(temp_app):
+    # [(template name, context)] for every render_template call during the test
+    calls = []
+
+    def record(sender, template, context, **extra):
+        calls.append((template.name, context))
+
+    template_rendered.connect(record, temp_app)
+    yield calls
+    template_rendered.disconnect(record, temp_app)
+
+
+def login(client, user_id=1, role="admin", fullname="Test Admin", email="admin@example.com"):
+    with client.session_transaction() as sess:
+        sess.update(user_id=user_id, fullname=fullname, role=role, avatar="TA", email=email)
@@ -0,0 +1,73 @@
+"""
+Process-level cache of the summary counts shown on /manage, /statistics and
+/suggestions. Each group is one GROUP BY pass, reloaded only after a write
+invalidates it, or when its table's data version (versions.py) moves on. Without
+a version, entries expire after `ttl` seconds to pick up other workers' writes.
+"""
+import threading
+import time
+
+GROUPS = {
+    "roles": "SELECT role, COUNT(*) FROM users GROUP BY role",
+    "statuses": "SELECT status, COUNT(*) FROM suggestions GROUP BY status",
+}
+
+# The table each group counts, whose data version decides whether an entry is current
+TABLES = {
+    "roles": "users",
+    "statuses": "suggestions",
+}
+
+
+class CounterCache:
+
+    def __init__(self, ttl=5.0):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._values = {}  # group -> (loaded_at, version, {key: count})
+        self._generation = 0  # bumped by invalidate()
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, con, group, version=None):
+        """
+        Counts for `group` as a dict; missing keys mean zero. `version` is the current
+        data version of the group's table, read before calling.
+        """
+        with self._lock:
+            cached = self._values.get(group)
+            if cached and (cached[1] == version if version is not None
+                           else time.monotonic() - cached[0] < self.ttl):
+                self.hits += 1
+                return dict(cached[2])
+            self.misses += 1
+            generation = self._generation
+
+        # Query outside the lock so a slow reload doesn't stall hits on other groups
+        loaded_at = time.monotonic()
+        counts = dict(con.execute(GROUPS[group]).fetchall())
+        with self._lock:
+            # A write that landed while we queried may not be in `counts`: don't cache it
+            if self._generation == generation:
+                self._values[group] = (loaded_at, version, counts)
+        return dict(counts)
+
+    def invalidate(self, *groups):
+        # Call after the write has committed, not before
+        with self._lock:
+            for group in groups or tuple(GROUPS):
+                self._values.pop(group, None)
+            self._generation += 1
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "invalidations": self.invalidations,
+            }
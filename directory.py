@@ -0,0 +1,98 @@
+"""
+Process-level directory of users: id -> fullname, email, role and initials, and
+email -> id. Loaded in one pass on first use, and again only after a write
+invalidates it or the users table's data version (versions.py) moves on, so
+pages show authors' current names without joining users on every row, and
+login and the admin forms skip a query. Passwords are never loaded into it.
+"""
+import threading
+
+QUERY = "SELECT id, fullname, email, role FROM users"
+
+
+def initials(fullname):
+    return "".join(part[0] for part in (fullname or "").split()).upper()[:2]
+
+
+class User:
+    __slots__ = ("id", "fullname", "email", "role", "initials")
+
+    def __init__(self, id, fullname, email, role):
+        self.id = id
+        self.fullname = fullname
+        self.email = email
+        self.role = role
+        self.initials = initials(fullname)
+
+
+class Snapshot:
+    """The users as of one load. Never modified: the next load replaces it whole."""
+
+    __slots__ = ("users", "emails")
+
+    def __init__(self, users):
+        self.users = {user.id: user for user in users}
+        self.emails = {user.email: user.id for user in users}
+
+    def __len__(self):
+        return len(self.users)
+
+    def get(self, user_id):
+        return self.users.get(user_id)
+
+    def find(self, email):
+        user_id = self.emails.get(email)
+        return None if user_id is None else self.users[user_id]
+
+    def name(self, user_id, default=None):
+        user = self.users.get(user_id)
+        return default if user is None else user.fullname
+
+
+class UserDirectory:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._version = None
+        self._generation = 0  # bumped by invalidate()
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, con, version):
+        """The current Snapshot. `version` is the users table's data version, read before calling."""
+        with self._lock:
+            if self._snapshot is not None and self._version == version:
+                self.hits += 1
+                return self._snapshot
+            self.misses += 1
+            generation = self._generation
+
+        # Load outside the lock, as CounterCache does; a write that landed meanwhile may be missing, so
+        # then the snapshot serves this caller only
+        snapshot = Snapshot([User(*row) for row in con.execute(QUERY)])
+        with self._lock:
+            if self._generation == generation:
+                self._snapshot, self._version = snapshot, version
+        return snapshot
+
+    def invalidate(self):
+        # Call after the write has committed, not before
+        with self._lock:
+            self._snapshot = None
+            self._generation += 1
+            self.invalidations += 1
+
+    def close(self):
+        self.invalidate()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "users": len(self._snapshot) if self._snapshot is not None else 0,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+            }
@@ -0,0 +1,130 @@
+"""
+Near-duplicate detection for suggestions: MinHash signatures over character
+shingles, bucketed with LSH. The signature and band tables (migration 5) are
+filled as suggestions are submitted, so a lookup reads a handful of buckets
+however many suggestions there are.
+"""
+import hashlib
+import re
+from array import array
+
+SIGNATURE_SIZE = 64
+BANDS = 16  # 16 bands of 4 rows: pairs above ~0.5 Jaccard usually share a bucket
+ROWS = SIGNATURE_SIZE // BANDS
+SHINGLE = 5
+
+_MAX = (1 << 32) - 1
+
+
+def _hash(value):
+    # Stable across processes and releases, unlike hash(): signatures are persisted
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+
+
+def shingles(text):
+    # Lowercased words joined by single spaces, so punctuation and spacing don't matter
+    normal = " ".join(re.findall(r"\w+", (text or "").lower()))
+    if len(normal) <= SHINGLE:
+        return {normal} if normal else set()
+    return {normal[i:i + SHINGLE] for i in range(len(normal) - SHINGLE + 1)}
+
+
+def signature(text):
+    """
+    One-permutation MinHash: each shingle is hashed once and kept as the minimum of
+    one of SIGNATURE_SIZE bins. Empty bins borrow the next filled one, so short texts
+    still compare sensibly. Costs one hash per shingle instead of one per bin.
+    """
+    sig = [None] * SIGNATURE_SIZE
+    for shingle in shingles(text):
+        h = _hash(shingle)
+        slot, value = h % SIGNATURE_SIZE, (h >> 6) & _MAX
+        if sig[slot] is None or value < sig[slot]:
+            sig[slot] = value
+    filled = [i for i, value in enumerate(sig) if value is not None]
+    if not filled:
+        return [_MAX] * SIGNATURE_SIZE
+    for i in range(SIGNATURE_SIZE):
+        if sig[i] is None:
+            nxt = next((j for j in filled if j > i), filled[0])
+            sig[i] = sig[nxt]
+    return sig
+
+
+def similarity(sig_a, sig_b):
+    # Fraction of matching minima estimates the Jaccard similarity of the shingle sets
+    return sum(x == y for x, y in zip(sig_a, sig_b)) / SIGNATURE_SIZE
+
+
+def bands(sig):
+    for band in range(BANDS):
+        chunk = array("I", sig[band * ROWS:(band + 1) * ROWS]).tobytes()
+        # Signed 64-bit, so it fits an SQLite INTEGER
+        yield band, int.from_bytes(hashlib.blake2b(chunk, digest_size=8).digest(), "big", signed=True)
+
+
+def _text(title, description):
+    return f"{title} {description}"
+
+
+def find_similar(con, sig, threshold=0.5, exclude=None, limit=10):
+    """[(similarity, suggestion_id)] for indexed suggestions at or above `threshold`, best first."""
+    keys = list(bands(sig))
+    placeholders = " OR ".join("(band = ? AND bucket = ?)" for _ in keys)
+    rows = con.execute(f'''
+        SELECT s.suggestion_id, s.signature FROM suggestion_signatures s
+        WHERE s.suggestion_id IN (SELECT suggestion_id FROM suggestion_lsh WHERE {placeholders})
+    ''', [value for key in keys for value in key]).fetchall()
+    scored = []
+    for suggestion_id, blob in rows:
+        if suggestion_id == exclude:
+            continue
+        score = similarity(sig, array("I", blob))
+        if score >= threshold:
+            scored.append((score, suggestion_id))
+    scored.sort(key=lambda pair: (-pair[0], pair[1]))
+    return scored[:limit]
+
+
+def index(con, suggestion_id, sig):
+    con.execute("INSERT OR REPLACE INTO suggestion_signatures (suggestion_id, signature) VALUES (?, ?)",
+                (suggestion_id, array("I", sig).tobytes()))
+    con.executemany("INSERT OR IGNORE INTO suggestion_lsh (band, bucket, suggestion_id) VALUES (?, ?, ?)",
+                    [(band, bucket, suggestion_id) for band, bucket in bands(sig)])
+
+
+def check_and_index(con, suggestion_id, title, description, threshold=0.5, sig=None):
+    """
+    Look up the closest existing suggestion, record it as duplicate_of, then add the new
+    one to the index. Run inside the insert's transaction. Returns (similarity, id) or None.
+    """
+    sig = sig or signature(_text(title, description))
+    matches = find_similar(con, sig, threshold, exclude=suggestion_id, limit=1)
+    if matches:
+        score, original = matches[0]
+        # Point at the group's original, not at another duplicate of it
+        root = con.execute("SELECT COALESCE(duplicate_of, id) FROM suggestions WHERE id = ?", (original,)).fetchone()
+        con.execute("UPDATE suggestions SET duplicate_of = ?, similarity = ? WHERE id = ?",
+                    (root[0], round(score, 3), suggestion_id))
+    index(con, suggestion_id, sig)
+    return matches[0] if matches else None
+
+
+def similar_to(con, suggestion_id, threshold=0.3, limit=10):
+    """[(similarity, suggestion_id)] most like an existing suggestion, from the persisted index."""
+    row = con.execute("SELECT signature FROM suggestion_signatures WHERE suggestion_id = ?",
+                      (suggestion_id,)).fetchone()
+    if row is None:
+        return []
+    return find_similar(con, array("I", row[0]), threshold, exclude=suggestion_id, limit=limit)
+
+
+def backfill(con, threshold=0.5):
+    # Migration step: index suggestions that predate the signature tables, oldest
+    # first, so earlier duplicates are grouped too
+    rows = con.execute('''
+        SELECT id, title, description FROM suggestions
+        WHERE id NOT IN (SELECT suggestion_id FROM suggestion_signatures) ORDER BY id
+    ''').fetchall()
+    for suggestion_id, title, description in rows:
+        check_and_index(con, suggestion_id, title, description, threshold)
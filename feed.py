@@ -0,0 +1,185 @@
+"""
+Live activity feed. One poller thread per process reads new activities rows and
+fans them out to every Server-Sent Events subscriber, so a subscriber costs a
+blocked generator, not a query or a pooled connection.
+"""
+import collections
+import json
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+RETRY_MS = 3000  # how long a disconnected EventSource waits before reconnecting
+
+NEW_ROWS = "SELECT id, message, created_at FROM activities WHERE id > ? ORDER BY id LIMIT ?"
+
+
+class FeedFull(Exception):
+    pass
+
+
+class ActivityFeed:
+    """
+    Keeps the last `buffer_size` activities in memory. Every row with an id above
+    `floor` is in the buffer, so a subscriber resuming from there never queries.
+    Writes from this process wake the poller straight away (notify()); other
+    processes' rows are picked up within `poll_interval`.
+    """
+
+    def __init__(self, connect, poll_interval=1.0, buffer_size=1000, max_subscribers=500):
+        self.connect = connect  # context manager yielding a read connection
+        self.poll_interval = poll_interval
+        self.buffer_size = buffer_size
+        self.max_subscribers = max_subscribers
+
+        self._events = collections.deque()  # (id, message, created_at), ascending id
+        self._cond = threading.Condition()
+        self._wake = threading.Event()
+        self._listeners = set()  # callables run on each publish and on close (async subscribers)
+        self._thread = None
+        self.closed = False
+        # None while nobody listens: the buffer is stale and is reset by the next subscribe()
+        self.last_id = None
+        self.floor = None
+
+        self.subscribers = 0
+        self.published = 0
+        self.polls = 0
+        self.refused = 0
+
+    def subscribe(self):
+        """Register a subscriber; returns the id of the newest activity. Raises FeedFull."""
+        with self._cond:
+            if self.subscribers >= self.max_subscribers:
+                self.refused += 1
+                raise FeedFull(f"{self.subscribers} feed subscribers already")
+            if self.last_id is None:
+                with self.connect() as con:
+                    newest = con.execute("SELECT COALESCE(MAX(id), 0) FROM activities").fetchone()[0]
+                self._events.clear()
+                self.last_id = self.floor = newest
+            self.subscribers += 1
+            self._ensure_started()
+            return self.last_id
+
+    def unsubscribe(self):
+        with self._cond:
+            self.subscribers -= 1
+
+    def add_listener(self, callback):
+        """Run callback() (in the poller thread: it must not block) whenever events arrive or the feed closes."""
+        with self._cond:
+            self._listeners.add(callback)
+
+    def remove_listener(self, callback):
+        with self._cond:
+            self._listeners.discard(callback)
+
+    def notify(self):
+        """Called after this process commits activities: poll now instead of at the next tick."""
+        self._wake.set()
+
+    def events_after(self, after_id, timeout):
+        """
+        Activities with id > after_id, waiting up to `timeout` seconds for one to
+        arrive. Returns None when they are older than the buffer: read the table.
+        """
+        with self._cond:
+            if after_id < self.floor:
+                return None
+            self._cond.wait_for(lambda: self.closed or self.last_id > after_id, timeout)
+            events = []
+            for event in reversed(self._events):
+                if event[0] <= after_id:
+                    break
+                events.append(event)
+            events.reverse()
+            return events
+
+    def _ensure_started(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="activity-feed", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            with self._cond:
+                if self.closed:
+                    return
+                if not self.subscribers:
+                    self.last_id = self.floor = None
+                    continue
+                after = self.last_id
+            try:
+                with self.connect() as con:
+                    rows = [tuple(row) for row in con.execute(NEW_ROWS, (after, self.buffer_size))]
+            except Exception as e:
+                logger.error("Activity feed poll failed: %s", e)
+                continue
+            self.polls += 1
+            if rows:
+                self._publish(after, rows)
+                if len(rows) == self.buffer_size:
+                    self._wake.set()  # more waiting behind this page
+
+    def _publish(self, after, rows):
+        with self._cond:
+            # Reset by a subscribe() while we were querying: these rows are stale
+            if self.last_id != after:
+                return
+            for row in rows:
+                if len(self._events) == self.buffer_size:
+                    self.floor = self._events.popleft()[0]
+                self._events.append(row)
+            self.last_id = rows[-1][0]
+            self.published += len(rows)
+            self._cond.notify_all()
+            for callback in self._listeners:
+                callback()
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+            for callback in self._listeners:
+                callback()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "subscribers": self.subscribers,
+                "buffered": len(self._events),
+                "published": self.published,
+                "polls": self.polls,
+                "refused": self.refused,
+            }
+
+
+def format_event(event_id, message, created_at):
+    return f"id: {event_id}\nevent: activity\ndata: {json.dumps({'message': message, 'created_at': created_at})}\n\n"
+
+
+def stream(feed, after_id, backlog, heartbeat):
+    """
+    SSE body: rows after `after_id` (from the table if the buffer doesn't reach
+    back that far), then new ones as they are published. Runs until the client
+    goes away, which shows up as a failed write at the latest on the next heartbeat.
+    The caller subscribed, and unsubscribes when the response is closed.
+    """
+    yield f"retry: {RETRY_MS}\n\n"
+    while not feed.closed:
+        events = feed.events_after(after_id, heartbeat)
+        if events is None:
+            with feed.connect() as con:
+                events = [tuple(row) for row in con.execute(NEW_ROWS, (after_id, backlog))]
+        if not events:
+            yield ": keepalive\n\n"
+            continue
+        yield "".join(format_event(*event) for event in events)
+        after_id = events[-1][0]
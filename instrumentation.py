@@ -0,0 +1,175 @@
+"""
+Opt-in per-request profiling (INSTRUMENTATION = True): every SQL statement's
+text, time and row count, template render time, and a summary per request as
+a log line plus X-Query-Count and Server-Timing headers. Statements slower than
+SLOW_QUERY_MS go to the slow-query log. Off, it costs nothing: connections are
+plain sqlite3 connections and the hooks return straight away.
+"""
+import contextvars
+import logging
+import sqlite3
+import time
+
+from flask import before_render_template, g, request, template_rendered
+
+logger = logging.getLogger(__name__)
+slow_logger = logging.getLogger(__name__ + ".slow")
+
+_profile = contextvars.ContextVar("request_profile", default=None)
+
+
+class Query:
+    __slots__ = ("sql", "duration", "rows")
+
+    def __init__(self, sql):
+        self.sql = " ".join(sql.split())
+        self.duration = 0.0
+        self.rows = 0
+
+
+class RequestProfile:
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = []
+        self.render_time = 0.0
+        self._render_started = None
+
+    @property
+    def query_time(self):
+        return sum(q.duration for q in self.queries)
+
+    def summary(self):
+        return {
+            "queries": len(self.queries),
+            "query_ms": round(self.query_time * 1000, 3),
+            "render_ms": round(self.render_time * 1000, 3),
+            "total_ms": round((time.perf_counter() - self.started) * 1000, 3),
+        }
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Times execute and the fetches that follow it, and counts rows, into the request's profile."""
+
+    _query = None
+
+    def _timed(self, method, sql, *args):
+        profile = _profile.get()
+        if profile is None:
+            return method(sql, *args)
+        self._query = query = Query(sql)
+        profile.queries.append(query)
+        start = time.perf_counter()
+        try:
+            return method(sql, *args)
+        finally:
+            query.duration += time.perf_counter() - start
+            if self.rowcount > 0:  # INSERT/UPDATE/DELETE; SELECT rows are counted as fetched
+                query.rows = self.rowcount
+
+    def execute(self, sql, parameters=()):
+        return self._timed(super().execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self._timed(super().executemany, sql, seq_of_parameters)
+
+    def _fetch(self, method, *args):
+        query = self._query
+        if query is None:
+            return method(*args)
+        start = time.perf_counter()
+        try:
+            result = method(*args)
+        finally:
+            query.duration += time.perf_counter() - start
+        if isinstance(result, list):
+            query.rows += len(result)
+        elif result is not None:
+            query.rows += 1
+        return result
+
+    def fetchone(self):
+        return self._fetch(super().fetchone)
+
+    def fetchmany(self, size=None):
+        return self._fetch(super().fetchmany, size if size is not None else self.arraysize)
+
+    def fetchall(self):
+        return self._fetch(super().fetchall)
+
+    def __next__(self):
+        row = self._fetch(super().fetchone)
+        if row is None:
+            raise StopIteration
+        return row
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Connection factory (sqlite3.connect(factory=...)) whose statements are profiled."""
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def connection_factory(app):
+    return InstrumentedConnection if app.config["INSTRUMENTATION"] else sqlite3.Connection
+
+
+def init_app(app):
+    def start():
+        if app.config["INSTRUMENTATION"]:
+            g.profile_token = _profile.set(RequestProfile())
+
+    def finish(response):
+        profile = _profile.get()
+        if profile is None:
+            return response
+        summary = profile.summary()
+        response.headers["X-Query-Count"] = str(summary["queries"])
+        response.headers["Server-Timing"] = (
+            f'db;dur={summary["query_ms"]};desc="{summary["queries"]} queries", '
+            f'render;dur={summary["render_ms"]}, total;dur={summary["total_ms"]}'
+        )
+        logger.info("%s %s %s %.1fms db=%d queries/%.1fms render=%.1fms", request.method, request.path,
+                    response.status_code, summary["total_ms"], summary["queries"], summary["query_ms"],
+                    summary["render_ms"])
+        threshold = app.config["SLOW_QUERY_MS"] / 1000
+        for query in profile.queries:
+            if query.duration >= threshold:
+                # Statement text only: parameters can hold passwords and emails
+                slow_logger.warning("%.1fms %d rows %s %s: %s", query.duration * 1000, query.rows,
+                                    request.method, request.path, query.sql)
+        return response
+
+    def stop(exc=None):
+        token = g.pop("profile_token", None)
+        if token is not None:
+            _profile.reset(token)
+
+    def render_started(sender, template, context, **extra):
+        profile = _profile.get()
+        if profile is not None:
+            profile._render_started = time.perf_counter()
+
+    def render_finished(sender, template, context, **extra):
+        profile = _profile.get()
+        if profile is not None and profile._render_started is not None:
+            profile.render_time += time.perf_counter() - profile._render_started
+            profile._render_started = None
+
+    app.before_request(start)
+    app.after_request(finish)
+    app.teardown_request(stop)
+    before_render_template.connect(render_started, app, weak=False)
+    template_rendered.connect(render_finished, app, weak=False)
+
+
+def current_profile():
+    """The running request's RequestProfile, or None when instrumentation is off."""
+    return _profile.get()
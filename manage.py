@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Command-line maintenance for the app's database (uses app.py's configuration).
+
+    python manage.py migrate
+    python manage.py sweep-sessions
+    python manage.py archive-activities --days 90
+    python manage.py vacuum --incremental
+    python manage.py import users barangay-users.csv
+    python manage.py import suggestions backlog.jsonl
+    python manage.py export suggestions -o suggestions.jsonl
+    python manage.py export users --format csv > users.csv
+    python manage.py serve --port 8000 --workers 4
+    python manage.py serve --async
+
+Set DATABASE to work on another file than database.db.
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+
+import app as webapp
+import retention
+import server
+import storage
+import transfer
+
+
+def _open(path, mode):
+    if path in (None, "-"):
+        return sys.stdin if "r" in mode else sys.stdout
+    return open(path, mode, encoding="utf-8-sig" if "r" in mode else "utf-8", newline="")
+
+
+def migrate(args):
+    applied = webapp.init_db()
+    print(f"applied migrations: {applied}" if applied else "schema is up to date")
+
+
+def sweep_sessions(args):
+    print(f"removed {webapp.get_sessions().sweep(force=True)} expired sessions")
+
+
+def archive_activities(args):
+    if args.days is None:
+        print("ACTIVITY_RETENTION_DAYS is unset: pass --days", file=sys.stderr)
+        return 2
+    archiver = webapp.get_archiver()
+    moved = archiver.run(days=args.days)
+    stats = archiver.stats()
+    print(f"archived {moved} activities into {stats['segments']} segments under {archiver.archive_dir}, "
+          f"freed {stats['vacuumed_pages']} pages")
+
+
+def vacuum(args):
+    # Rewrites the whole file: stop the app first
+    con = storage.connect(webapp.app.config["DATABASE"], isolation_level=None)
+    try:
+        if args.incremental:
+            changed = retention.enable_incremental_vacuum(con)
+            print("auto_vacuum is now INCREMENTAL" if changed else "auto_vacuum was already INCREMENTAL")
+        else:
+            con.execute("VACUUM")
+            print("vacuumed")
+    finally:
+        con.close()
+
+
+def import_file(args):
+    fmt = args.format or transfer.guess_format(args.file)
+    with _open(args.file, "r") as stream:
+        report = transfer.import_records(webapp.get_writer(), args.table, transfer.read_records(stream, fmt),
+                                         chunk_size=args.chunk_size,
+                                         duplicate_threshold=webapp.app.config["DUPLICATE_THRESHOLD"],
+                                         hasher=webapp.get_hasher())
+    json.dump(report.as_dict(), sys.stderr, indent=2)
+    sys.stderr.write("\n")
+    return 1 if report.failed else 0
+
+
+def export_table(args):
+    fmt = args.format or transfer.guess_format(args.output)
+    con = webapp.get_db()
+    try:
+        out = _open(args.output, "w")
+        for chunk in transfer.export_rows(lambda: contextlib.nullcontext(con), args.table, fmt,
+                                          webapp.app.config["EXPORT_CHUNK_ROWS"]):
+            out.write(chunk)
+        if out is not sys.stdout:
+            out.close()
+    finally:
+        con.close()
+
+
+def serve(args):
+    return server.serve(args.host, args.port, workers=args.workers, threads=args.threads,
+                        keepalive=args.keepalive, drain_timeout=args.drain_timeout, asynchronous=args.asynchronous)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("migrate", help="apply pending schema migrations").set_defaults(run=migrate)
+    commands.add_parser("sweep-sessions", help="delete expired sessions").set_defaults(run=sweep_sessions)
+
+    archiver = commands.add_parser("archive-activities", help="move old activities to the compressed archive")
+    archiver.add_argument("--days", type=int, default=webapp.app.config["ACTIVITY_RETENTION_DAYS"],
+                          help="keep this many days in the table (default: ACTIVITY_RETENTION_DAYS)")
+    archiver.set_defaults(run=archive_activities)
+
+    vacuumer = commands.add_parser("vacuum", help="rebuild the database file (stop the app first)")
+    vacuumer.add_argument("--incremental", action="store_true",
+                          help="also switch to auto_vacuum=INCREMENTAL so archiving can shrink the file")
+    vacuumer.set_defaults(run=vacuum)
+
+    importer = commands.add_parser("import", help="bulk-load users or suggestions from CSV/JSONL")
+    importer.add_argument("table", choices=sorted(transfer.IMPORTS))
+    importer.add_argument("file", help="path, or - for stdin")
+    importer.add_argument("--format", choices=transfer.FORMATS, help="default: from the file extension, else csv")
+    importer.add_argument("--chunk-size", type=int, default=webapp.app.config["IMPORT_CHUNK_SIZE"])
+    importer.set_defaults(run=import_file)
+
+    exporter = commands.add_parser("export", help="stream a table out as CSV/JSONL")
+    exporter.add_argument("table")
+    exporter.add_argument("-o", "--output", help="path (default stdout)")
+    exporter.add_argument("--format", choices=transfer.FORMATS)
+    exporter.set_defaults(run=export_table)
+
+    server_parser = commands.add_parser("serve", help="run the production server (see server.py)")
+    server_parser.add_argument("--host", default="127.0.0.1")
+    server_parser.add_argument("--port", type=int, default=8000)
+    server_parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="processes (default: CPUs)")
+    server_parser.add_argument("--threads", type=int,
+                               help="connections per worker (default 16); with --async, database threads "
+                                    "per worker (default ASYNC_DB_THREADS)")
+    server_parser.add_argument("--async", dest="asynchronous", action="store_true",
+                               help="serve the ASGI variant (asgi.py) on asyncio workers")
+    server_parser.add_argument("--keepalive", type=float, default=5, help="seconds an idle or stalled connection is kept")
+    server_parser.add_argument("--drain-timeout", type=float, default=30,
+                               help="how long stopping workers may finish requests (s)")
+    server_parser.set_defaults(run=serve)
+
+    args = parser.parse_args(argv)
+    webapp.app.config["DATABASE"] = os.environ.get("DATABASE", webapp.app.config["DATABASE"])
+    try:
+        return args.run(args) or 0
+    except ValueError as e:
+        parser.error(str(e))
+    finally:
+        writer = webapp.app.extensions.get("sqlite_writer")
+        if writer is not None:
+            writer.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,245 @@
+"""
+In-process metrics registry (counters, gauges, fixed-bucket histograms) rendered
+in the Prometheus text format. Request metrics are updated by before/after
+request hooks; pool, writer and queue figures are read from their stats() at
+scrape time, so they cost nothing per request.
+"""
+import bisect
+import threading
+import time
+
+from flask import g, got_request_exception, request
+
+# Seconds; Prometheus' default buckets
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        values = tuple(str(v) for v in values)
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class _Value:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value):
+        self.value = value
+
+
+class Counter(_Metric):
+    kind = "counter"
+    _new_child = _Value
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def render(self):
+        lines = self._header()
+        for values, child in sorted(self._children.items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, values)} {_number(child.value)}")
+        return lines
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount=1):
+        self.labels().dec(amount)
+
+    def set(self, value):
+        self.labels().set(value)
+
+
+class _Buckets:
+    __slots__ = ("bounds", "counts", "sum", "_lock")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # the last one is +Inf
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _Buckets(self.buckets)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def render(self):
+        lines = self._header()
+        for values, child in sorted(self._children.items()):
+            with child._lock:
+                counts, total = list(child.counts), child.sum
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = _labels(self.labelnames, values, [("le", _number(bound))])
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, values)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, values)} {cumulative}")
+        return lines
+
+
+class Registry:
+
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def _add(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"metric already registered: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._add(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._add(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(name, documentation, labelnames, buckets))
+
+    def get(self, name):
+        return self._metrics[name]
+
+    def clear(self):
+        """Forget every recorded value (tests)."""
+        for metric in self._metrics.values():
+            with metric._lock:
+                metric._children.clear()
+
+    def collector(self, fn):
+        """
+        Register fn() -> [(name, kind, help, labelnames, {label values: number})],
+        called at scrape time only. Usable as a decorator.
+        """
+        self._collectors.append(fn)
+        return fn
+
+    def render(self):
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines += metric.render()
+        for fn in self._collectors:
+            for name, kind, documentation, labelnames, samples in fn():
+                lines += [f"# HELP {name} {documentation}", f"# TYPE {name} {kind}"]
+                for values, number in samples.items():
+                    lines.append(f"{name}{_labels(labelnames, values)} {_number(number)}")
+        return "\n".join(lines) + "\n"
+
+
+def init_app(app):
+    """Create the app's registry with the HTTP metrics and hook them into every request."""
+    registry = Registry()
+    requests_total = registry.counter("http_requests_total", "Requests handled", ("endpoint", "method", "status"))
+    latency = registry.histogram("http_request_duration_seconds", "Time to produce a response",
+                                 ("endpoint", "method"))
+    in_progress = registry.gauge("http_requests_in_progress", "Requests being handled right now")
+    exceptions = registry.counter("http_exceptions_total", "Requests that raised an unhandled exception",
+                                  ("endpoint", "exception"))
+    registry.counter("app_handled_errors_total", "Errors a route caught and turned into an error page or redirect",
+                     ("endpoint", "exception"))
+    app.extensions["metrics"] = registry
+
+    def start():
+        if app.config["METRICS"]:
+            g.metrics_started = time.perf_counter()
+            in_progress.inc()
+
+    def record(status):
+        started = g.pop("metrics_started", None)
+        if started is not None:
+            # Route name, not the path: /update-user/<id> must stay one series
+            endpoint = request.endpoint or "unmatched"
+            latency.labels(endpoint, request.method).observe(time.perf_counter() - started)
+            requests_total.labels(endpoint, request.method, status).inc()
+            in_progress.dec()
+
+    def finish(response):
+        record(response.status_code)
+        return response
+
+    def teardown(exc=None):
+        # Only still pending when an exception skipped the after_request hooks
+        record(500)
+
+    def failed(sender, exception, **extra):
+        if app.config["METRICS"]:
+            exceptions.labels(request.endpoint or "unmatched", type(exception).__name__).inc()
+
+    app.before_request(start)
+    app.after_request(finish)
+    app.teardown_request(teardown)
+    got_request_exception.connect(failed, app, weak=False)
+    return registry
+
+
+def handled_error(app, error):
+    """Count an exception a route caught; call from inside a request."""
+    if app.config["METRICS"]:
+        app.extensions["metrics"].get("app_handled_errors_total").labels(
+            request.endpoint or "unmatched", type(error).__name__).inc()
@@ -0,0 +1,251 @@
+"""
+Versioned schema migrations, tracked with PRAGMA user_version
+"""
+import duplicates
+
+# (version, description, steps). A step is a SQL string or a callable taking the connection.
+# Never edit a released migration: add a new one with the next version number.
+MIGRATIONS = [
+    (1, "base tables", [
+        '''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            fullname TEXT NOT NULL,
+            email TEXT NOT NULL UNIQUE,
+            password TEXT NOT NULL,
+            role TEXT DEFAULT 'user',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS activities (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            message TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS suggestions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            fullname TEXT NOT NULL,
+            email TEXT NOT NULL,
+            sdg_category TEXT NOT NULL,
+            title TEXT NOT NULL,
+            description TEXT NOT NULL,
+            status TEXT DEFAULT 'pending',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY(user_id) REFERENCES users(id)
+        )
+        ''',
+    ]),
+    # created_at columns are indexed ascending on purpose: scanned backwards they give
+    # "created_at DESC, id DESC" (the rowid is the implicit last column), so no sort step.
+    (2, "secondary indexes for the dashboard, listings and role/status counts", [
+        "CREATE INDEX IF NOT EXISTS idx_activities_created_at ON activities(created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_suggestions_created_at ON suggestions(created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_suggestions_status_created_at ON suggestions(status, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_suggestions_user_id ON suggestions(user_id)",
+        # Matches /manage's "ORDER BY role DESC, fullname" and covers role COUNTs
+        "CREATE INDEX IF NOT EXISTS idx_users_role_fullname ON users(role DESC, fullname)",
+        "ANALYZE",
+    ]),
+    # Per-day counters kept current by triggers, so /statistics reads a few dozen
+    # rows instead of scanning users/suggestions history
+    (3, "daily registration and suggestion rollups", [
+        '''
+        CREATE TABLE IF NOT EXISTS daily_counts (
+            metric TEXT NOT NULL,
+            day TEXT NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (metric, day)
+        ) WITHOUT ROWID
+        ''',
+        '''
+        INSERT INTO daily_counts (metric, day, count)
+        SELECT 'registrations', date(created_at), COUNT(*) FROM users
+        WHERE created_at IS NOT NULL GROUP BY date(created_at)
+        ''',
+        '''
+        INSERT INTO daily_counts (metric, day, count)
+        SELECT 'suggestions', date(created_at), COUNT(*) FROM suggestions
+        WHERE created_at IS NOT NULL GROUP BY date(created_at)
+        ''',
+        *[
+            sql.format(table=table, metric=metric)
+            for table, metric in (("users", "registrations"), ("suggestions", "suggestions"))
+            for sql in (
+                '''
+                CREATE TRIGGER IF NOT EXISTS {table}_rollup_insert AFTER INSERT ON {table}
+                WHEN NEW.created_at IS NOT NULL
+                BEGIN
+                    INSERT INTO daily_counts (metric, day, count) VALUES ('{metric}', date(NEW.created_at), 1)
+                    ON CONFLICT (metric, day) DO UPDATE SET count = count + 1;
+                END
+                ''',
+                '''
+                CREATE TRIGGER IF NOT EXISTS {table}_rollup_delete AFTER DELETE ON {table}
+                WHEN OLD.created_at IS NOT NULL
+                BEGIN
+                    UPDATE daily_counts SET count = count - 1
+                    WHERE metric = '{metric}' AND day = date(OLD.created_at);
+                END
+                ''',
+            )
+        ],
+    ]),
+    # External-content FTS5 index over suggestions: the text lives only in suggestions,
+    # the triggers keep the index in step. Title matches weigh 10x description matches.
+    (4, "full-text search over suggestion titles and descriptions", [
+        '''
+        CREATE VIRTUAL TABLE IF NOT EXISTS suggestions_fts USING fts5(
+            title, description,
+            content='suggestions', content_rowid='id',
+            tokenize='porter unicode61'
+        )
+        ''',
+        "INSERT INTO suggestions_fts (suggestions_fts, rank) VALUES ('rank', 'bm25(10.0, 1.0)')",
+        '''
+        CREATE TRIGGER IF NOT EXISTS suggestions_fts_insert AFTER INSERT ON suggestions BEGIN
+            INSERT INTO suggestions_fts (rowid, title, description) VALUES (NEW.id, NEW.title, NEW.description);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS suggestions_fts_delete AFTER DELETE ON suggestions BEGIN
+            INSERT INTO suggestions_fts (suggestions_fts, rowid, title, description)
+            VALUES ('delete', OLD.id, OLD.title, OLD.description);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS suggestions_fts_update AFTER UPDATE OF title, description ON suggestions BEGIN
+            INSERT INTO suggestions_fts (suggestions_fts, rowid, title, description)
+            VALUES ('delete', OLD.id, OLD.title, OLD.description);
+            INSERT INTO suggestions_fts (rowid, title, description) VALUES (NEW.id, NEW.title, NEW.description);
+        END
+        ''',
+        "INSERT INTO suggestions_fts (suggestions_fts) VALUES ('rebuild')",
+    ]),
+    # MinHash signatures and LSH buckets (see duplicates.py). Rows are added by the
+    # submit route; deleting a suggestion drops them here.
+    (5, "near-duplicate suggestion index", [
+        "ALTER TABLE suggestions ADD COLUMN duplicate_of INTEGER REFERENCES suggestions(id)",
+        "ALTER TABLE suggestions ADD COLUMN similarity REAL",
+        "CREATE INDEX IF NOT EXISTS idx_suggestions_duplicate_of ON suggestions(duplicate_of)",
+        '''
+        CREATE TABLE IF NOT EXISTS suggestion_signatures (
+            suggestion_id INTEGER PRIMARY KEY,
+            signature BLOB NOT NULL
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS suggestion_lsh (
+            band INTEGER NOT NULL,
+            bucket INTEGER NOT NULL,
+            suggestion_id INTEGER NOT NULL,
+            PRIMARY KEY (band, bucket, suggestion_id)
+        ) WITHOUT ROWID
+        ''',
+        "CREATE INDEX IF NOT EXISTS idx_suggestion_lsh_suggestion_id ON suggestion_lsh(suggestion_id)",
+        '''
+        CREATE TRIGGER IF NOT EXISTS suggestions_duplicates_delete AFTER DELETE ON suggestions BEGIN
+            DELETE FROM suggestion_lsh WHERE suggestion_id = OLD.id;
+            DELETE FROM suggestion_signatures WHERE suggestion_id = OLD.id;
+            UPDATE suggestions SET duplicate_of = NULL, similarity = NULL WHERE duplicate_of = OLD.id;
+        END
+        ''',
+        duplicates.backfill,
+    ]),
+    # Server-side sessions (sessions.py); id is a hash of the cookie's session id
+    (6, "server-side session store", [
+        '''
+        CREATE TABLE IF NOT EXISTS sessions (
+            id TEXT PRIMARY KEY,
+            user_id INTEGER,
+            data TEXT NOT NULL,
+            expires_at REAL NOT NULL
+        ) WITHOUT ROWID
+        ''',
+        "CREATE INDEX IF NOT EXISTS idx_sessions_user_id ON sessions(user_id)",
+        "CREATE INDEX IF NOT EXISTS idx_sessions_expires_at ON sessions(expires_at)",
+    ]),
+    # Segments of archived activities (retention.py); path is relative to ARCHIVE_DIR
+    (7, "activities archive manifest", [
+        '''
+        CREATE TABLE IF NOT EXISTS activity_archive (
+            path TEXT PRIMARY KEY,
+            month TEXT NOT NULL,
+            first_id INTEGER NOT NULL,
+            last_id INTEGER NOT NULL,
+            first_at TEXT NOT NULL,
+            last_at TEXT NOT NULL,
+            rows INTEGER NOT NULL,
+            bytes INTEGER NOT NULL
+        )
+        ''',
+        "CREATE INDEX IF NOT EXISTS idx_activity_archive_last_id ON activity_archive(last_id)",
+    ]),
+    # A change counter per table (versions.py), bumped by every write whichever process makes it.
+    # Pages use it for ETags, caches to know when to reload.
+    (8, "per-table data versions", [
+        '''
+        CREATE TABLE IF NOT EXISTS data_versions (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+        ''',
+        *[
+            sql.format(table=table)
+            for table in ("users", "suggestions", "activities")
+            for sql in (
+                "INSERT OR IGNORE INTO data_versions (name) VALUES ('{table}')",
+                *(
+                    f'''
+                    CREATE TRIGGER IF NOT EXISTS {{table}}_version_{event} AFTER {event.upper()} ON {{table}} BEGIN
+                        UPDATE data_versions SET version = version + 1 WHERE name = '{{table}}';
+                    END
+                    '''
+                    for event in ("insert", "update", "delete")
+                ),
+            )
+        ],
+    ]),
+]
+
+
+def current_version(con):
+    return con.execute("PRAGMA user_version").fetchone()[0]
+
+
+def latest_version():
+    return MIGRATIONS[-1][0]
+
+
+def migrate(con):
+    """
+    Apply pending migrations, one transaction each. Safe to call on every startup and
+    from several workers at once. `con` must be in autocommit mode (isolation_level=None).
+    Returns the versions that were applied.
+    """
+    applied = []
+    for version, description, steps in MIGRATIONS:
+        if version <= current_version(con):
+            continue
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            # Another worker may have applied it while we waited for the lock
+            if version <= current_version(con):
+                con.execute("COMMIT")
+                continue
+            for step in steps:
+                if callable(step):
+                    step(con)
+                else:
+                    con.execute(step)
+            con.execute(f"PRAGMA user_version = {version}")
+            con.execute("COMMIT")
+        except Exception:
+            con.execute("ROLLBACK")
+            raise
+        applied.append(version)
+    return applied
@@ -0,0 +1,50 @@
+"""
+Bulk status changes for the moderation queue: many suggestions, one transaction
+"""
+
+STATUSES = ("pending", "approved", "rejected")
+
+
+def parse_ids(values):
+    """Suggestion ids from form values, each a single id or a comma-separated list."""
+    ids = []
+    for value in values:
+        for part in value.split(","):
+            part = part.strip()
+            if part:
+                ids.append(int(part))  # ValueError on junk, reported by the caller
+    return list(dict.fromkeys(ids))
+
+
+def filter_clause(status=None, sdg_category=None, older_than_days=None):
+    """WHERE clause and params for "all <status> in <category> older than N days"."""
+    conditions, params = [], []
+    if status:
+        conditions.append("status = ?")
+        params.append(status)
+    if sdg_category:
+        conditions.append("sdg_category = ?")
+        params.append(sdg_category)
+    if older_than_days is not None:
+        conditions.append("created_at < datetime('now', ?)")
+        params.append(f"-{int(older_than_days)} days")
+    return " AND ".join(conditions), params
+
+
+def bulk_update(cur, new_status, ids=None, where="", params=()):
+    """
+    Set `new_status` on the given ids, or on every row matching `where`, skipping rows
+    already in that status. Runs on the caller's transaction; returns the rows changed.
+    """
+    if new_status not in STATUSES:
+        raise ValueError(f"invalid status: {new_status}")
+    if ids:
+        cur.executemany("UPDATE suggestions SET status = ? WHERE id = ? AND status != ?",
+                        [(new_status, suggestion_id, new_status) for suggestion_id in ids])
+    elif where:
+        cur.execute(f"UPDATE suggestions SET status = ? WHERE {where} AND status != ?",
+                    (new_status, *params, new_status))
+    else:
+        raise ValueError("bulk update needs ids or a filter")
+    # rowcount, not total_changes: the data-version trigger's own updates must not count
+    return cur.rowcount
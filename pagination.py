@@ -0,0 +1,43 @@
+"""
+Keyset (cursor) pagination helpers. A cursor is the sort key of the last row
+on the page, so the next page is an index range seek rather than an OFFSET scan.
+"""
+import base64
+import json
+
+
+def encode_cursor(values):
+    raw = json.dumps(list(values), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    # None for "first page"; ValueError for anything that isn't a cursor we issued
+    if not token:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+    except Exception:
+        raise ValueError("Invalid page cursor")
+    if not isinstance(values, list):
+        raise ValueError("Invalid page cursor")
+    return values
+
+
+def page_size(requested, default, maximum):
+    try:
+        size = int(requested) if requested else default
+    except ValueError:
+        size = default
+    return max(1, min(size, maximum))
+
+
+def split_page(rows, limit, key):
+    """
+    `rows` was fetched with LIMIT limit + 1; the extra row only tells us a next page exists.
+    Returns (page_rows, next_cursor or None).
+    """
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_cursor(key(rows[-1]))
+    return rows, None
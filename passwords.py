@@ -0,0 +1,200 @@
+"""
+Password hashing with scrypt. The KDF runs in a bounded pool of worker
+processes: a burst of logins is spread over every core, at most `max_pending`
+hashes (~16 MiB each) are in flight, and request threads just wait on a future.
+"""
+import base64
+import collections
+import functools
+import hashlib
+import hmac
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as ResultTimeout
+
+# ~16 MiB and a few tens of ms per hash. Stored with each hash, so raising them
+# later only makes old hashes "need rehash", it never breaks logins.
+SCRYPT_N = 2 ** 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+SALT_BYTES = 16
+KEY_BYTES = 32
+
+PREFIX = "scrypt"
+
+_CONTEXT = multiprocessing.get_context(
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn")
+
+
+@functools.lru_cache(maxsize=None)
+def dummy_hash():
+    # Verified against when an email is unknown, so that case costs the same as a wrong password
+    return hash_password(os.urandom(16).hex())
+
+
+class HasherBusy(Exception):
+    pass
+
+
+def _b64(data):
+    return base64.b64encode(data).decode("ascii")
+
+
+def _kdf(password, salt, n, r, p):
+    return hashlib.scrypt(password.encode("utf-8"), salt=salt, n=n, r=r, p=p,
+                          maxmem=256 * n * r + 1024 * 1024, dklen=KEY_BYTES)
+
+
+def hash_password(password, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P):
+    """"scrypt$n$r$p$salt$key", everything needed to verify it later."""
+    salt = os.urandom(SALT_BYTES)
+    return "$".join([PREFIX, str(n), str(r), str(p), _b64(salt), _b64(_kdf(password, salt, n, r, p))])
+
+
+def is_hashed(stored):
+    return (stored or "").startswith(PREFIX + "$")
+
+
+def verify_password(password, stored, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P):
+    """
+    (matches, needs_rehash). Rows from before hashing hold the plain password: they
+    still verify, and always need a rehash. So do hashes made with other parameters.
+    """
+    if not is_hashed(stored):
+        return hmac.compare_digest((password or "").encode(), (stored or "").encode()), True
+    try:
+        _, sn, sr, sp, salt, key = stored.split("$")
+        params = (int(sn), int(sr), int(sp))
+        expected = base64.b64decode(salt), base64.b64decode(key)
+    except ValueError:
+        return False, False
+    actual = _kdf(password or "", expected[0], *params)
+    return hmac.compare_digest(actual, expected[1]), params != (n, r, p)
+
+
+class Hasher:
+    """
+    Runs hash_password/verify_password in `workers` processes (0 = in the calling
+    thread). At most `max_pending` calls may be queued or running; beyond that a
+    caller waits up to `timeout` seconds, then gets HasherBusy.
+    """
+
+    def __init__(self, workers=None, max_pending=64, timeout=10.0, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P):
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.params = {"n": n, "r": r, "p": p}
+
+        self._executor = None
+        self._pid = None
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+
+        self.calls = 0
+        self.busy = 0
+        self.kdf_time = 0.0
+
+    def _pool(self):
+        # A forked server worker can't use its parent's pool: start its own
+        if self._executor is None or self._pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._pid != os.getpid():
+                    # Not plain fork: a child forked from a threaded server can inherit locks held
+                    # mid-operation. Workers fork from a clean single-threaded server process instead.
+                    self._executor = ProcessPoolExecutor(self.workers, mp_context=_CONTEXT)
+                    self._pid = os.getpid()
+        return self._executor
+
+    def _acquire(self, timeout):
+        if not self._slots.acquire(timeout=timeout):
+            with self._lock:
+                self.busy += 1
+            raise HasherBusy(f"more than {self.max_pending} password hashes pending")
+
+    def _done(self, start):
+        with self._lock:
+            self.calls += 1
+            self.kdf_time += time.perf_counter() - start
+
+    def _submit(self, fn, *args, timeout):
+        # Takes a slot, which _result() gives back
+        self._acquire(timeout)
+        try:
+            return self._pool().submit(fn, *args, **self.params), time.perf_counter()
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def _result(self, submitted):
+        future, start = submitted
+        try:
+            result = future.result(self.timeout)
+        except ResultTimeout:
+            future.cancel()  # if it hasn't started, it never will
+            with self._lock:
+                self.busy += 1
+            raise HasherBusy(f"no password hash result within {self.timeout}s")
+        finally:
+            self._slots.release()
+        self._done(start)
+        return result
+
+    def _run(self, fn, *args):
+        if self.workers:
+            return self._result(self._submit(fn, *args, timeout=self.timeout))
+        self._acquire(self.timeout)
+        try:
+            start = time.perf_counter()
+            result = fn(*args, **self.params)
+            self._done(start)
+            return result
+        finally:
+            self._slots.release()
+
+    def hash(self, password):
+        return self._run(hash_password, password)
+
+    def verify(self, password, stored):
+        if not is_hashed(stored):
+            return verify_password(password, stored)  # plain comparison, no KDF to offload
+        return self._run(verify_password, password, stored)
+
+    def hash_many(self, passwords):
+        """
+        Hash a batch (bulk imports) on every worker, at most `workers` hashes in the pool
+        at a time, each holding a slot like a login's: a login waits behind one round of
+        the batch, not all of it. The batch waits as long as it takes for its slots.
+        """
+        if not self.workers:
+            return [self.hash(password) for password in passwords]
+        results, window = [], collections.deque()
+        try:
+            for password in passwords:
+                if len(window) == self.workers:
+                    results.append(self._result(window.popleft()))
+                window.append(self._submit(hash_password, password, timeout=None))
+            while window:
+                results.append(self._result(window.popleft()))
+        finally:
+            # Only after an error: give back the slots of what was still in flight
+            for future, _ in window:
+                future.cancel()
+                self._slots.release()
+        return results
+
+    def close(self):
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                self._executor.shutdown()
+            self._executor = None
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "calls": self.calls,
+                "busy": self.busy,
+                "kdf_time": round(self.kdf_time, 6),
+            }
@@ -0,0 +1,170 @@
+"""
+Sliding-window rate limits for logins, registrations and submissions, keyed by
+client IP or by account. A key costs one slot of two counts: its requests in
+the current fixed window and in the previous one. The sliding count weighs the
+previous window by how much of it still falls inside the last `window`
+seconds, which is exact for evenly spread requests and needs no list of
+timestamps; a check is one hash lookup and some arithmetic (see
+benchmarks/ratelimit.py).
+
+MemoryCounters keep the slots of one process in an LRU dict. SharedCounters keep
+them in a fixed table of anonymous shared memory: created before the serve
+master forks (app.warm_up), it is the same table in every worker, so N workers
+don't give a client N times the allowance.
+"""
+import hashlib
+import math
+import mmap
+import multiprocessing
+import struct
+import threading
+import time
+from collections import OrderedDict
+
+# A SharedCounters slot: key hash (0 = empty), window index, current count, previous count
+_SLOT = struct.Struct("=QQII")
+
+
+def _shift(slot, index):
+    # (current, previous) in window `index`, from a (window index, current, previous) slot
+    if slot is None or slot[0] < index - 1:
+        return 0, 0
+    if slot[0] == index - 1:
+        return 0, slot[1]
+    return slot[1], slot[2]
+
+
+def _retry_after(requests, window, elapsed, current, previous):
+    # Seconds until current + previous * weight drops below `requests`, if nothing else arrives
+    if current < requests:
+        wait = window * (1 - (requests - current) / previous) - elapsed
+    else:
+        # Not in this window: in the next one, where `current` becomes the decaying previous count
+        wait = window - elapsed + window * (1 - requests / current)
+    return max(1, math.ceil(wait))
+
+
+class MemoryCounters:
+    """Slots for at most `size` keys in this process, least recently used dropped first."""
+
+    def __init__(self, size=65536):
+        self.size = size
+        self._lock = threading.Lock()
+        self._slots = OrderedDict()  # key -> (window index, current, previous)
+
+        self.evictions = 0
+        self.lock_timeouts = 0
+
+    def hit(self, key, index, requests, weight, count=True):
+        """
+        (current, previous) for `key` in window `index`, as they were before this
+        hit. With `count`, the hit is added if it stays under `requests`.
+        """
+        with self._lock:
+            current, previous = _shift(self._slots.get(key), index)
+            if count and current + previous * weight < requests:
+                self._slots[key] = (index, current + 1, previous)
+                self._slots.move_to_end(key)
+                if len(self._slots) > self.size:
+                    self._slots.popitem(last=False)
+                    self.evictions += 1
+            return current, previous
+
+    def close(self):
+        with self._lock:
+            self._slots.clear()
+
+
+class SharedCounters:
+    """
+    `size` slots in shared memory, a key's slot picked by its hash. Two keys that
+    land on the same slot take it from each other, and the loser starts again from
+    zero: keep `size` well above the number of keys active at once. If the lock
+    can't be had within `lock_timeout` seconds (a worker was killed holding it),
+    the hit is let through uncounted rather than stalling every request.
+    """
+
+    def __init__(self, size=65536, lock_timeout=0.05):
+        self.size = size
+        self.lock_timeout = lock_timeout
+        # Anonymous and MAP_SHARED: forked children write to the same pages
+        self._memory = mmap.mmap(-1, size * _SLOT.size)
+        self._lock = multiprocessing.Lock()
+
+        # This process's share only
+        self.evictions = 0
+        self.lock_timeouts = 0
+
+    def hit(self, key, index, requests, weight, count=True):
+        """As MemoryCounters.hit."""
+        digest = int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little") or 1
+        offset = digest % self.size * _SLOT.size
+        if not self._lock.acquire(timeout=self.lock_timeout):
+            self.lock_timeouts += 1
+            return 0, 0
+        try:
+            stored, *slot = _SLOT.unpack_from(self._memory, offset)
+            current, previous = _shift(slot if stored == digest else None, index)
+            if count and current + previous * weight < requests:
+                if stored not in (0, digest):
+                    self.evictions += 1
+                _SLOT.pack_into(self._memory, offset, digest, index, current + 1, previous)
+            return current, previous
+        finally:
+            self._lock.release()
+
+    def close(self):
+        self._memory.close()
+
+
+class RateLimiter:
+    """
+    `limits` maps a name to (requests, seconds): at most that many requests per
+    key within any `seconds` (approximately, see above). A name left out of
+    `limits`, or mapped to None, is unlimited. The methods return 0 when the
+    request may go ahead, else the seconds to wait for Retry-After.
+    """
+
+    def __init__(self, limits, counters, clock=time.time):
+        self.limits = dict(limits)
+        self.counters = counters
+        self.clock = clock
+        self._lock = threading.Lock()
+
+        self.refused = {}  # name -> requests refused
+
+    def _hit(self, name, key, count, always=False):
+        limit = self.limits.get(name)
+        if not limit:
+            return 0
+        requests, window = limit
+        index, elapsed = divmod(self.clock(), window)
+        weight = 1 - elapsed / window
+        current, previous = self.counters.hit(f"{name}:{key}", int(index), math.inf if always else requests,
+                                              weight, count)
+        if always or current + previous * weight < requests:
+            return 0
+        with self._lock:
+            self.refused[name] = self.refused.get(name, 0) + 1
+        return _retry_after(requests, window, elapsed, current, previous)
+
+    def acquire(self, name, key):
+        """Counts the request against `key` if it is under the limit."""
+        return self._hit(name, key, count=True)
+
+    def check(self, name, key):
+        """Like acquire, without counting: for limits on failures, counted later with add()."""
+        return self._hit(name, key, count=False)
+
+    def add(self, name, key):
+        """Counts one request, over the limit or not."""
+        self._hit(name, key, count=True, always=True)
+
+    def close(self):
+        self.counters.close()
+
+    def stats(self):
+        with self._lock:
+            refused = dict(self.refused)
+        return {"refused": refused, "evictions": self.counters.evictions,
+                "lock_timeouts": self.counters.lock_timeouts}
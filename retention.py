@@ -0,0 +1,203 @@
+"""
+Activities retention: rows older than the retention window move out of the hot
+table into gzip-compressed JSONL segments, one directory per month, listed in
+the activity_archive table. history() reads both as one newest-first log.
+"""
+import datetime
+import functools
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+
+import pagination
+
+logger = logging.getLogger(__name__)
+
+OLD_ROWS = ("SELECT id, user_id, message, created_at FROM activities WHERE created_at < ? "
+            "ORDER BY created_at, id LIMIT ?")
+
+
+def cutoff(days, now=None):
+    moment = (now or datetime.datetime.now(datetime.timezone.utc)) - datetime.timedelta(days=days)
+    return moment.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def enable_incremental_vacuum(con):
+    """
+    Switch the database file to auto_vacuum=INCREMENTAL. Needs one full VACUUM,
+    which rewrites the file: run it from manage.py, not while serving.
+    `con` must be in autocommit mode. Returns False if it was already on.
+    """
+    if con.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+        return False
+    con.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    con.execute("VACUUM")
+    return True
+
+
+def _write_segment(path, rows):
+    # Temporary name, fsync, rename: a crash never leaves a half-written segment under the real name
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as raw:
+        with gzip.GzipFile(fileobj=raw, mode="wb", mtime=0) as out:
+            for row in rows:
+                out.write(json.dumps({"id": row[0], "user_id": row[1], "message": row[2],
+                                      "created_at": row[3]}).encode() + b"\n")
+        raw.flush()
+        os.fsync(raw.fileno())
+    os.replace(tmp, path)
+    return os.path.getsize(path)
+
+
+@functools.lru_cache(maxsize=16)
+def read_segment(path):
+    # Segments never change once listed in activity_archive, so caching by path is safe
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return tuple(json.loads(line) for line in f)
+
+
+class Archiver:
+    """
+    Moves activities older than `days` into `archive_dir`, `batch_size` rows per
+    write transaction, then gives up to `vacuum_pages` free pages back to the file
+    system (only if the database uses auto_vacuum=INCREMENTAL).
+    maybe_run() is cheap to call often; it runs at most once per `interval`.
+    """
+
+    def __init__(self, writer, archive_dir, days=180, batch_size=5000, interval=3600.0, vacuum_pages=2000):
+        self.writer = writer  # storage.SerializedWriter
+        self.archive_dir = archive_dir
+        self.days = days
+        self.batch_size = batch_size
+        self.interval = interval
+        self.vacuum_pages = vacuum_pages
+
+        self._lock = threading.Lock()
+        self._last_run = time.monotonic()
+
+        self.runs = 0
+        self.archived = 0
+        self.segments = 0
+        self.vacuumed = 0
+        self.last_duration = 0.0
+
+    def maybe_run(self):
+        with self._lock:
+            if self.days is None or time.monotonic() - self._last_run < self.interval:
+                return 0
+            self._last_run = time.monotonic()
+        try:
+            return self.run()
+        except Exception as e:
+            logger.error("Activity archiving failed: %s", e)
+            return 0
+
+    def run(self, days=None):
+        """Archive everything older than the window now. Returns the number of rows moved."""
+        start = time.perf_counter()
+        before = cutoff(self.days if days is None else days)
+        moved = 0
+        while True:
+            batch = self._archive_batch(before)
+            moved += batch
+            if batch < self.batch_size:
+                break
+        freed = self._vacuum()
+        with self._lock:
+            self.runs += 1
+            self.archived += moved
+            self.vacuumed += freed
+            self.last_duration = time.perf_counter() - start
+        if moved:
+            logger.info("Archived %d activities older than %s, freed %d pages", moved, before, freed)
+        return moved
+
+    def _archive_batch(self, before):
+        # One transaction per batch: the rows leave the table only together with their
+        # manifest entry, and no other process can archive the same rows meanwhile
+        with self.writer.transaction() as cur:
+            rows = cur.execute(OLD_ROWS, (before, self.batch_size)).fetchall()
+            by_month = {}
+            for row in rows:
+                by_month.setdefault(row[3][:7], []).append(row)
+            for month, month_rows in by_month.items():
+                ids = [row[0] for row in month_rows]
+                # Named after its id range, so a retry after a crash overwrites rather than duplicates
+                name = os.path.join(month, f"activities-{min(ids)}-{max(ids)}.jsonl.gz")
+                size = _write_segment(os.path.join(self.archive_dir, name), month_rows)
+                cur.executemany("DELETE FROM activities WHERE id = ?", [(i,) for i in ids])
+                cur.execute(
+                    "INSERT OR REPLACE INTO activity_archive (path, month, first_id, last_id, first_at, last_at, "
+                    "rows, bytes) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (name, month, min(ids), max(ids), month_rows[0][3], month_rows[-1][3], len(month_rows), size))
+            with self._lock:
+                self.segments += len(by_month)
+        return len(rows)
+
+    def _vacuum(self):
+        with self.writer.transaction() as cur:
+            if cur.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+                return 0
+            free = cur.execute("PRAGMA freelist_count").fetchone()[0]
+            cur.execute(f"PRAGMA incremental_vacuum({int(self.vacuum_pages)})").fetchall()
+            return free - cur.execute("PRAGMA freelist_count").fetchone()[0]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "runs": self.runs,
+                "archived": self.archived,
+                "segments": self.segments,
+                "vacuumed_pages": self.vacuumed,
+                "last_duration": round(self.last_duration, 6),
+            }
+
+
+def _matches(row, user_id, since, until):
+    return ((user_id is None or row["user_id"] == user_id)
+            and (since is None or row["created_at"] >= since)
+            and (until is None or row["created_at"] < until))
+
+
+def history(con, archive_dir, limit, before=None, user_id=None, since=None, until=None):
+    """
+    Activities newest first (by id), hot table and archive together. `before` is
+    the last id of the previous page. Returns (rows as dicts, next_cursor), the
+    cursor holding the `before` for the next page.
+    """
+    need = limit + 1
+    where, params = [], []
+    for clause, value in (("id < ?", before), ("user_id = ?", user_id),
+                          ("created_at >= ?", since), ("created_at < ?", until)):
+        if value is not None:
+            where.append(clause)
+            params.append(value)
+    sql = "SELECT id, user_id, message, created_at FROM activities"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    rows = [dict(row, archived=False) for row in con.execute(sql + " ORDER BY id DESC LIMIT ?", (*params, need))]
+
+    segment_where, segment_params = ["1"], []
+    for clause, value in (("first_id < ?", before), ("last_at >= ?", since), ("first_at < ?", until)):
+        if value is not None:
+            segment_where.append(clause)
+            segment_params.append(value)
+    segments = con.execute(f"SELECT path, last_id FROM activity_archive WHERE {' AND '.join(segment_where)} "
+                           "ORDER BY last_id DESC", segment_params).fetchall()
+    for path, last_id in segments:
+        # Id ranges of segments can overlap (rows archive in created_at order), so stop only
+        # once the rows already found all sort above anything this segment could add
+        if len(rows) >= need:
+            rows.sort(key=lambda row: row["id"], reverse=True)
+            del rows[need:]
+            if rows[-1]["id"] > last_id:
+                break
+        rows.extend(dict(row, archived=True) for row in read_segment(os.path.join(archive_dir, path))
+                    if (before is None or row["id"] < before) and _matches(row, user_id, since, until))
+
+    rows.sort(key=lambda row: row["id"], reverse=True)
+    return pagination.split_page(rows[:need], limit, key=lambda row: (row["id"],))
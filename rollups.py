@@ -0,0 +1,39 @@
+"""
+Read side of the daily_counts rollup table (maintained by triggers, see
+migration 3). Every function here reads a bounded number of rows, however
+long the history is.
+"""
+from datetime import datetime, timedelta
+
+
+def weekly_series(con, metric, weeks=6, today=None):
+    """
+    Counts for the last `weeks` 7-day windows ending today (UTC), oldest first.
+    The last entry is the current week.
+    """
+    today = today or datetime.utcnow().date()
+    first_day = today - timedelta(days=7 * weeks - 1)
+    series = [0] * weeks
+    rows = con.execute(
+        "SELECT day, count FROM daily_counts WHERE metric = ? AND day BETWEEN ? AND ?",
+        (metric, first_day.isoformat(), today.isoformat()),
+    )
+    for day, count in rows:
+        age = (today - datetime.strptime(day, "%Y-%m-%d").date()).days
+        series[weeks - 1 - age // 7] += count
+    return series
+
+
+def growth_percent(series):
+    # Current week against the week before
+    previous, current = series[-2], series[-1]
+    if previous == 0:
+        return 100 if current else 0
+    return round((current - previous) / previous * 100)
+
+
+def database_size(con):
+    # Bytes actually allocated to the database file (excluding any WAL)
+    page_count = con.execute("PRAGMA page_count").fetchone()[0]
+    page_size = con.execute("PRAGMA page_size").fetchone()[0]
+    return page_count * page_size
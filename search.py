@@ -0,0 +1,66 @@
+"""
+Full-text search over suggestions (FTS5 index from migration 4), ranked by BM25
+"""
+import re
+
+from markupsafe import Markup, escape
+
+import pagination
+
+# Private-use characters: can't appear in what the tokenizer indexes, so safe as snippet markers
+_OPEN, _CLOSE = "", ""
+
+
+def build_match(query):
+    """
+    Turn free text into an FTS5 query: every word must match (after stemming), and a
+    trailing * makes a word a prefix match. Quoting each word keeps FTS5 operators in
+    user input inert. Returns None when there is nothing to search for.
+    """
+    terms = [f'"{word}"{star}' for word, star in re.findall(r"(\w+)(\*?)", query or "")]
+    return " ".join(terms) or None
+
+
+def highlight(snippet):
+    # Escape the user's text, then turn our markers into <mark> tags
+    return Markup(str(escape(snippet)).replace(_OPEN, "<mark>").replace(_CLOSE, "</mark>"))
+
+
+def search(con, query, status=None, sdg_category=None, limit=25, after=None):
+    """
+    One page of matches, best first. `after` is the (rank, id) cursor of the previous page.
+    Returns (rows, next_cursor); rows are dicts with a highlighted `snippet`.
+    """
+    match = build_match(query)
+    if match is None:
+        return [], None
+
+    conditions, params = ["suggestions_fts MATCH ?"], [match]
+    if status:
+        conditions.append("s.status = ?")
+        params.append(status)
+    if sdg_category:
+        conditions.append("s.sdg_category = ?")
+        params.append(sdg_category)
+    if after:
+        rank, last_id = after
+        conditions.append("(suggestions_fts.rank > ? OR (suggestions_fts.rank = ? AND s.id > ?))")
+        params += [rank, rank, last_id]
+
+    rows = con.execute(f'''
+        SELECT s.id, s.user_id, s.fullname, s.email, s.sdg_category, s.title, s.status, s.created_at,
+               snippet(suggestions_fts, 1, '{_OPEN}', '{_CLOSE}', '…', 16) AS snippet,
+               suggestions_fts.rank AS rank
+        FROM suggestions_fts JOIN suggestions s ON s.id = suggestions_fts.rowid
+        WHERE {' AND '.join(conditions)}
+        ORDER BY suggestions_fts.rank, s.id
+        LIMIT ?
+    ''', (*params, limit + 1)).fetchall()
+
+    page, next_cursor = pagination.split_page(rows, limit, lambda r: (r["rank"], r["id"]))
+    results = []
+    for row in page:
+        result = dict(row)
+        result["snippet"] = highlight(row["snippet"])
+        results.append(result)
+    return results, next_cursor
@@ -0,0 +1,446 @@
+"""
+Production server: one master process and `workers` forked worker processes,
+each serving the shared listening socket with up to `threads` connections at a
+time (werkzeug's threaded server, so nothing to install beyond the app's own
+requirements). With `asynchronous`, workers run asgi.application on an asyncio
+HTTP/1.1 server instead: connections cost no thread, and `threads` is the size
+of the database executor.
+
+The master migrates the database and warms the caches once (app.warm_up),
+closes its connections, then forks: workers start warm and open their own
+connections. It never serves requests itself.
+
+Signals to the master:
+    TERM, INT   drain: workers stop accepting, finish what they are serving
+                (up to `drain_timeout` seconds), write out queued activities
+                and exit; then the master exits
+    HUP         graceful reload: migrate and warm up again, fork a new set of
+                workers, then drain the old set. The socket stays open
+                throughout, so no connection is refused. Workers are forked
+                from the code the master loaded: deploying code still needs a
+                restart.
+
+A worker that dies is replaced.
+"""
+import asyncio
+import http
+import os
+import select
+import signal
+import socket
+import sys
+import threading
+import time
+import urllib.parse
+
+from werkzeug.serving import ThreadedWSGIServer, WSGIRequestHandler
+
+import app as webapp
+import asgi
+import storage
+
+THREADS = 16  # default connections per threaded worker
+MAX_HEAD = 64 * 1024  # bytes of request line and headers the asyncio server accepts
+
+
+def _log(message):
+    print(f"[serve {os.getpid()}] {message}", file=sys.stderr, flush=True)
+
+
+class _Handler(WSGIRequestHandler):
+    # A client that stalls mid-request is dropped after this many seconds, so it can't hold a thread
+    # (or a drain) forever. werkzeug closes every connection after its response, so no keep-alive.
+    timeout = 5
+
+    def log_request(self, code="-", size="-"):
+        pass  # an access log line per request costs more than some of the pages
+
+
+class WorkerServer(ThreadedWSGIServer):
+    """The threaded werkzeug server on an inherited socket, at most `threads` connections at once."""
+
+    def __init__(self, sock, app, threads, keepalive=5):
+        handler = type("Handler", (_Handler,), {"timeout": keepalive})
+        host, port = sock.getsockname()[:2]
+        super().__init__(host, port, app, handler=handler, fd=sock.fileno())
+        self._slots = threading.BoundedSemaphore(threads)
+        self._idle = threading.Condition()
+        self.active = 0
+
+    def process_request(self, request, client_address):
+        # Past `threads`, stop accepting: the connection waits in the backlog for a free worker
+        self._slots.acquire()
+        with self._idle:
+            self.active += 1
+        try:
+            super().process_request(request, client_address)
+        except BaseException:
+            self._done()
+            raise
+
+    def process_request_thread(self, request, client_address):
+        try:
+            super().process_request_thread(request, client_address)
+        finally:
+            self._done()
+
+    def service_actions(self):
+        # Inside serve_forever()'s loop, so a shutdown() from here on can't be lost: let SIGTERM
+        # in (workers start with it blocked, see Master._spawn)
+        signal.pthread_sigmask(signal.SIG_UNBLOCK, {signal.SIGTERM})
+        super().service_actions()
+
+    def _done(self):
+        with self._idle:
+            self.active -= 1
+            self._idle.notify_all()
+        self._slots.release()
+
+    def drain(self, timeout):
+        """Wait for in-flight connections to finish; False if some were still open after `timeout`."""
+        with self._idle:
+            return self._idle.wait_for(lambda: self.active == 0, timeout)
+
+
+class _Response:
+    """ASGI send() for one request: buffers the head until the first body piece, chunks bodies of unknown length."""
+
+    def __init__(self, writer, method, version, keep_alive):
+        self.writer = writer
+        self.method = method
+        self.version = version
+        self.keep_alive = keep_alive
+        self.started = False
+        self.complete = False
+        self._head = b""
+        self._chunked = False
+        self._empty = False
+
+    async def send(self, message):
+        if message["type"] == "http.response.start":
+            status, headers = message["status"], message.get("headers", [])
+            self._empty = self.method == "HEAD" or status in (204, 304) or status < 200
+            if not self._empty and not any(name.lower() == b"content-length" for name, _ in headers):
+                # HTTP/1.0 has no chunked encoding: the end of the body is the end of the connection
+                self._chunked = self.version == "HTTP/1.1"
+                self.keep_alive = self.keep_alive and self._chunked
+            lines = [f"HTTP/1.1 {status} {http.HTTPStatus(status).phrase}".encode()]
+            lines += [name + b": " + value for name, value in headers]
+            if self._chunked:
+                lines.append(b"transfer-encoding: chunked")
+            if not self.keep_alive:
+                lines.append(b"connection: close")
+            self._head = b"\r\n".join(lines) + b"\r\n\r\n"
+            self.started = True
+            return
+        body, more = message.get("body", b""), message.get("more_body", False)
+        data, self._head = self._head, b""
+        if not self._empty:
+            if not self._chunked:
+                data += body
+            elif body:
+                data += b"%x\r\n%s\r\n" % (len(body), body)
+            if self._chunked and not more:
+                data += b"0\r\n\r\n"
+        if data:
+            self.writer.write(data)
+            await self.writer.drain()  # a slow client holds this coroutine back, not a thread
+        self.complete = not more
+
+
+class _HttpConnection:
+    """One client connection of the asyncio server: HTTP/1.1 keep-alive, request bodies by Content-Length."""
+
+    def __init__(self, application, reader, writer, keepalive, stopping):
+        self.application = application
+        self.reader = reader
+        self.writer = writer
+        self.keepalive = keepalive
+        self.stopping = stopping
+        # Only between requests: a connection just accepted has its first request on the way,
+        # and one accepted as the worker stopped must still get its answer
+        self.idle = False
+        self.requests = 0
+        self.buffer = bytearray()
+
+    async def _fill(self, timeout=None):
+        data = await asyncio.wait_for(self.reader.read(65536), timeout)
+        if not data:
+            raise ConnectionError("connection closed by the client")
+        self.buffer += data
+
+    async def _error(self, status):
+        phrase = http.HTTPStatus(status).phrase
+        self.writer.write(f"HTTP/1.1 {status} {phrase}\r\ncontent-length: 0\r\nconnection: close\r\n\r\n".encode())
+        await self.writer.drain()
+
+    async def run(self):
+        try:
+            while await self._request():
+                pass
+        except (ConnectionError, asyncio.TimeoutError):
+            pass
+        finally:
+            self.writer.close()
+
+    async def _request(self):
+        # One request and its response; False once the connection should close
+        self.idle = self.requests > 0
+        while (end := self.buffer.find(b"\r\n\r\n")) < 0:
+            if self.idle and not self.buffer and self.stopping.is_set():
+                return False
+            if len(self.buffer) > MAX_HEAD:
+                await self._error(431)
+                return False
+            await self._fill(self.keepalive)
+        self.idle = False
+        self.requests += 1
+        head = bytes(self.buffer[:end]).decode("latin-1")
+        del self.buffer[:end + 4]
+        try:
+            request_line, *lines = head.split("\r\n")
+            method, target, version = request_line.split(" ")
+            headers = [(name.strip().lower(), value.strip()) for name, value in (line.split(":", 1) for line in lines)]
+            fields = dict(headers)
+            length = int(fields.get("content-length", 0))
+        except ValueError:
+            await self._error(400)
+            return False
+        if "chunked" in fields.get("transfer-encoding", "").lower():
+            await self._error(411)
+            return False
+        while len(self.buffer) < length:
+            await self._fill(self.keepalive)
+        body = bytes(self.buffer[:length])
+        del self.buffer[:length]
+
+        connection = fields.get("connection", "").lower()
+        keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+        path, _, query = target.partition("?")
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": version[5:],
+            "method": method,
+            "scheme": "http",
+            "path": urllib.parse.unquote(path),
+            "raw_path": path.encode("latin-1"),
+            "query_string": query.encode("latin-1"),
+            "root_path": "",
+            "headers": [(name.encode("latin-1"), value.encode("latin-1")) for name, value in headers],
+            "client": self.writer.get_extra_info("peername")[:2],
+            "server": self.writer.get_extra_info("sockname")[:2],
+        }
+        received = False
+
+        async def receive():
+            nonlocal received
+            if not received:
+                received = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            # Asked again only by a stream waiting for the client to leave; pipelined
+            # bytes stay in the buffer for the next request
+            try:
+                while True:
+                    await self._fill()
+            except ConnectionError:
+                return {"type": "http.disconnect"}
+
+        response = _Response(self.writer, method, version, keep_alive)
+        try:
+            await self.application(scope, receive, response.send)
+        except Exception as e:
+            _log(f"{method} {path} failed: {e!r}")
+            if not response.started:
+                await self._error(500)
+            return False
+        return response.complete and response.keep_alive
+
+
+async def serve_asgi(sock, application, keepalive=5, drain_timeout=30.0):
+    """Serve `application` on the listening socket until SIGTERM, then drain like the threaded workers."""
+    loop = asyncio.get_running_loop()
+    stopping = asyncio.Event()
+    loop.add_signal_handler(signal.SIGTERM, stopping.set)
+    signal.pthread_sigmask(signal.SIG_UNBLOCK, {signal.SIGTERM})
+    connections = {}  # task -> _HttpConnection
+
+    async def handle(reader, writer):
+        task = asyncio.current_task()
+        connections[task] = _HttpConnection(application, reader, writer, keepalive, stopping)
+        try:
+            await connections[task].run()
+        finally:
+            del connections[task]
+
+    server = await asyncio.start_server(handle, sock=sock, limit=MAX_HEAD)
+    await stopping.wait()
+    server.close()
+    for task, connection in list(connections.items()):
+        if connection.idle:
+            task.cancel()
+    # Ends open activity streams; joins the poller thread, so not on the loop
+    await loop.run_in_executor(None, webapp.close_resources, ("activity_feed",))
+    if connections:
+        _, pending = await asyncio.wait(list(connections), timeout=drain_timeout)
+        if pending:
+            _log(f"{len(pending)} connections still open after {drain_timeout}s, closing them")
+            for task in pending:
+                task.cancel()
+            await asyncio.wait(pending)
+
+
+def _worker(sock, threads, keepalive, drain_timeout, asynchronous):
+    # Runs in the forked child and never returns
+    signal.set_wakeup_fd(-1)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl-C reaches the whole group: the master decides
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+    status = 0
+    try:
+        if asynchronous:
+            if threads:
+                webapp.app.config["ASYNC_DB_THREADS"] = threads
+            asyncio.run(serve_asgi(sock, asgi.application, keepalive, drain_timeout))
+        else:
+            server = WorkerServer(sock, webapp.app, threads or THREADS, keepalive)
+            # shutdown() waits for serve_forever() to return, so it can't run in the handler's own thread
+            signal.signal(signal.SIGTERM, lambda signum, frame: threading.Thread(target=server.shutdown).start())
+            server.serve_forever()
+            # Ends open activity streams, which would otherwise run until the client leaves
+            webapp.close_resources(("activity_feed",))
+            if not server.drain(drain_timeout):
+                _log(f"{server.active} connections still open after {drain_timeout}s, closing them")
+        webapp.close_resources()
+    except BaseException as e:
+        _log(f"worker failed: {e!r}")
+        status = 1
+    finally:
+        os._exit(status)
+
+
+class Master:
+
+    def __init__(self, sock, workers=2, threads=None, keepalive=5, drain_timeout=30.0, asynchronous=False):
+        self.sock = sock
+        self.workers = workers
+        self.threads = threads
+        self.keepalive = keepalive
+        self.drain_timeout = drain_timeout
+        self.asynchronous = asynchronous
+
+        self.children = {}  # pid -> generation
+        self.generation = 0
+        self._signals = []
+        self._wakeup = None
+
+    def _prepare(self):
+        webapp.warm_up()
+        webapp.close_resources(webapp.CONNECTED)
+        # The workers' metrics start from zero, not from the warm-up's queries
+        webapp.app.extensions["metrics"].clear()
+
+    def _spawn(self):
+        # The child starts with SIGTERM blocked: until its server can act on one, a TERM would
+        # run our handler in it and be lost. It stays pending and arrives once the server runs.
+        signal.pthread_sigmask(signal.SIG_BLOCK, {signal.SIGTERM})
+        pid = os.fork()
+        if pid == 0:
+            os.close(self._wakeup)
+            _worker(self.sock, self.threads, self.keepalive, self.drain_timeout, self.asynchronous)
+        signal.pthread_sigmask(signal.SIG_UNBLOCK, {signal.SIGTERM})
+        self.children[pid] = self.generation
+
+    def _signal(self, pids, signum):
+        for pid in pids:
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                pass
+
+    def _reap(self):
+        exited = []
+        while self.children:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if pid == 0:
+                break
+            generation = self.children.pop(pid, None)
+            if generation is not None:
+                exited.append((pid, generation, os.waitstatus_to_exitcode(status)))
+        return exited
+
+    def _handle(self, signum, frame):
+        self._signals.append(signum)
+
+    def reload(self):
+        old = list(self.children)
+        try:
+            self._prepare()
+        except Exception as e:
+            _log(f"reload failed, keeping the running workers: {e!r}")
+            return
+        self.generation += 1
+        for _ in range(self.workers):
+            self._spawn()
+        self._signal(old, signal.SIGTERM)
+        _log(f"reloaded: {self.workers} new workers, draining {len(old)}")
+
+    def stop(self):
+        self._signal(list(self.children), signal.SIGTERM)
+        # The workers stop on their own after drain_timeout; allow them a little longer, then kill
+        deadline = time.monotonic() + self.drain_timeout + 5
+        while self.children and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(0.05)
+        if self.children:
+            _log(f"killing {len(self.children)} workers that didn't exit")
+            self._signal(list(self.children), signal.SIGKILL)
+            for pid in list(self.children):
+                os.waitpid(pid, 0)
+                del self.children[pid]
+        self.sock.close()
+
+    def run(self):
+        # Signal handlers only record the signal; the wakeup pipe ends the select() below at once
+        self._wakeup, wakeup = os.pipe()
+        os.set_blocking(wakeup, False)
+        signal.set_wakeup_fd(wakeup)
+        for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP, signal.SIGCHLD):
+            signal.signal(signum, self._handle)
+        self._prepare()
+        for _ in range(self.workers):
+            self._spawn()
+        host, port = self.sock.getsockname()[:2]
+        kind = "asyncio" if self.asynchronous else "threaded"
+        _log(f"listening on http://{host}:{port} with {self.workers} {kind} workers")
+
+        while True:
+            if not self._signals and select.select([self._wakeup], [], [], 1.0)[0]:
+                os.read(self._wakeup, 4096)
+            pending, self._signals = self._signals, []
+            if signal.SIGTERM in pending or signal.SIGINT in pending:
+                _log("draining")
+                self.stop()
+                return 0
+            if signal.SIGHUP in pending:
+                self.reload()
+            for pid, generation, code in self._reap():
+                if generation == self.generation:
+                    _log(f"worker {pid} exited with {code}, starting another")
+                    time.sleep(0.5)  # don't spin if every new worker fails straight away
+                    self._spawn()
+
+
+def listen(host, port, backlog=1024):
+    sock = socket.create_server((host, port), backlog=backlog)
+    # Workers all wait on this socket; a worker that loses the race for a connection must get
+    # an error from accept(), not block in it where shutdown() can't reach
+    sock.setblocking(False)
+    return sock
+
+
+def serve(host="127.0.0.1", port=8000, workers=2, threads=None, keepalive=5, drain_timeout=30.0,
+          asynchronous=False):
+    if storage.is_memory(webapp.app.config["DATABASE"]):
+        raise ValueError("an in-memory database can't be shared by worker processes")
+    return Master(listen(host, port), workers, threads, keepalive, drain_timeout, asynchronous).run()
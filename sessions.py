@@ -0,0 +1,216 @@
+"""
+Server-side sessions. The cookie holds only a random session id; the data lives
+in the sessions table (migration 6), with a bounded in-process LRU in front so
+the per-request lookup is usually a dict hit. Updating or deleting a user
+rewrites or drops their sessions, so role changes apply on the next request.
+"""
+import hashlib
+import json
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+
+def _key(sid):
+    # Only a hash of the id is stored: a copy of the database can't be used to log in
+    return hashlib.sha256(sid.encode()).hexdigest()
+
+
+class ServerSession(CallbackDict, SessionMixin):
+
+    def __init__(self, data=None, sid=None, expires_at=None):
+        def on_update(self):
+            self.modified = True
+
+        super().__init__(data, on_update)
+        self.sid = sid
+        self.expires_at = expires_at
+        self.modified = False
+        self.rotate = False
+
+    def regenerate(self):
+        """New id for the same data (call on login, against session fixation)."""
+        self.rotate = True
+        self.modified = True
+
+
+class SessionStore:
+    """
+    Sessions in SQLite behind an LRU of at most `cache_size` entries. A cached entry
+    is trusted for `cache_ttl` seconds; after that it is re-read, which is how changes
+    made by other worker processes reach this one.
+    """
+
+    def __init__(self, writer, connect, lifetime, cache_size=10000, cache_ttl=5.0, sweep_interval=300.0):
+        self.writer = writer      # storage.SerializedWriter
+        self.connect = connect    # () -> context manager yielding a read connection
+        self.lifetime = lifetime  # seconds of inactivity before a session expires
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.sweep_interval = sweep_interval
+
+        self._cache = OrderedDict()  # key -> (loaded_at, user_id, data, expires_at)
+        self._lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.swept = 0
+
+    def _remember(self, key, user_id, data, expires_at):
+        with self._lock:
+            self._cache[key] = (time.monotonic(), user_id, data, expires_at)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+                self.evictions += 1
+
+    def _forget(self, keys=None, user_id=None):
+        with self._lock:
+            if user_id is not None:
+                keys = [key for key, entry in self._cache.items() if entry[1] == user_id]
+            for key in keys or ():
+                self._cache.pop(key, None)
+
+    def load(self, sid):
+        """(data, expires_at) for a live session, or None."""
+        key, now = _key(sid), time.time()
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry and time.monotonic() - entry[0] < self.cache_ttl and entry[3] > now:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return dict(entry[2]), entry[3]
+            self.misses += 1
+
+        with self.connect() as con:
+            row = con.execute("SELECT user_id, data, expires_at FROM sessions WHERE id = ? AND expires_at > ?",
+                              (key, now)).fetchone()
+        if row is None:
+            self._forget([key])
+            return None
+        data = json.loads(row[1])
+        self._remember(key, row[0], data, row[2])
+        return dict(data), row[2]
+
+    def save(self, sid, data, old_sid=None):
+        """Write the session (replacing `old_sid` if the id was rotated); returns its expiry."""
+        key, expires_at = _key(sid), time.time() + self.lifetime
+        user_id = data.get("user_id")
+        with self.writer.transaction() as cur:
+            if old_sid:
+                cur.execute("DELETE FROM sessions WHERE id = ?", (_key(old_sid),))
+            cur.execute('''
+                INSERT INTO sessions (id, user_id, data, expires_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT (id) DO UPDATE SET user_id = excluded.user_id, data = excluded.data,
+                                               expires_at = excluded.expires_at
+            ''', (key, user_id, json.dumps(data), expires_at))
+        if old_sid:
+            self._forget([_key(old_sid)])
+        self._remember(key, user_id, dict(data), expires_at)
+        return expires_at
+
+    def delete(self, sid):
+        key = _key(sid)
+        with self.writer.transaction() as cur:
+            cur.execute("DELETE FROM sessions WHERE id = ?", (key,))
+        self._forget([key])
+
+    def update_user(self, user_id, **fields):
+        """Rewrite fields (role, fullname, ...) in every session of a user."""
+        if not fields:
+            return
+        assignments = ", ".join(f"'$.{name}', ?" for name in fields)
+        with self.writer.transaction() as cur:
+            cur.execute(f"UPDATE sessions SET data = json_set(data, {assignments}) WHERE user_id = ?",
+                        (*fields.values(), user_id))
+        self._forget(user_id=user_id)
+
+    def drop_user(self, user_id):
+        """Log a user out everywhere (account deleted, password reset)."""
+        with self.writer.transaction() as cur:
+            cur.execute("DELETE FROM sessions WHERE user_id = ?", (user_id,))
+        self._forget(user_id=user_id)
+
+    def sweep(self, force=False):
+        """Delete expired sessions; without `force`, at most once per sweep_interval."""
+        with self._lock:
+            if not force and time.monotonic() - self._last_sweep < self.sweep_interval:
+                return 0
+            self._last_sweep = time.monotonic()
+        now = time.time()
+        with self.writer.transaction() as cur:
+            cur.execute("DELETE FROM sessions WHERE expires_at <= ?", (now,))
+            removed = cur.rowcount
+        with self._lock:
+            self.swept += removed
+            for key in [key for key, entry in self._cache.items() if entry[3] <= now]:
+                del self._cache[key]
+        return removed
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "cached": len(self._cache),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "swept": self.swept,
+            }
+
+
+class SqliteSessionInterface(SessionInterface):
+    """Flask session interface over a SessionStore; `get_store` is called lazily per request."""
+
+    def __init__(self, get_store):
+        self.get_store = get_store
+
+    def open_session(self, app, request):
+        store = self.get_store()
+        store.sweep()
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            loaded = store.load(sid)
+            if loaded is not None:
+                data, expires_at = loaded
+                return ServerSession(data, sid=sid, expires_at=expires_at)
+        return ServerSession()
+
+    def save_session(self, app, session, response):
+        store = self.get_store()
+        name = self.get_cookie_name(app)
+        cookie = {
+            "domain": self.get_cookie_domain(app),
+            "path": self.get_cookie_path(app),
+            "secure": self.get_cookie_secure(app),
+            "samesite": self.get_cookie_samesite(app),
+            "httponly": self.get_cookie_httponly(app),
+        }
+
+        if session.accessed:
+            response.vary.add("Cookie")
+
+        if not session:
+            # Logged out (or never logged in): nothing to keep
+            if session.modified and session.sid:
+                store.delete(session.sid)
+                response.delete_cookie(name, **cookie)
+            return
+
+        # Halfway through its lifetime, an active session gets a fresh expiry
+        refresh = session.expires_at is not None and session.expires_at - time.time() < store.lifetime / 2
+        if not (session.modified or refresh or session.sid is None):
+            return
+
+        old_sid = session.sid if session.rotate else None
+        if session.sid is None or session.rotate:
+            session.sid = secrets.token_urlsafe(32)
+        session.expires_at = store.save(session.sid, dict(session), old_sid=old_sid)
+        response.set_cookie(name, session.sid, expires=self.get_expiration_time(app, session), **cookie)
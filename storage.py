@@ -0,0 +1,254 @@
+"""
+SQLite connection management: a bounded pool of warm connections
+"""
+import queue
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+# Applied once per connection when it is opened, not on every request
+DEFAULT_PRAGMAS = {
+    "temp_store": "MEMORY",
+    "cache_size": -8000,  # negative = KiB, so ~8 MB of page cache per connection
+}
+
+# For several worker processes sharing one file: readers never wait on the writer,
+# and a writer that finds the file locked waits instead of failing straight away
+WAL_PRAGMAS = {
+    "busy_timeout": 5000,
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -20000,
+    "mmap_size": 268435456,
+    "temp_store": "MEMORY",
+}
+
+STORAGE_MODES = {
+    "default": DEFAULT_PRAGMAS,
+    "wal": WAL_PRAGMAS,
+}
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+def is_busy(error):
+    return getattr(error, "sqlite_errorcode", None) in (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED)
+
+
+def memory_uri(name):
+    # An in-memory database every connection of this process can open by name. Unlike
+    # cache=shared, it keeps normal locking: readers wait out a commit (busy timeout)
+    # instead of failing with SQLITE_LOCKED. It is freed when its last connection closes.
+    return f"file:/{name}?vfs=memdb"
+
+
+def is_memory(path):
+    return path.startswith("file:") and "vfs=memdb" in path
+
+
+def connect(path, pragmas=None, cached_statements=256, isolation_level="", factory=sqlite3.Connection):
+    # `path` is a file name or a "file:" URI (see memory_uri)
+    con = sqlite3.connect(path, check_same_thread=False, cached_statements=cached_statements,
+                          isolation_level=isolation_level, factory=factory, uri=path.startswith("file:"))
+    con.row_factory = sqlite3.Row
+    for name, value in (pragmas or {}).items():
+        con.execute(f"PRAGMA {name} = {value}")
+    return con
+
+
+def copy_database(source, target):
+    """Copy the database at `source` (path or URI) into the open connection `target`, page by page."""
+    con = sqlite3.connect(source, uri=source.startswith("file:"))
+    try:
+        con.backup(target)
+    finally:
+        con.close()
+
+
+class ConnectionPool:
+    """Hands out at most `size` connections; callers block up to `timeout` when exhausted."""
+
+    def __init__(self, path, size=8, timeout=5.0, pragmas=None, cached_statements=256, factory=sqlite3.Connection):
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self.pragmas = dict(pragmas or {})
+        self.cached_statements = cached_statements
+        self.factory = factory
+
+        # LIFO so the most recently used (warmest) connection goes out first
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+
+        self.connections = 0
+        self.acquired = 0
+        self.in_use = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        self.max_wait = 0.0
+        self.timeouts = 0
+
+    def acquire(self):
+        if not self._slots.acquire(blocking=False):
+            # Pool exhausted: wait for another request to give a connection back
+            start = time.perf_counter()
+            got = self._slots.acquire(timeout=self.timeout)
+            waited = time.perf_counter() - start
+            with self._lock:
+                self.waits += 1
+                self.wait_time += waited
+                self.max_wait = max(self.max_wait, waited)
+                if not got:
+                    self.timeouts += 1
+            if not got:
+                raise PoolTimeout(f"no database connection available after {self.timeout}s")
+
+        try:
+            con = self._idle.get_nowait()
+        except queue.Empty:
+            try:
+                con = connect(self.path, self.pragmas, self.cached_statements, factory=self.factory)
+            except Exception:
+                self._slots.release()
+                raise
+            with self._lock:
+                self.connections += 1
+
+        with self._lock:
+            self.acquired += 1
+            self.in_use += 1
+        return con
+
+    def release(self, con):
+        try:
+            # Never hand the next caller someone else's half-finished transaction
+            if con.in_transaction:
+                con.rollback()
+            self._idle.put(con)
+        except sqlite3.Error:
+            # Broken connection: drop it, a fresh one is opened on demand
+            con.close()
+            with self._lock:
+                self.connections -= 1
+        finally:
+            with self._lock:
+                self.in_use -= 1
+            self._slots.release()
+
+    def close(self):
+        while True:
+            try:
+                con = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            con.close()
+            with self._lock:
+                self.connections -= 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": self.size,
+                "open": self.connections,
+                "in_use": self.in_use,
+                "idle": self.connections - self.in_use,
+                "acquired": self.acquired,
+                "waits": self.waits,
+                "wait_time": round(self.wait_time, 6),
+                "max_wait": round(self.max_wait, 6),
+                "timeouts": self.timeouts,
+            }
+
+
+class SerializedWriter:
+    """
+    Runs every write of this process on one dedicated connection, one transaction
+    at a time. Other processes are serialized by SQLite's own write lock; when it is
+    held we back off and retry instead of surfacing "database is locked".
+    """
+
+    def __init__(self, path, pragmas=None, retries=6, backoff=0.02, cached_statements=256,
+                 factory=sqlite3.Connection, on_commit=None):
+        self.path = path
+        self.pragmas = dict(pragmas or {})
+        self.retries = retries
+        self.backoff = backoff
+        self.cached_statements = cached_statements
+        self.factory = factory
+        self.on_commit = on_commit  # called with no arguments after each successful COMMIT
+
+        self._con = None
+        self._lock = threading.Lock()
+        # Separate from _lock, which is held for the whole transaction
+        self._stats_lock = threading.Lock()
+
+        self.transactions = 0
+        self.retried = 0
+        self.failures = 0
+
+    def _connection(self):
+        if self._con is None:
+            # Autocommit mode: BEGIN/COMMIT are issued explicitly below
+            self._con = connect(self.path, self.pragmas, self.cached_statements, isolation_level=None,
+                                factory=self.factory)
+        return self._con
+
+    def _retry(self, statement):
+        for attempt in range(self.retries + 1):
+            try:
+                return self._con.execute(statement)
+            except sqlite3.OperationalError as e:
+                if not is_busy(e) or attempt == self.retries:
+                    raise
+                with self._stats_lock:
+                    self.retried += 1
+                # Exponential backoff with jitter so competing workers spread out
+                time.sleep(self.backoff * (2 ** attempt) * (0.5 + random.random()))
+
+    @contextmanager
+    def transaction(self):
+        """
+        Usage: with writer.transaction() as cur: cur.execute(...)
+        Not re-entrant: don't open a second transaction from inside the block.
+        """
+        with self._lock:
+            con = self._connection()
+            try:
+                # Take the write lock up front so we never fail halfway through
+                self._retry("BEGIN IMMEDIATE")
+            except sqlite3.Error:
+                with self._stats_lock:
+                    self.failures += 1
+                raise
+            try:
+                yield con.cursor()
+                self._retry("COMMIT")
+                with self._stats_lock:
+                    self.transactions += 1
+                if self.on_commit is not None:
+                    self.on_commit()
+            except BaseException:
+                with self._stats_lock:
+                    self.failures += 1
+                if con.in_transaction:
+                    con.rollback()
+                raise
+
+    def close(self):
+        with self._lock:
+            if self._con is not None:
+                self._con.close()
+                self._con = None
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "transactions": self.transactions,
+                "retried": self.retried,
+                "failures": self.failures,
+            }
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Tests for the background, batched activity-log writer
+"""
+import sqlite3
+
+import activity_log
+import storage
+
+
+def _writer(tmp_path, create_table=True):
+    path = str(tmp_path / "activity.db")
+    writer = storage.SerializedWriter(path)
+    if create_table:
+        with writer.transaction() as cur:
+            cur.execute("CREATE TABLE activities (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, "
+                        "message TEXT NOT NULL, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)")
+    return path, writer
+
+
+def test_rows_are_written_in_batches(tmp_path):
+    path, writer = _writer(tmp_path)
+    log = activity_log.ActivityWriter(writer, batch_size=50, flush_interval=0.5)
+    for i in range(120):
+        log.log(1, f"event {i}")
+    log.flush()
+
+    con = sqlite3.connect(path)
+    messages = [row[0] for row in con.execute("SELECT message FROM activities ORDER BY id")]
+    con.close()
+    assert messages == [f"event {i}" for i in range(120)]
+    stats = log.stats()
+    assert stats["written"] == 120 and stats["queued"] == 0
+    assert stats["batches"] <= 4  # 120 rows, not 120 transactions
+    log.close()
+    writer.close()
+
+
+def test_close_writes_what_is_queued(tmp_path):
+    path, writer = _writer(tmp_path)
+    log = activity_log.ActivityWriter(writer, batch_size=1000, flush_interval=60)
+    log.log(1, "last words")
+    log.close()
+
+    con = sqlite3.connect(path)
+    assert con.execute("SELECT COUNT(*) FROM activities").fetchone()[0] == 1
+    con.close()
+    writer.close()
+
+
+def test_full_queue_drops_and_counts(tmp_path):
+    path, writer = _writer(tmp_path)
+    log = activity_log.ActivityWriter(writer, batch_size=10, flush_interval=0.01, max_queue=5)
+    # Hold the write lock so the worker thread can't drain the queue
+    with writer._lock:
+        results = [log.log(1, f"event {i}") for i in range(20)]
+    log.flush()
+
+    # The worker may already hold one batch (batch_size) besides the full queue (max_queue)
+    assert results.count(False) >= 20 - 10 - 5
+    stats = log.stats()
+    assert stats["dropped"] == results.count(False)
+    assert stats["written"] == results.count(True)
+    log.close()
+    writer.close()
+
+
+def test_failed_batches_are_counted_not_swallowed(tmp_path):
+    _, writer = _writer(tmp_path, create_table=False)
+    log = activity_log.ActivityWriter(writer, batch_size=10, flush_interval=0.01)
+    log.log(1, "nowhere to go")
+    log.flush()
+
+    assert log.stats()["failed"] == 1
+    log.close()
+    writer.close()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Tests for the JSON API (/api/v1/..., api.py)
+"""
+import gzip
+import json
+
+import api
+import app as webapp
+from conftest import login
+
+
+def _seed(count):
+    with webapp.get_writer().transaction() as cur:
+        cur.execute("INSERT INTO users (fullname, email, password, role) VALUES ('Ana Cruz', 'ana@example.com', "
+                    "'x', 'admin')")
+        cur.executemany("INSERT INTO suggestions (user_id, fullname, email, sdg_category, title, description, "
+                        "status, created_at) VALUES (1, 'Ana Cruz', 'ana@example.com', ?, ?, 'Details', ?, ?)",
+                        [("SDG 6" if i % 2 else "SDG 4", f"Idea {i}", "approved" if i % 3 else "pending",
+                          f"2025-01-{1 + i:02d} 00:00:00") for i in range(count)])
+
+
+def _json(response):
+    assert response.mimetype == "application/json"
+    data = response.get_data()
+    if response.headers.get("Content-Encoding") == "gzip":
+        data = gzip.decompress(data)
+    return json.loads(data)
+
+
+def test_json_object_round_trips(temp_app):
+    with temp_app.app_context():
+        row = webapp.get_db().execute(
+            f"SELECT {api.json_object(('id', 'title', 'similarity'))} "
+            "FROM (SELECT 7 AS id, 'Say \"hi\" – ok' || char(10) AS title, NULL AS similarity)").fetchone()
+    assert json.loads(api.body([row])) == {"data": [{"id": 7, "title": 'Say "hi" – ok\n', "similarity": None}]}
+
+
+def test_pages_follow_the_cursor(client):
+    _seed(7)
+    login(client)
+    seen, cursor = [], None
+    while True:
+        page = _json(client.get("/api/v1/suggestions", query_string={"limit": 3, "fields": "id,title",
+                                                                     "cursor": cursor or ""}))
+        assert all(set(row) == {"id", "title"} for row in page["data"])
+        seen += [row["title"] for row in page["data"]]
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+    assert seen == [f"Idea {i}" for i in reversed(range(7))]
+
+
+def test_filters(client):
+    _seed(6)
+    login(client)
+    page = _json(client.get("/api/v1/suggestions?status=pending&sdg=SDG+4&fields=title"))
+    assert [row["title"] for row in page["data"]] == ["Idea 0"]
+
+
+def test_batched_get_keeps_the_requested_order(client):
+    _seed(5)
+    login(client)
+    page = _json(client.get("/api/v1/suggestions?ids=4,99,2&fields=id"))
+    assert page["data"] == [{"id": 4}, {"id": 2}]
+    assert page["missing"] == [99]
+
+    assert client.get("/api/v1/suggestions?ids=1,x").status_code == 400
+    assert client.get("/api/v1/suggestions?fields=id,password").status_code == 400
+
+
+def test_single_item(client):
+    _seed(1)
+    login(client)
+    assert _json(client.get("/api/v1/suggestions/1?fields=status"))["data"] == {"status": "pending"}
+    assert client.get("/api/v1/suggestions/42").status_code == 404
+
+
+def test_users_are_admin_only_and_never_include_passwords(client):
+    _seed(0)
+    assert client.get("/api/v1/users").status_code == 401
+    login(client, role="user")
+    assert client.get("/api/v1/users").status_code == 403
+
+    login(client)
+    users = _json(client.get("/api/v1/users"))["data"]
+    assert users == [{"id": 1, "fullname": "Ana Cruz", "email": "ana@example.com", "role": "admin",
+                      "created_at": users[0]["created_at"]}]
+
+
+def test_large_responses_are_gzipped(client):
+    _seed(30)
+    login(client)
+    response = client.get("/api/v1/suggestions?limit=30", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert len(_json(response)["data"]) == 30
+
+    small = client.get("/api/v1/suggestions?limit=1&fields=id", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in small.headers
+
+
+def test_activities_and_stats(client):
+    _seed(3)
+    webapp.log_activity(1, "first")
+    webapp.log_activity(1, "second")
+    webapp.get_activity_writer().flush()
+    login(client)
+
+    page = _json(client.get("/api/v1/activities?limit=1&fields=message"))
+    assert page["data"] == [{"message": "second"}] and page["next_cursor"]
+
+    stats = _json(client.get("/api/v1/stats"))
+    assert stats["users"] == {"total": 1, "by_role": {"admin": 1}}
+    assert stats["suggestions"]["by_status"] == {"pending": 1, "approved": 2}
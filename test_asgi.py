@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Tests for the ASGI variant of the app (asgi.py), called directly without a server
+"""
+import asyncio
+import json
+import threading
+
+import pytest
+
+import app as webapp
+import asgi
+from conftest import login
+
+
+def _scope(path, method="GET", cookie=None):
+    path, _, query = path.partition("?")
+    headers = [(b"host", b"testserver")] + ([(b"cookie", cookie.encode())] if cookie else [])
+    return {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method, "scheme": "http",
+            "path": path, "query_string": query.encode(), "root_path": "", "headers": headers,
+            "client": ("127.0.0.1", 50000), "server": ("testserver", 80)}
+
+
+async def _request(path, method="GET", cookie=None, body=b""):
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    await asgi.application(_scope(path, method, cookie), receive, send)
+    start, *bodies = sent
+    return start["status"], dict(start["headers"]), b"".join(message.get("body", b"") for message in bodies)
+
+
+def _log(message):
+    webapp.log_activity(1, message)
+    webapp.get_activity_writer().flush()
+
+
+def _cookie(client):
+    login(client)
+    return f"session={client.get_cookie('session').value}"
+
+
+def test_views_run_on_the_executor(client):
+    status, headers, body = asyncio.run(_request("/api/v1/stats", cookie=_cookie(client)))
+    assert status == 200 and headers[b"content-type"] == b"application/json"
+    assert json.loads(body)["suggestions"]["by_status"] == {}
+    assert webapp.app.extensions["db_executor"].stats()["calls"] == 1
+
+    status, headers, _ = asyncio.run(_request("/api/v1/stats"))
+    assert status == 401
+
+
+def test_saturated_executor_sheds_load(temp_app):
+    temp_app.config.update(ASYNC_DB_THREADS=1, ASYNC_DB_MAX_PENDING=1, ASYNC_DB_TIMEOUT=0.05)
+    release = threading.Event()
+
+    async def scenario():
+        executor = asgi.get_executor()
+        blocker = asyncio.ensure_future(executor.run(release.wait, 5))
+        await asyncio.sleep(0.01)
+        try:
+            with pytest.raises(asgi.Saturated):
+                await executor.run(int)
+            return await _request("/metrics")
+        finally:
+            release.set()
+            await blocker
+
+    status, headers, body = asyncio.run(scenario())
+    assert status == 503 and headers[b"retry-after"] == b"1"
+    assert asgi.get_executor().stats()["saturated"] == 2
+
+
+def test_activity_stream_waits_on_the_loop(client):
+    webapp.app.config.update(FEED_HEARTBEAT=5.0, FEED_POLL_INTERVAL=30.0)
+    cookie = _cookie(client)
+
+    async def scenario():
+        requests = [{"type": "http.request", "body": b"", "more_body": False}]
+        disconnect = asyncio.Event()
+        received = asyncio.Queue()
+
+        async def receive():
+            if requests:
+                return requests.pop()
+            await disconnect.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            await received.put(message)
+
+        task = asyncio.ensure_future(asgi.application(_scope("/activities/stream", cookie=cookie), receive, send))
+        assert (await received.get())["status"] == 200
+        assert (await received.get())["body"].startswith(b"retry:")
+        # Written from another thread; the poller wakes this coroutine through its listener
+        await asyncio.get_running_loop().run_in_executor(None, _log, "approved suggestion 3")
+        event = (await asyncio.wait_for(received.get(), 5))["body"].decode()
+        assert "approved suggestion 3" in event
+        disconnect.set()
+        await asyncio.wait_for(task, 5)
+
+    asyncio.run(scenario())
+    assert webapp.get_feed().stats()["subscribers"] == 0
+
+
+def test_anonymous_stream_is_redirected(temp_app):
+    status, headers, _ = asyncio.run(_request("/activities/stream"))
+    assert status == 302 and headers[b"location"].endswith(b"/login")
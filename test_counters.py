@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Tests for the summary counter cache and its invalidation by the write routes
+"""
+import app as webapp
+import counters
+from conftest import login
+
+
+def _counts(rendered, name):
+    _, context = rendered[-1]
+    return context[name]
+
+
+def test_cache_hits_until_invalidated(temp_app):
+    cache = counters.CounterCache(ttl=60)
+    with temp_app.app_context():
+        con = webapp.get_db()
+        assert cache.get(con, "roles") == {}
+        assert cache.get(con, "roles") == {}
+        assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+        con.execute("INSERT INTO users (fullname, email, password, role) VALUES ('A', 'a@example.com', 'x', 'admin')")
+        con.commit()
+        assert cache.get(con, "roles") == {}  # still cached
+        cache.invalidate("roles")
+        assert cache.get(con, "roles") == {"admin": 1}
+
+
+def test_routes_invalidate_counts(client, rendered):
+    login(client)
+    client.get("/statistics")
+    assert _counts(rendered, "total_users") == 0
+
+    client.post("/add-user", data={"fullname": "New Person", "email": "n@example.com",
+                                   "password": "secret1", "role": "moderator"})
+    client.get("/statistics")
+    assert _counts(rendered, "moderator_count") == 1
+
+    client.post("/submit-suggestion", data={"email": "n@example.com", "sdg_category": "SDG 6",
+                                            "title": "Water", "description": "Clean water"})
+    client.get("/suggestions")
+    assert _counts(rendered, "pending_count") == 1
+
+    client.post("/update-suggestion/1", data={"status": "approved"})
+    client.get("/suggestions")
+    assert _counts(rendered, "pending_count") == 0
+    assert _counts(rendered, "approved_count") == 1
+
+    stats = webapp.get_counters().stats()
+    assert stats["misses"] >= 4 and stats["invalidations"] >= 3
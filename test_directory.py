@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Tests for the user directory and the routes that use and invalidate it
+"""
+import app as webapp
+import directory
+import storage
+from conftest import login
+
+
+def _add(con, fullname, email, role="user", password="x"):
+    con.execute("INSERT INTO users (fullname, email, password, role) VALUES (?, ?, ?, ?)",
+                (fullname, email, password, role))
+    con.commit()
+
+
+def test_loads_once_per_version(temp_app):
+    users = directory.UserDirectory()
+    with temp_app.app_context():
+        con = webapp.get_db()
+        _add(con, "ana maria cruz", "ana@example.com", "admin")
+        snapshot = users.get(con, 1)
+        ana = snapshot.find("ana@example.com")
+        assert (ana.fullname, ana.role, ana.initials) == ("ana maria cruz", "admin", "AM")
+        assert snapshot.get(ana.id) is ana and snapshot.name(99, "gone") == "gone"
+        assert not hasattr(ana, "__dict__")
+
+        _add(con, "Bo", "bo@example.com")
+        assert users.get(con, 1) is snapshot  # same version: not reloaded
+        assert users.get(con, 2).find("bo@example.com").fullname == "Bo"
+        users.invalidate()
+        assert users.get(con, 2) is not snapshot
+        assert users.stats() == {"users": 2, "hits": 1, "misses": 3, "invalidations": 1}
+
+
+def test_renames_show_on_suggestions(client, rendered):
+    login(client, user_id=99)
+    client.post("/add-user", data={"fullname": "Ana Cruz", "email": "ana@example.com", "password": "secret1"})
+    author = webapp.current_users(webapp.get_db()).find("ana@example.com")
+    login(client, user_id=author.id, role="user", fullname="Ana Cruz", email="ana@example.com")
+    client.post("/submit-suggestion", data={"email": "ana@example.com", "sdg_category": "SDG 6",
+                                            "title": "Water", "description": "Clean water"})
+
+    login(client, user_id=99)
+    client.post(f"/update-user/{author.id}", data={"fullname": "Ana Silva", "email": "ana@example.com",
+                                                   "role": "user"})
+    client.get("/suggestions")
+    _, context = rendered[-1]
+    assert [s["fullname"] for s in context["suggestions"]] == ["Ana Silva"]
+
+    client.post(f"/delete-user/{author.id}")
+    assert webapp.current_users(webapp.get_db()).find("ana@example.com") is None
+    client.get("/suggestions")
+    _, context = rendered[-1]
+    assert [s["fullname"] for s in context["suggestions"]] == ["Ana Cruz"]  # gone: the name stored at submit time
+
+
+def test_login_finds_accounts_the_directory_has_not_seen(client):
+    form = {"fullname": "Ana Cruz", "email": "ana@example.com", "password": "secret1", "confirm_password": "secret1"}
+    client.post("/register", data=form)
+    assert client.post("/login", data={"email": "ana@example.com", "password": "secret1"}).status_code == 302
+
+    # Another worker's insert: this process's data version isn't invalidated, so the directory is stale
+    webapp.current_users(webapp.get_db())
+    con = storage.connect(webapp.app.config["DATABASE"])
+    _add(con, "Bo", "bo@example.com", password="secret2")
+    con.close()
+    assert client.post("/login", data={"email": "bo@example.com", "password": "secret2"}).status_code == 302
+    with client.session_transaction() as sess:
+        assert (sess["fullname"], sess["avatar"]) == ("Bo", "B")
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Tests for near-duplicate detection on suggestion submission (duplicates.py)
+"""
+import app as webapp
+import duplicates
+from conftest import login
+
+DESCRIPTION = "Install solar powered street lights along the main road from the plaza to the elementary school"
+
+
+def _submit(client, title, description=DESCRIPTION):
+    return client.post("/submit-suggestion", data={"email": "a@example.com", "sdg_category": "SDG 7",
+                                                   "title": title, "description": description})
+
+
+def _suggestions(temp_app):
+    with temp_app.app_context():
+        return webapp.get_db().execute("SELECT id, duplicate_of, similarity FROM suggestions ORDER BY id").fetchall()
+
+
+def test_signature_similarity_tracks_overlap():
+    a = duplicates.signature("Solar street lights: " + DESCRIPTION)
+    b = duplicates.signature("Solar streetlights!! " + DESCRIPTION.upper())
+    c = duplicates.signature("Mangrove planting with the youth council along the coast")
+    assert duplicates.similarity(a, a) == 1.0
+    assert duplicates.similarity(a, b) > 0.8
+    assert duplicates.similarity(a, c) < 0.2
+
+
+def test_resubmission_is_flagged_against_the_original(client, temp_app):
+    login(client)
+    _submit(client, "Solar street lights")
+    response = _submit(client, "Street lights (solar)")
+    _submit(client, "Solar lights on the main road")
+    _submit(client, "Mangroves", "Plant mangroves along the coast with the youth council")
+
+    assert "similar%20to%20suggestion%20ID%201" in response.headers["Location"]
+    rows = _suggestions(temp_app)
+    # Every copy points at the first submission, not at each other
+    assert [row["duplicate_of"] for row in rows] == [None, 1, 1, None]
+    assert rows[1]["similarity"] >= webapp.app.config["DUPLICATE_THRESHOLD"]
+
+
+def test_deleting_the_original_releases_its_copies(client, temp_app):
+    login(client)
+    _submit(client, "Solar street lights")
+    _submit(client, "Street lights (solar)")
+
+    with webapp.get_writer().transaction() as cur:
+        cur.execute("DELETE FROM suggestions WHERE id = 1")
+        assert cur.execute("SELECT COUNT(*) FROM suggestion_lsh WHERE suggestion_id = 1").fetchone()[0] == 0
+    assert [row["duplicate_of"] for row in _suggestions(temp_app)] == [None]
+
+
+def test_similar_view_lists_the_group(client, rendered):
+    login(client)
+    _submit(client, "Solar street lights")
+    _submit(client, "Street lights (solar)")
+    _submit(client, "Mangroves", "Plant mangroves along the coast with the youth council")
+
+    client.get("/suggestions/2/similar")
+    name, context = rendered[-1]
+    assert name == "similar_suggestions.html"
+    assert context["suggestion"]["id"] == 2
+    assert [row["id"] for row in context["group"]] == [1]
+    assert context["similar"] == []
+
+
+def test_migration_backfills_existing_suggestions(tmp_path):
+    import sqlite3
+
+    import migrations
+
+    con = sqlite3.connect(str(tmp_path / "old.db"), isolation_level=None)
+    con.execute("BEGIN")
+    for version, _, steps in migrations.MIGRATIONS[:4]:
+        for step in steps:
+            con.execute(step)
+    con.execute("PRAGMA user_version = 4")
+    con.execute("COMMIT")
+    for title in ("Solar street lights", "Street lights (solar)"):
+        con.execute("INSERT INTO suggestions (user_id, fullname, email, sdg_category, title, description) "
+                    "VALUES (1, 'A', 'a@example.com', 'SDG 7', ?, ?)", (title, DESCRIPTION))
+
+    assert migrations.migrate(con)[0] == 5
+    assert [row[0] for row in con.execute("SELECT duplicate_of FROM suggestions ORDER BY id")] == [None, 1]
+    con.close()
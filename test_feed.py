@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Tests for the live activity feed over Server-Sent Events (feed.py)
+"""
+import time
+
+import app as webapp
+from conftest import login
+
+
+def _log(*messages):
+    for message in messages:
+        webapp.log_activity(1, message)
+    webapp.get_activity_writer().flush()
+
+
+def _open(client, **headers):
+    response = client.get("/activities/stream", headers=headers, buffered=False)
+    assert response.status_code == 200
+    assert response.mimetype == "text/event-stream"
+    chunks = iter(response.response)
+    assert next(chunks).startswith(b"retry:")
+    return response, chunks
+
+
+def test_new_activities_are_pushed(temp_app, client):
+    temp_app.config.update(FEED_HEARTBEAT=5.0, FEED_POLL_INTERVAL=30.0)
+    login(client)
+    _log("before the stream")
+    response, chunks = _open(client)
+
+    # Our own writes wake the poller; the 30 s poll interval would time the test out
+    _log("moderated suggestion 7")
+    event = next(chunks).decode()
+    assert "event: activity" in event and "moderated suggestion 7" in event
+    assert "before the stream" not in event
+
+    assert webapp.get_feed().stats()["subscribers"] == 1
+    response.close()
+    assert webapp.get_feed().stats()["subscribers"] == 0
+
+
+def test_last_event_id_resumes_from_the_table(temp_app, client):
+    temp_app.config.update(FEED_HEARTBEAT=5.0)
+    login(client)
+    _log("one", "two", "three", "four")
+    ids = [row[0] for row in webapp.get_db().execute("SELECT id FROM activities ORDER BY id")]
+
+    # Older than anything buffered, so the missed rows come from activities
+    response, chunks = _open(client, **{"Last-Event-ID": str(ids[1])})
+    event = next(chunks).decode()
+    assert [line for line in event.splitlines() if line.startswith("id:")] == [f"id: {ids[2]}", f"id: {ids[3]}"]
+    assert "three" in event and "four" in event and "two" not in event
+    response.close()
+
+
+def test_buffer_keeps_recent_events_only(temp_app):
+    temp_app.config.update(FEED_BUFFER_SIZE=2, FEED_POLL_INTERVAL=0.01)
+    activity_feed = webapp.get_feed()
+    start = activity_feed.subscribe()
+    _log("a", "b", "c")
+    deadline = time.monotonic() + 5
+    while activity_feed.stats()["published"] < 3 and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    events = activity_feed.events_after(start + 1, timeout=0)
+    assert [message for _, message, _ in events] == ["b", "c"]
+    # The first row fell out of the buffer: the caller has to read the table
+    assert activity_feed.events_after(start, timeout=0) is None
+    activity_feed.unsubscribe()
+
+
+def test_subscriber_limit(temp_app, client):
+    temp_app.config.update(FEED_MAX_SUBSCRIBERS=1, FEED_HEARTBEAT=5.0)
+    login(client)
+    response, _ = _open(client)
+
+    refused = client.get("/activities/stream")
+    assert refused.status_code == 503
+    assert "Retry-After" in refused.headers
+    response.close()
+
+
+def test_requires_login(client):
+    assert client.get("/activities/stream").status_code == 302
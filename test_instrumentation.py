@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Tests for per-request query/render instrumentation (instrumentation.py)
+"""
+import logging
+import sqlite3
+
+import pytest
+
+import instrumentation
+from conftest import login
+
+
+@pytest.fixture
+def profiled(temp_app):
+    # Must be on before the first request creates the pool, as in production
+    temp_app.config.update(INSTRUMENTATION=True, SLOW_QUERY_MS=100)
+    return temp_app
+
+
+def test_statements_rows_and_time_are_recorded():
+    con = sqlite3.connect(":memory:", factory=instrumentation.InstrumentedConnection)
+    profile = instrumentation.RequestProfile()
+    token = instrumentation._profile.set(profile)
+    try:
+        con.execute("CREATE TABLE t (x INTEGER)")
+        con.executemany("INSERT INTO t VALUES (?)", [(i,) for i in range(5)])
+        cur = con.cursor()
+        cur.execute("SELECT x FROM t")
+        assert len(list(cur)) == 5
+        con.execute("SELECT x FROM t WHERE x > 2").fetchall()
+    finally:
+        instrumentation._profile.reset(token)
+
+    assert [q.rows for q in profile.queries] == [0, 5, 5, 2]
+    assert profile.queries[2].sql == "SELECT x FROM t"
+    assert all(q.duration > 0 for q in profile.queries)
+
+    con.execute("SELECT 1")  # no request running: nothing recorded, nothing breaks
+    assert len(profile.queries) == 4
+
+
+def test_headers_and_summary_log(profiled, client, caplog):
+    login(client)
+    with caplog.at_level(logging.INFO, logger="instrumentation"):
+        response = client.get("/statistics")
+
+    assert int(response.headers["X-Query-Count"]) >= 4
+    timing = response.headers["Server-Timing"]
+    assert timing.startswith("db;dur=") and "render;dur=" in timing and "total;dur=" in timing
+    assert any("GET /statistics 200" in record.getMessage() for record in caplog.records)
+
+
+def test_slow_query_log_omits_parameters(profiled, client, caplog):
+    profiled.config["SLOW_QUERY_MS"] = 0
+    with caplog.at_level(logging.WARNING, logger="instrumentation.slow"):
+        client.post("/login", data={"email": "someone@example.com", "password": "hunter22"})
+
+    slow = [record.getMessage() for record in caplog.records if record.name == "instrumentation.slow"]
+    assert any("FROM users WHERE email = ?" in message for message in slow)
+    assert not any("someone@example.com" in message for message in slow)
+
+
+def test_off_by_default(client):
+    login(client)
+    response = client.get("/statistics")
+    assert "X-Query-Count" not in response.headers
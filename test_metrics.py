@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Tests for the metrics registry and /metrics (metrics.py)
+"""
+import metrics
+from conftest import login
+
+
+def _sample(text, line_start):
+    return [line for line in text.splitlines() if line.startswith(line_start)]
+
+
+def test_text_format():
+    registry = metrics.Registry()
+    hits = registry.counter("hits_total", "Hits", ("path",))
+    hits.labels('/a"b').inc()
+    hits.labels('/a"b').inc(2)
+    latency = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5):
+        latency.observe(value)
+    registry.collector(lambda: [("queue_length", "gauge", "Queued", (), {(): 7})])
+
+    text = registry.render()
+    assert 'hits_total{path="/a\\"b"} 3' in text
+    assert _sample(text, "latency_seconds_bucket") == [
+        'latency_seconds_bucket{le="0.1"} 1',
+        'latency_seconds_bucket{le="1.0"} 2',
+        'latency_seconds_bucket{le="+Inf"} 3',
+    ]
+    assert "latency_seconds_count 3" in text and "latency_seconds_sum 5.55" in text
+    assert "# TYPE queue_length gauge\nqueue_length 7" in text
+
+
+def test_requests_and_handled_errors_are_counted(client):
+    login(client)
+    client.get("/suggestions")
+    client.get("/suggestions?cursor=not-a-cursor")  # caught by the route, shown as an error page
+
+    text = client.get("/metrics").get_data(as_text=True)
+    assert 'http_requests_total{endpoint="suggestions",method="GET",status="200"} 2' in text
+    assert 'http_request_duration_seconds_count{endpoint="suggestions",method="GET"} 2' in text
+    assert 'app_handled_errors_total{endpoint="suggestions",exception="ValueError"} 1' in text
+    assert 'db_pool_connections{state="in_use"}' in text
+
+
+def test_token_protects_the_endpoint(temp_app, client):
+    temp_app.config["METRICS_TOKEN"] = "s3cret"
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer s3cret"}).status_code == 200
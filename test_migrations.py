@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Tests for the schema migrations, plus an EXPLAIN QUERY PLAN regression check
+that the hot queries are served from an index instead of a scan + sort
+"""
+import sqlite3
+
+import pytest
+
+import migrations
+
+# (query, parameters) as run by the routes
+HOT_QUERIES = [
+    ("SELECT message, created_at FROM activities ORDER BY created_at DESC LIMIT 10", ()),
+    ("SELECT id, fullname, email, sdg_category, title, description, status, created_at "
+     "FROM suggestions ORDER BY created_at DESC", ()),
+    ("SELECT id, fullname, email, sdg_category, title, description, status, created_at "
+     "FROM suggestions WHERE status = ? ORDER BY created_at DESC", ("pending",)),
+    ("SELECT COUNT(*) FROM suggestions WHERE status = 'pending'", ()),
+    ("SELECT id FROM suggestions WHERE user_id = ?", (1,)),
+    ("SELECT id, fullname, email, role FROM users ORDER BY role DESC, fullname", ()),
+    ("SELECT COUNT(*) FROM users WHERE role = 'admin'", ()),
+    # What the paginated routes run: the first page of /suggestions and /manage...
+    ("SELECT id, user_id, fullname, email, sdg_category, title, description, status, created_at, duplicate_of, "
+     "similarity FROM suggestions ORDER BY created_at DESC, id DESC LIMIT ?", (26,)),
+    ("SELECT id, user_id, fullname, email, sdg_category, title, description, status, created_at, duplicate_of, "
+     "similarity FROM suggestions WHERE status = ? ORDER BY created_at DESC, id DESC LIMIT ?", ("pending", 26)),
+    ("SELECT id, fullname, email, role FROM users ORDER BY role DESC, fullname, id LIMIT ?", (26,)),
+]
+
+# ...and the pages after it, from a cursor: these must seek into the index, not scan it from the start
+KEYSET_QUERIES = [
+    ("SELECT id, user_id, fullname, email, sdg_category, title, description, status, created_at, duplicate_of, "
+     "similarity FROM suggestions WHERE created_at <= ? AND (created_at < ? OR id < ?) "
+     "ORDER BY created_at DESC, id DESC LIMIT ?", ("2025-01-01", "2025-01-01", 10, 26)),
+    ("SELECT id, user_id, fullname, email, sdg_category, title, description, status, created_at, duplicate_of, "
+     "similarity FROM suggestions WHERE status = ? AND created_at <= ? AND (created_at < ? OR id < ?) "
+     "ORDER BY created_at DESC, id DESC LIMIT ?", ("pending", "2025-01-01", "2025-01-01", 10, 26)),
+    ("SELECT id, fullname, email, role FROM users WHERE role <= ? AND (role < ? OR fullname > ? "
+     "OR (fullname = ? AND id > ?)) ORDER BY role DESC, fullname, id LIMIT ?", ("user", "user", "A", "A", 3, 26)),
+]
+
+
+@pytest.fixture
+def con(tmp_path):
+    con = sqlite3.connect(str(tmp_path / "migrate.db"), isolation_level=None)
+    yield con
+    con.close()
+
+
+def test_migrate_applies_everything_once(con):
+    assert migrations.migrate(con) == [v for v, _, _ in migrations.MIGRATIONS]
+    assert migrations.current_version(con) == migrations.latest_version()
+    # Second run (next startup) is a no-op
+    assert migrations.migrate(con) == []
+
+
+def test_migrate_upgrades_existing_database(con):
+    # A database.db created before migrations existed: tables but user_version 0
+    for sql in migrations.MIGRATIONS[0][2]:
+        con.execute(sql)
+    con.execute("INSERT INTO users (fullname, email, password) VALUES ('A', 'a@example.com', 'x')")
+
+    migrations.migrate(con)
+
+    assert con.execute("SELECT COUNT(*) FROM users").fetchone()[0] == 1
+    indexes = {row[0] for row in con.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert "idx_suggestions_status_created_at" in indexes
+    assert "idx_users_role_fullname" in indexes
+
+
+@pytest.mark.parametrize("query,params", HOT_QUERIES)
+def test_hot_queries_use_an_index(con, query, params):
+    migrations.migrate(con)
+    plan = " | ".join(row[3] for row in con.execute("EXPLAIN QUERY PLAN " + query, params))
+
+    assert "USING" in plan and "INDEX" in plan, plan
+    assert "TEMP B-TREE" not in plan, plan
+
+
+@pytest.mark.parametrize("query,params", KEYSET_QUERIES)
+def test_next_pages_seek_into_an_index(con, query, params):
+    migrations.migrate(con)
+    plan = " | ".join(row[3] for row in con.execute("EXPLAIN QUERY PLAN " + query, params))
+
+    assert "SEARCH" in plan and "INDEX" in plan, plan
+    assert "TEMP B-TREE" not in plan, plan
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Tests for bulk moderation (moderation.py, /bulk-update-suggestions)
+"""
+import pytest
+
+import app as webapp
+import moderation
+from conftest import login
+
+
+def _seed(rows):
+    # rows: [(sdg_category, status, created_at)]
+    with webapp.get_writer().transaction() as cur:
+        cur.executemany('''
+            INSERT INTO suggestions (user_id, fullname, email, sdg_category, title, description, status, created_at)
+            VALUES (1, 'A', 'a@example.com', ?, 't', 'd', ?, ?)
+        ''', rows)
+
+
+def _statuses(temp_app):
+    with temp_app.app_context():
+        return [row[0] for row in webapp.get_db().execute("SELECT status FROM suggestions ORDER BY id")]
+
+
+def _activities(temp_app):
+    webapp.get_activity_writer().flush()
+    with temp_app.app_context():
+        return [row[0] for row in webapp.get_db().execute("SELECT message FROM activities")]
+
+
+def test_parse_ids():
+    assert moderation.parse_ids(["1,2", "3", " 2 ,", ""]) == [1, 2, 3]
+    with pytest.raises(ValueError):
+        moderation.parse_ids(["1; DROP TABLE suggestions"])
+
+
+def test_selected_ids_update_in_one_go(client, temp_app):
+    _seed([("SDG 6", "pending", "2025-01-01 00:00:00")] * 5)
+    login(client)
+
+    response = client.post("/bulk-update-suggestions", data={"status": "approved", "ids": ["1,2", "4"]})
+
+    assert "3 suggestions approved" in response.headers["Location"].replace("%20", " ")
+    assert _statuses(temp_app) == ["approved", "approved", "pending", "approved", "pending"]
+    assert _activities(temp_app) == ["Admin Test Admin approved 3 suggestions (3 selected)"]
+
+
+def test_filter_selects_old_pending_in_category(client, temp_app):
+    _seed([
+        ("SDG 6", "pending", "2020-01-01 00:00:00"),
+        ("SDG 6", "approved", "2020-01-01 00:00:00"),
+        ("SDG 3", "pending", "2020-01-01 00:00:00"),
+        ("SDG 6", "pending", "2999-01-01 00:00:00"),
+    ])
+    login(client)
+
+    client.post("/bulk-update-suggestions", data={"status": "rejected", "filter_status": "pending",
+                                                  "sdg_category": "SDG 6", "older_than_days": "30"})
+
+    assert _statuses(temp_app) == ["rejected", "approved", "pending", "pending"]
+
+
+def test_rejects_empty_selection_and_non_admins(client, temp_app):
+    _seed([("SDG 6", "pending", "2025-01-01 00:00:00")])
+    login(client)
+    response = client.post("/bulk-update-suggestions", data={"status": "approved"})
+    assert "error" in response.headers["Location"]
+
+    login(client, role="user")
+    client.post("/bulk-update-suggestions", data={"status": "approved", "ids": "1"})
+    assert _statuses(temp_app) == ["pending"]
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Tests for password hashing (passwords.py) and the login upgrade of plaintext rows
+"""
+import threading
+import time
+
+import pytest
+
+import app as webapp
+import passwords
+
+
+def _stored_password(temp_app, email):
+    with temp_app.app_context():
+        return webapp.get_db().execute("SELECT password FROM users WHERE email = ?", (email,)).fetchone()[0]
+
+
+def test_hash_round_trip():
+    stored = passwords.hash_password("secret1")
+    assert stored.startswith("scrypt$") and "secret1" not in stored
+    assert stored != passwords.hash_password("secret1")  # salted
+    assert passwords.verify_password("secret1", stored) == (True, False)
+    assert passwords.verify_password("wrong!", stored) == (False, False)
+    assert passwords.verify_password("secret1", "scrypt$garbage") == (False, False)
+
+
+def test_plaintext_and_old_parameters_need_rehash():
+    assert passwords.verify_password("secret1", "secret1") == (True, True)
+    assert passwords.verify_password("secret1", "other") == (False, True)
+    weak = passwords.hash_password("secret1", n=2 ** 10)
+    assert passwords.verify_password("secret1", weak) == (True, True)
+
+
+def test_pool_hashes_in_worker_processes():
+    hasher = passwords.Hasher(workers=1)
+    try:
+        stored = hasher.hash("secret1")
+        assert hasher.verify("secret1", stored) == (True, False)
+        assert all(passwords.verify_password("p" * 6, h)[0] for h in hasher.hash_many(["p" * 6] * 3))
+        assert hasher.stats()["calls"] == 5
+    finally:
+        hasher.close()
+
+
+def test_full_hasher_refuses_instead_of_queueing_forever():
+    hasher = passwords.Hasher(workers=0, max_pending=1, timeout=0.01)
+    hasher._slots.acquire()  # one hash already in flight
+    with pytest.raises(passwords.HasherBusy):
+        hasher.hash("secret1")
+    assert hasher.stats()["busy"] == 1
+
+
+def test_a_late_result_is_busy_too():
+    hasher = passwords.Hasher(workers=1, timeout=0.001)  # less than starting the pool takes
+    try:
+        with pytest.raises(passwords.HasherBusy):
+            hasher.hash("secret1")
+        assert hasher._slots.acquire(blocking=False)  # the slot was given back
+    finally:
+        hasher.close()
+
+
+def test_login_runs_beside_a_bulk_hash():
+    hasher = passwords.Hasher(workers=1, timeout=2.0)
+    try:
+        stored = hasher.hash("secret1")
+        # ~50 ms a hash: the whole batch takes far longer than a login may wait
+        batch = threading.Thread(target=hasher.hash_many, args=(["p" * 6] * 50,))
+        batch.start()
+        time.sleep(0.2)
+        assert hasher.verify("secret1", stored) == (True, False)
+        assert batch.is_alive()
+        batch.join()
+        assert hasher.stats()["busy"] == 0
+    finally:
+        hasher.close()
+
+
+def test_login_upgrades_plaintext_rows(client, temp_app):
+    with webapp.get_writer().transaction() as cur:
+        cur.execute("INSERT INTO users (fullname, email, password) VALUES ('Old User', 'old@example.com', 'secret1')")
+
+    assert client.post("/login", data={"email": "old@example.com", "password": "nope"}).status_code == 200
+    assert _stored_password(temp_app, "old@example.com") == "secret1"
+
+    response = client.post("/login", data={"email": "old@example.com", "password": "secret1"})
+    assert response.status_code == 302
+    upgraded = _stored_password(temp_app, "old@example.com")
+    assert passwords.verify_password("secret1", upgraded) == (True, False)
+
+    client.get("/logout")
+    assert client.post("/login", data={"email": "old@example.com", "password": "secret1"}).status_code == 302
+    assert client.post("/login", data={"email": "nobody@example.com", "password": "secret1"}).status_code == 200
+
+
+def test_register_stores_a_hash(client, temp_app):
+    client.post("/register", data={"fullname": "New User", "email": "new@example.com",
+                                   "password": "secret1", "confirm_password": "secret1"})
+    assert passwords.is_hashed(_stored_password(temp_app, "new@example.com"))
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Tests for the sliding-window rate limits (ratelimit.py) and the 429s on /login,
+/register and /submit-suggestion
+"""
+import os
+
+import pytest
+
+import app as webapp
+import ratelimit
+from conftest import login
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.mark.parametrize("counters", [ratelimit.MemoryCounters, ratelimit.SharedCounters])
+def test_sliding_window(counters):
+    clock = Clock()
+    limiter = ratelimit.RateLimiter({"login_ip": (3, 10)}, counters(size=64), clock=clock)
+    assert [limiter.acquire("login_ip", "10.0.0.1") for _ in range(3)] == [0, 0, 0]
+    assert limiter.acquire("login_ip", "10.0.0.1") == 10
+    assert limiter.acquire("login_ip", "10.0.0.2") == 0  # keys don't share counts
+
+    # Next window: the previous one's 3 requests still weigh 3 * (1 - 2/10) = 2.4
+    clock.now = 1012.0
+    assert limiter.acquire("login_ip", "10.0.0.1") == 0
+    assert limiter.acquire("login_ip", "10.0.0.1") == 2  # 1 + 3 * (1 - 4/10) is under 3 at 1014
+    clock.now = 1014.0
+    assert limiter.acquire("login_ip", "10.0.0.1") == 0
+
+    assert limiter.stats()["refused"] == {"login_ip": 2}
+    assert limiter.acquire("unlimited", "10.0.0.1") == 0
+
+
+def test_check_and_add_count_failures_only():
+    limiter = ratelimit.RateLimiter({"login_account": (2, 60)}, ratelimit.MemoryCounters(), clock=Clock())
+    assert limiter.check("login_account", "ana@example.com") == 0
+    assert limiter.check("login_account", "ana@example.com") == 0
+    limiter.add("login_account", "ana@example.com")
+    limiter.add("login_account", "ana@example.com")
+    assert limiter.check("login_account", "ana@example.com") > 0
+
+
+def test_memory_counters_keep_the_most_recent_keys():
+    limiter = ratelimit.RateLimiter({"x": (1, 60)}, ratelimit.MemoryCounters(size=2), clock=Clock())
+    for key in ("a", "b", "c"):
+        limiter.acquire("x", key)
+    assert limiter.acquire("x", "a") == 0  # evicted, so it starts again
+    assert limiter.acquire("x", "c") > 0
+    assert limiter.stats()["evictions"] == 2
+
+
+def test_shared_counters_are_shared_with_forked_workers():
+    limiter = ratelimit.RateLimiter({"x": (3, 60)}, ratelimit.SharedCounters(size=64), clock=Clock())
+    pid = os.fork()
+    if pid == 0:
+        try:
+            limiter.acquire("x", "10.0.0.1")
+            limiter.acquire("x", "10.0.0.1")
+        finally:
+            os._exit(0)
+    os.waitpid(pid, 0)
+    assert limiter.acquire("x", "10.0.0.1") == 0
+    assert limiter.acquire("x", "10.0.0.1") > 0
+
+
+def test_login_is_limited_per_ip_and_per_account(client):
+    webapp.app.config["RATE_LIMITS"] = {"login_ip": (4, 60), "login_account": (2, 60)}
+    for _ in range(2):
+        assert client.post("/login", data={"email": "ana@example.com", "password": "wrong"}).status_code == 200
+    refused = client.post("/login", data={"email": "ana@example.com", "password": "wrong"})
+    assert refused.status_code == 429 and int(refused.headers["Retry-After"]) > 0
+
+    # Other accounts still get through, until the IP runs out too
+    assert client.post("/login", data={"email": "bo@example.com", "password": "wrong"}).status_code == 200
+    assert client.post("/login", data={"email": "bo@example.com", "password": "wrong"}).status_code == 429
+    assert webapp.get_limiter().stats()["refused"] == {"login_account": 1, "login_ip": 1}
+
+
+def test_register_and_submissions_are_limited(client):
+    webapp.app.config["RATE_LIMITS"] = {"register_ip": (1, 60), "submit_account": (1, 60)}
+    form = {"fullname": "Ana Cruz", "email": "ana@example.com", "password": "secret1", "confirm_password": "secret1"}
+    assert client.post("/register", data=form).status_code == 302
+    assert client.post("/register", data=dict(form, email="bo@example.com")).status_code == 429
+
+    login(client)
+    suggestion = {"email": "admin@example.com", "sdg_category": "SDG 4", "title": "Idea", "description": "Details"}
+    assert client.post("/submit-suggestion", data=suggestion).status_code == 302
+    refused = client.post("/submit-suggestion", data=suggestion)
+    assert refused.status_code == 429 and "Retry-After" in refused.headers
+    assert webapp.get_db().execute("SELECT COUNT(*) FROM suggestions").fetchone()[0] == 1
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Tests for activities retention and the archive (retention.py)
+"""
+import os
+
+import app as webapp
+import manage
+import pagination
+import retention
+import storage
+from conftest import login
+
+
+def _add_activities(rows):
+    with webapp.get_writer().transaction() as cur:
+        cur.executemany("INSERT INTO activities (user_id, message, created_at) VALUES (?, ?, ?)", rows)
+
+
+def _archiver(temp_app, batch_size=3):
+    temp_app.config.update(ACTIVITY_RETENTION_DAYS=30, ARCHIVE_BATCH_SIZE=batch_size)
+    return webapp.get_archiver()
+
+
+def test_old_rows_move_to_monthly_segments(temp_app):
+    _add_activities([(1, f"old {i}", f"2020-0{1 + i % 2}-1{i} 10:00:00") for i in range(5)]
+                    + [(2, "recent", retention.cutoff(1))])
+    archiver = _archiver(temp_app)
+
+    assert archiver.run() == 5
+    con = webapp.get_db()
+    assert [row[0] for row in con.execute("SELECT message FROM activities")] == ["recent"]
+    segments = con.execute("SELECT month, rows FROM activity_archive ORDER BY month").fetchall()
+    assert sorted({month for month, _ in segments}) == ["2020-01", "2020-02"]
+    assert sum(count for _, count in segments) == 5
+    for (path,) in con.execute("SELECT path FROM activity_archive"):
+        assert os.path.exists(os.path.join(webapp.get_archive_dir(), path))
+
+    # Nothing left to move: a second run is a no-op
+    assert archiver.run() == 0
+
+
+def test_history_merges_table_and_archive(temp_app):
+    _add_activities([(1 + i % 2, f"event {i}", f"2020-01-{10 + i} 10:00:00") for i in range(8)])
+    _archiver(temp_app).run()
+    _add_activities([(1, "event 8", retention.cutoff(0))])
+    con = webapp.get_db()
+
+    page, cursor = retention.history(con, webapp.get_archive_dir(), limit=4)
+    assert [row["message"] for row in page] == ["event 8", "event 7", "event 6", "event 5"]
+    assert [row["archived"] for row in page] == [False, True, True, True]
+
+    before = pagination.decode_cursor(cursor)[0]
+    page, cursor = retention.history(con, webapp.get_archive_dir(), limit=10, before=before, user_id=1)
+    assert [row["message"] for row in page] == ["event 4", "event 2", "event 0"]
+    assert cursor is None
+
+    page, _ = retention.history(con, webapp.get_archive_dir(), limit=10, since="2020-01-12", until="2020-01-14")
+    assert [row["message"] for row in page] == ["event 3", "event 2"]
+
+
+def test_history_page(temp_app, client, rendered):
+    _add_activities([(1, "archived one", "2020-01-01 00:00:00"), (1, "hot one", retention.cutoff(0))])
+    _archiver(temp_app).run()
+    login(client)
+
+    assert client.get("/activities/history").status_code == 200
+    name, context = rendered[-1]
+    assert name == "activity_history.html"
+    assert [row["message"] for row in context["activities"]] == ["hot one", "archived one"]
+
+
+def test_incremental_vacuum_returns_free_pages(temp_app):
+    con = storage.connect(temp_app.config["DATABASE"], isolation_level=None)
+    assert retention.enable_incremental_vacuum(con)
+    con.close()
+    _add_activities([(1, "x" * 2000, "2020-03-01 00:00:00")] * 200)
+
+    archiver = _archiver(temp_app, batch_size=500)
+    archiver.run()
+    assert archiver.stats()["vacuumed_pages"] > 0
+
+
+def test_manage_command(temp_app, capsys):
+    _add_activities([(1, "old", "2020-01-01 00:00:00")])
+    assert manage.main(["archive-activities", "--days", "30"]) == 0
+    assert "archived 1 activities" in capsys.readouterr().out
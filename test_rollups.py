@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Tests for the registration/suggestion rollups behind /statistics
+"""
+import sqlite3
+from datetime import date, timedelta
+
+import app as webapp
+import migrations
+import rollups
+from conftest import login
+
+TODAY = date(2025, 3, 31)
+
+
+def _add_user(cur, email, day):
+    cur.execute("INSERT INTO users (fullname, email, password, created_at) VALUES ('U', ?, 'x', ?)",
+                (email, f"{day.isoformat()} 12:00:00"))
+
+
+def test_triggers_keep_daily_counts(temp_app):
+    with webapp.get_writer().transaction() as cur:
+        _add_user(cur, "a@example.com", TODAY)
+        _add_user(cur, "b@example.com", TODAY)
+        _add_user(cur, "c@example.com", TODAY - timedelta(days=8))
+        cur.execute("DELETE FROM users WHERE email = 'b@example.com'")
+
+    with temp_app.app_context():
+        series = rollups.weekly_series(webapp.get_db(), "registrations", today=TODAY)
+    assert series == [0, 0, 0, 0, 1, 1]
+    assert rollups.growth_percent(series) == 0
+
+
+def test_history_is_backfilled_by_the_migration(tmp_path):
+    con = sqlite3.connect(str(tmp_path / "old.db"), isolation_level=None)
+    for sql in migrations.MIGRATIONS[0][2]:
+        con.execute(sql)
+    con.execute("PRAGMA user_version = 2")
+    con.execute("INSERT INTO suggestions (user_id, fullname, email, sdg_category, title, description, created_at) "
+                "VALUES (1, 'A', 'a@example.com', 'SDG 6', 't', 'd', ?)", (f"{TODAY} 08:00:00",))
+
+    migrations.migrate(con)
+    assert rollups.weekly_series(con, "suggestions", today=TODAY) == [0, 0, 0, 0, 0, 1]
+    con.close()
+
+
+def test_statistics_page_uses_real_data(client, rendered):
+    login(client)
+    client.post("/add-user", data={"fullname": "New Person", "email": "n@example.com",
+                                   "password": "secret1", "role": "user"})
+    client.get("/statistics")
+    _, context = rendered[-1]
+    assert context["week6_users"] == 1
+    assert sum(context[f"week{i}_users"] for i in range(1, 6)) == 0
+    assert context["user_growth"] == 100
+    assert context["db_size"] > 0
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Tests for full-text search over suggestions (FTS5 index, triggers, /suggestions/search)
+"""
+import app as webapp
+import search
+from conftest import login
+
+
+def _add(cur, title, description, status="pending", sdg="SDG 6: Clean Water"):
+    cur.execute('''
+        INSERT INTO suggestions (user_id, fullname, email, sdg_category, title, description, status)
+        VALUES (1, 'A', 'a@example.com', ?, ?, ?, ?)
+    ''', (sdg, title, description, status))
+    return cur.lastrowid
+
+
+def _ids(con, query, **filters):
+    return [row["id"] for row in search.search(con, query, **filters)[0]]
+
+
+def test_build_match_neutralises_operators():
+    assert search.build_match('water OR "drop" NEAR(') == '"water" "OR" "drop" "NEAR"'
+    assert search.build_match("purok12*") == '"purok12"*'
+    assert search.build_match(" !? ") is None
+
+
+def test_triggers_keep_index_in_step(temp_app):
+    with webapp.get_writer().transaction() as cur:
+        first = _add(cur, "Solar street lights", "Light the road to the school")
+        second = _add(cur, "Canal cleanup", "Clear the drainage canal before the rains")
+
+    with temp_app.app_context():
+        con = webapp.get_db()
+        assert _ids(con, "solar") == [first]
+        # Porter stemming: "light" finds "lights"
+        assert _ids(con, "light") == [first]
+
+        with webapp.get_writer().transaction() as cur:
+            cur.execute("UPDATE suggestions SET title = 'Flood control' WHERE id = ?", (second,))
+            cur.execute("DELETE FROM suggestions WHERE id = ?", (first,))
+        assert _ids(con, "solar") == []
+        assert _ids(con, "canal") == [second]
+        assert _ids(con, "flood") == [second]
+
+
+def test_title_matches_rank_first_and_filters_apply(temp_app):
+    with webapp.get_writer().transaction() as cur:
+        in_description = _add(cur, "Barangay library", "Books and a water dispenser", status="approved")
+        in_title = _add(cur, "Water refilling station", "For the market", status="approved")
+        pending = _add(cur, "Water for the clinic", "Tank", sdg="SDG 3: Good Health")
+
+    with temp_app.app_context():
+        con = webapp.get_db()
+        assert _ids(con, "water")[-1] == in_description
+        assert _ids(con, "water", status="approved") == [in_title, in_description]
+        assert _ids(con, "water", sdg_category="SDG 3: Good Health") == [pending]
+
+
+def test_snippets_escape_text_and_mark_matches(temp_app):
+    with webapp.get_writer().transaction() as cur:
+        _add(cur, "Drainage", "Fix <script>alert(1)</script> the drainage near the plaza")
+
+    with temp_app.app_context():
+        [row], _ = search.search(webapp.get_db(), "drainage")
+    assert "<mark>drainage</mark>" in row["snippet"]
+    assert "<script>" not in row["snippet"]
+
+
+def test_search_route_pages_through_results(client, rendered):
+    with webapp.get_writer().transaction() as cur:
+        expected = {_add(cur, f"Tree planting {i}", "Mangroves along the coast") for i in range(7)}
+        _add(cur, "Unrelated", "Nothing to see")
+    login(client)
+
+    seen, cursor = [], None
+    while True:
+        rendered.clear()
+        client.get("/suggestions/search?q=mangrove&limit=3" + (f"&cursor={cursor}" if cursor else ""))
+        _, context = rendered[-1]
+        assert context["search_query"] == "mangrove"
+        seen += [row["id"] for row in context["suggestions"]]
+        cursor = context["next_cursor"]
+        if not cursor:
+            break
+    assert sorted(seen) == sorted(expected)
+
+
+def test_search_requires_login(client):
+    assert client.get("/suggestions/search?q=water").status_code == 302
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Tests for the production server (server.py): draining workers, and the master's
+reload and shutdown through signals
+"""
+import os
+import re
+import signal
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+
+import pytest
+
+import migrations
+import server
+
+
+def test_drain_waits_for_requests_in_flight():
+    started = threading.Event()
+
+    def slow_app(environ, start_response):
+        started.set()
+        time.sleep(0.3)
+        start_response("200 OK", [("Content-Type", "text/plain")])
+        return [b"done"]
+
+    sock = server.listen("127.0.0.1", 0)
+    worker = server.WorkerServer(sock, slow_app, threads=2)
+    threading.Thread(target=worker.serve_forever, daemon=True).start()
+    responses = []
+    client = threading.Thread(target=lambda: responses.append(
+        urllib.request.urlopen(f"http://127.0.0.1:{sock.getsockname()[1]}/").read()))
+    client.start()
+
+    assert started.wait(5)
+    worker.shutdown()  # stops accepting; the slow request is still running
+    assert worker.drain(5)
+    client.join()
+    assert responses == [b"done"]
+    sock.close()
+
+
+def _wait_for(stream, pattern):
+    for line in stream:
+        match = re.search(pattern, line)
+        if match:
+            return match
+
+
+@pytest.mark.parametrize("mode", [[], ["--async"]], ids=["threaded", "asyncio"])
+def test_master_reloads_and_drains(tmp_path, mode):
+    path = str(tmp_path / "serve.db")
+    master = subprocess.Popen([sys.executable, "manage.py", "serve", "--port", "0", "--workers", "2", *mode],
+                              cwd=os.path.dirname(os.path.abspath(__file__)), stderr=subprocess.PIPE, text=True,
+                              env=dict(os.environ, DATABASE=path))
+    try:
+        base = _wait_for(master.stderr, r"listening on (http://\S+)").group(1)
+        # The master migrated before forking
+        con = sqlite3.connect(path)
+        assert migrations.current_version(con) == migrations.latest_version()
+        con.close()
+        assert urllib.request.urlopen(base + "/metrics").status == 200
+
+        master.send_signal(signal.SIGHUP)
+        assert _wait_for(master.stderr, "reloaded")
+        assert urllib.request.urlopen(base + "/metrics").status == 200
+
+        master.send_signal(signal.SIGTERM)
+        assert master.wait(timeout=30) == 0
+    finally:
+        if master.poll() is None:
+            master.kill()
+            master.wait()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Tests for server-side sessions (sessions.py): the cookie carries only an id, and
+user changes reach sessions that are already open
+"""
+import app as webapp
+import passwords
+from conftest import login
+
+
+def _user(email="citizen@example.com", role="user"):
+    with webapp.get_writer().transaction() as cur:
+        cur.execute("INSERT INTO users (fullname, email, password, role) VALUES ('Juan Cruz', ?, ?, ?)",
+                    (email, passwords.hash_password("secret1"), role))
+        return cur.lastrowid
+
+
+def _session_rows(temp_app):
+    with temp_app.app_context():
+        return webapp.get_db().execute("SELECT id, user_id, data FROM sessions").fetchall()
+
+
+def test_cookie_holds_only_an_id(temp_app):
+    user_id = _user()
+    client = temp_app.test_client()
+    client.post("/login", data={"email": "citizen@example.com", "password": "secret1"})
+
+    sid = client.get_cookie("session").value
+    [row] = _session_rows(temp_app)
+    assert "citizen@example.com" not in sid
+    assert row["user_id"] == user_id and row["id"] != sid  # only a hash of it is stored
+
+
+def test_login_rotates_the_session_id(temp_app):
+    _user()
+    client = temp_app.test_client()
+    with client.session_transaction() as sess:
+        sess["theme"] = "dark"  # an anonymous session that already has an id
+    planted = client.get_cookie("session").value
+
+    client.post("/login", data={"email": "citizen@example.com", "password": "secret1"})
+
+    assert client.get_cookie("session").value != planted
+    assert len(_session_rows(temp_app)) == 1
+
+
+def test_role_change_applies_to_open_sessions(temp_app, client):
+    user_id = _user()
+    client.post("/login", data={"email": "citizen@example.com", "password": "secret1"})
+    assert client.get("/manage").status_code == 302
+
+    admin = temp_app.test_client()
+    login(admin, user_id=999)
+    admin.post(f"/update-user/{user_id}", data={"fullname": "Juan Cruz", "email": "citizen@example.com",
+                                                "role": "admin"})
+    assert client.get("/manage").status_code == 200
+
+    admin.post(f"/delete-user/{user_id}")
+    assert client.get("/manage").status_code == 302
+    assert [row["user_id"] for row in _session_rows(temp_app)] == [999]
+
+
+def test_hot_path_is_served_from_memory(client):
+    _user()
+    client.post("/login", data={"email": "citizen@example.com", "password": "secret1"})
+    before = webapp.get_sessions().stats()
+    for _ in range(5):
+        client.get("/dashboard")
+    after = webapp.get_sessions().stats()
+    assert after["hits"] - before["hits"] == 5
+    assert after["misses"] == before["misses"]
+
+
+def test_logout_deletes_the_session(temp_app):
+    _user()
+    client = temp_app.test_client()
+    client.post("/login", data={"email": "citizen@example.com", "password": "secret1"})
+    client.get("/logout")
+    assert _session_rows(temp_app) == []
+
+
+def test_lru_is_bounded_and_expired_sessions_are_swept(temp_app):
+    store = webapp.get_sessions()
+    store.cache_size = 2
+    for i in range(4):
+        store.save(f"sid-{i}", {"user_id": i})
+    assert store.stats()["cached"] == 2 and store.stats()["evictions"] == 2
+    assert store.load("sid-0")[0] == {"user_id": 0}  # evicted from memory, still in SQLite
+
+    store.lifetime = -1  # already expired when saved
+    store.save("sid-1", {"user_id": 1})
+    assert store.load("sid-1") is None
+    assert store.sweep(force=True) == 1
+    assert len(_session_rows(temp_app)) == 3
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Tests for the pooled SQLite connection layer (storage.py)
+"""
+import sqlite3
+import threading
+
+import pytest
+
+import storage
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = storage.ConnectionPool(str(tmp_path / "pool.db"), size=2, timeout=0.2,
+                                  pragmas=storage.DEFAULT_PRAGMAS)
+    yield pool
+    pool.close()
+
+
+def test_connections_are_reused(pool):
+    first = pool.acquire()
+    pool.release(first)
+    second = pool.acquire()
+    pool.release(second)
+
+    assert first is second
+    stats = pool.stats()
+    assert stats["open"] == 1
+    assert stats["acquired"] == 2
+    assert stats["in_use"] == 0
+
+
+def test_pragmas_applied_once_per_connection(pool):
+    con = pool.acquire()
+    assert con.execute("PRAGMA temp_store").fetchone()[0] == 2  # MEMORY
+    assert con.execute("PRAGMA cache_size").fetchone()[0] == -8000
+    pool.release(con)
+
+
+def test_release_rolls_back_open_transaction(pool):
+    con = pool.acquire()
+    con.execute("CREATE TABLE t (x INTEGER)")
+    con.commit()
+    con.execute("INSERT INTO t VALUES (1)")
+    assert con.in_transaction
+    pool.release(con)
+
+    con = pool.acquire()
+    assert not con.in_transaction
+    assert con.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 0
+    pool.release(con)
+
+
+def test_exhausted_pool_waits_and_records_metrics(pool):
+    a = pool.acquire()
+    b = pool.acquire()
+
+    # Give one back shortly so the third caller waits, then succeeds
+    timer = threading.Timer(0.05, pool.release, args=(a,))
+    timer.start()
+    c = pool.acquire()
+    timer.join()
+
+    assert c is a
+    stats = pool.stats()
+    assert stats["waits"] == 1
+    assert stats["max_wait"] > 0
+    pool.release(b)
+    pool.release(c)
+
+
+def test_exhausted_pool_times_out(pool):
+    a = pool.acquire()
+    b = pool.acquire()
+    with pytest.raises(storage.PoolTimeout):
+        pool.acquire()
+    assert pool.stats()["timeouts"] == 1
+    pool.release(a)
+    pool.release(b)
+
+
+def test_writer_retries_while_another_process_holds_the_lock(tmp_path):
+    path = str(tmp_path / "writer.db")
+    pragmas = dict(storage.WAL_PRAGMAS, busy_timeout=0)  # fail fast so the retry loop does the waiting
+    writer = storage.SerializedWriter(path, pragmas=pragmas, retries=8, backoff=0.01)
+    with writer.transaction() as cur:
+        cur.execute("CREATE TABLE t (x INTEGER)")
+
+    other = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+    other.execute("BEGIN IMMEDIATE")
+    threading.Timer(0.05, other.execute, args=("COMMIT",)).start()
+
+    with writer.transaction() as cur:
+        cur.execute("INSERT INTO t VALUES (1)")
+
+    assert writer.stats()["retried"] > 0
+    assert other.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 1
+    other.close()
+    writer.close()
+
+
+def test_writer_rolls_back_on_error(tmp_path):
+    writer = storage.SerializedWriter(str(tmp_path / "writer.db"))
+    with writer.transaction() as cur:
+        cur.execute("CREATE TABLE t (x INTEGER UNIQUE)")
+        cur.execute("INSERT INTO t VALUES (1)")
+
+    with pytest.raises(sqlite3.IntegrityError):
+        with writer.transaction() as cur:
+            cur.execute("INSERT INTO t VALUES (2)")
+            cur.execute("INSERT INTO t VALUES (1)")
+
+    with writer.transaction() as cur:
+        assert cur.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 1
+    assert writer.stats()["failures"] == 1
+    writer.close()
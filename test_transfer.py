@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Tests for bulk import/export (transfer.py, /import/<table>, /export/<table>, manage.py)
+"""
+import io
+import json
+
+import app as webapp
+import manage
+import transfer
+from conftest import login
+
+USERS_CSV = (
+    "fullname,email,password,role\n"
+    "Ana Cruz,ana@example.com,secret1,user\n"
+    "Ben Reyes,ben@example.com,secret2,moderator\n"
+    "Ana Again,ana@example.com,secret3,user\n"
+    "Short Pass,short@example.com,123,user\n"
+)
+
+
+def test_import_reports_bad_rows_and_keeps_the_rest(client, temp_app):
+    login(client)
+    response = client.post("/import/users", data={"file": (io.BytesIO(USERS_CSV.encode()), "users.csv")},
+                           content_type="multipart/form-data")
+
+    report = response.get_json()
+    assert report["imported"] == 2
+    assert report["errors"] == [{"line": 4, "error": "email already exists"},
+                                {"line": 5, "error": "password must be at least 6 characters"}]
+    with temp_app.app_context():
+        assert webapp.get_db().execute("SELECT COUNT(*) FROM users").fetchone()[0] == 2
+
+
+def test_jsonl_suggestions_import_is_searchable_and_deduplicated(client, temp_app):
+    rows = [{"user_id": 1, "fullname": "A", "email": "a@example.com", "sdg_category": "SDG 6",
+             "title": "Water refilling station", "description": "A refilling station at the barangay hall"}] * 2
+    body = "\n".join(json.dumps(row) for row in rows) + "\nnot json\n"
+    login(client)
+
+    report = client.post("/import/suggestions?format=jsonl", data=body).get_json()
+
+    assert report["imported"] == 2 and report["failed"] == 1
+    with temp_app.app_context():
+        con = webapp.get_db()
+        assert con.execute("SELECT duplicate_of FROM suggestions ORDER BY id").fetchall()[1][0] == 1
+        assert con.execute("SELECT COUNT(*) FROM suggestions_fts WHERE suggestions_fts MATCH 'refilling'").fetchone()[0] == 2
+
+
+def test_export_streams_in_chunks_without_passwords(client, temp_app):
+    with webapp.get_writer().transaction() as cur:
+        cur.executemany("INSERT INTO users (fullname, email, password) VALUES (?, ?, 'hunter22')",
+                        [(f"User {i}", f"u{i}@example.com") for i in range(25)])
+    temp_app.config["EXPORT_CHUNK_ROWS"] = 10
+    login(client)
+
+    response = client.get("/export/users?format=jsonl")
+    chunks = list(response.response)
+    records = [json.loads(line) for line in b"".join(chunks).splitlines()]
+
+    assert len(chunks) == 3
+    assert len(records) == 25 and "password" not in records[0]
+    assert client.get("/export/sqlite_sequence").status_code == 404
+    assert client.get("/export/suggestions_fts_data").status_code == 404
+
+
+def test_import_and_export_need_admin(client):
+    login(client, role="user")
+    assert client.get("/export/users").status_code == 302
+    assert client.post("/import/users", data=USERS_CSV).status_code == 302
+
+
+def test_cli_round_trip(temp_app, tmp_path, capsys):
+    source = tmp_path / "users.csv"
+    source.write_text(USERS_CSV)
+    target = tmp_path / "out.csv"
+
+    assert manage.main(["import", "users", str(source)]) == 1  # some rows were rejected
+    manage.main(["export", "users", "-o", str(target)])
+
+    exported = list(transfer.read_records(target.open(newline=""), "csv"))
+    assert [record["email"] for _, record, _ in exported] == ["ana@example.com", "ben@example.com"]
+
+
+def test_a_paused_export_does_not_block_writes(client, file_app):
+    # A file database in the default (rollback journal) mode, where an open read blocks every commit
+    with webapp.get_writer().transaction() as cur:
+        cur.executemany("INSERT INTO activities (user_id, message) VALUES (1, ?)", [(f"event {i}",) for i in range(30)])
+    file_app.config["EXPORT_CHUNK_ROWS"] = 10
+    login(client)
+
+    chunks = iter(client.get("/export/activities?format=jsonl").response)
+    received = [next(chunks), next(chunks)]  # a client that stopped reading
+    with webapp.get_writer().transaction() as cur:
+        cur.execute("INSERT INTO activities (user_id, message) VALUES (1, 'written during the export')")
+    received += list(chunks)
+
+    messages = [json.loads(line)["message"] for line in b"".join(received).splitlines()]
+    assert messages[:30] == [f"event {i}" for i in range(30)]
+    assert messages[30:] == ["written during the export"]  # past the last key: no snapshot, no duplicates
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Tests for per-table data versions, ETags and the rendered-page cache (versions.py)
+"""
+import app as webapp
+import counters
+import storage
+from conftest import login
+
+
+def _insert_suggestion():
+    with webapp.get_writer().transaction() as cur:
+        cur.execute("INSERT INTO suggestions (user_id, fullname, email, sdg_category, title, description) "
+                    "VALUES (1, 'A', 'a@example.com', 'SDG 6', 'Water pump', 'Fix the pump')")
+
+
+def test_writes_bump_only_their_table(temp_app):
+    before = dict(webapp.get_versions().current())
+    _insert_suggestion()
+    after = webapp.get_versions().current()
+    # Our own writer invalidates, so no waiting for the check interval
+    assert after["suggestions"] > before["suggestions"]
+    assert after["users"] == before["users"] and after["activities"] == before["activities"]
+
+
+def test_other_processes_writes_are_seen_after_the_interval(temp_app):
+    temp_app.config["DATA_VERSION_CHECK_INTERVAL"] = 0
+    data_versions = webapp.get_versions()
+    before = data_versions.current()["users"]
+
+    other = storage.connect(temp_app.config["DATABASE"])
+    other.execute("INSERT INTO users (fullname, email, password) VALUES ('B', 'b@example.com', 'x')")
+    other.commit()
+    other.close()
+    assert data_versions.current()["users"] == before + 1
+
+    # Nothing committed since: only PRAGMA data_version, not the table, is read
+    reloads = data_versions.stats()["reloads"]
+    data_versions.current()
+    assert data_versions.stats()["reloads"] == reloads
+
+
+def test_matching_etag_gets_304_without_rendering(client, rendered):
+    login(client)
+    first = client.get("/manage")
+    assert first.status_code == 200 and first.headers["ETag"]
+    renders = len(rendered)
+
+    again = client.get("/manage", headers={"If-None-Match": first.headers["ETag"]})
+    assert again.status_code == 304
+    assert again.headers["ETag"] == first.headers["ETag"]
+    # No If-None-Match: the page rendered earlier is sent again
+    assert client.get("/manage").get_data() == first.get_data()
+    assert len(rendered) == renders
+
+
+def test_statistics_are_always_rendered(client, rendered):
+    # Its database size and "last updated" time change without any table version moving
+    login(client)
+    assert "ETag" not in client.get("/statistics").headers
+    client.get("/statistics")
+    assert len(rendered) == 2
+
+
+def test_etag_follows_the_tables_a_page_shows(client):
+    login(client)
+    suggestions = client.get("/suggestions").headers["ETag"]
+    dashboard = client.get("/dashboard").headers["ETag"]
+
+    _insert_suggestion()
+    assert client.get("/suggestions").headers["ETag"] != suggestions
+    assert client.get("/dashboard").headers["ETag"] == dashboard
+
+
+def test_etag_depends_on_viewer_and_query(client):
+    login(client)
+    admin = client.get("/suggestions").headers["ETag"]
+    assert client.get("/suggestions?status=pending").headers["ETag"] != admin
+    login(client, user_id=2, role="user", fullname="Other Person")
+    assert client.get("/suggestions").headers["ETag"] != admin
+
+
+def test_error_pages_are_not_cached(client):
+    login(client)
+    response = client.get("/suggestions?cursor=not-a-cursor")
+    assert response.status_code == 200 and "ETag" not in response.headers
+
+
+def test_counts_follow_the_data_version(temp_app):
+    cache = counters.CounterCache(ttl=3600)
+    with temp_app.app_context():
+        con = webapp.get_db()
+        assert cache.get(con, "statuses", version=1) == {}
+        _insert_suggestion()
+        assert cache.get(con, "statuses", version=1) == {}  # same version: cached
+        assert cache.get(con, "statuses", version=2) == {"pending": 1}
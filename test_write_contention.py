@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Stress test: several worker processes, each with several threads, logging
+activities into one WAL database at the same time. Every row must land.
+"""
+import multiprocessing
+import sqlite3
+import threading
+
+import pytest
+
+import app as webapp
+
+PROCESSES = 4
+THREADS = 4
+ROWS_PER_THREAD = 50
+
+
+@pytest.fixture
+def wal_app(file_app):
+    file_app.config.update(STORAGE_MODE="wal")
+    return file_app
+
+
+def _worker(path, worker_id):
+    # Spawned fresh, so the worker opens its own writer like a real deployment would
+    webapp.app.config.update(DATABASE=path, STORAGE_MODE="wal")
+
+    def write_rows(thread_id):
+        for i in range(ROWS_PER_THREAD):
+            webapp.log_activity(worker_id, f"worker {worker_id} thread {thread_id} row {i}")
+
+    threads = [threading.Thread(target=write_rows, args=(t,)) for t in range(THREADS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    # multiprocessing children skip atexit handlers, so write the queue out explicitly
+    webapp.get_activity_writer().close()
+
+
+def _reader(path, stop):
+    con = sqlite3.connect(path)
+    while not stop.is_set():
+        con.execute("SELECT COUNT(*) FROM activities").fetchone()
+    con.close()
+
+
+def test_no_activity_rows_lost_under_concurrent_writers(wal_app):
+    path = wal_app.config["DATABASE"]
+
+    # spawn, not fork: a forked child could inherit SQLite/thread locks held mid-operation
+    ctx = multiprocessing.get_context("spawn")
+    workers = [ctx.Process(target=_worker, args=(path, w)) for w in range(PROCESSES)]
+    for w in workers:
+        w.start()
+
+    # A reader hammering the table the whole time must not stall the writers
+    stop = threading.Event()
+    reader = threading.Thread(target=_reader, args=(path, stop))
+    reader.start()
+
+    try:
+        for w in workers:
+            w.join(timeout=120)
+    finally:
+        stop.set()
+        reader.join()
+        for w in workers:
+            if w.is_alive():
+                w.terminate()
+                w.join()
+
+    assert all(w.exitcode == 0 for w in workers)
+
+    con = sqlite3.connect(path)
+    assert con.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    total = con.execute("SELECT COUNT(*) FROM activities").fetchone()[0]
+    per_worker = dict(con.execute("SELECT user_id, COUNT(*) FROM activities GROUP BY user_id").fetchall())
+    con.close()
+
+    assert total == PROCESSES * THREADS * ROWS_PER_THREAD
+    assert per_worker == {w: THREADS * ROWS_PER_THREAD for w in range(PROCESSES)}
@@ -0,0 +1,253 @@
+"""
+Bulk import (CSV/JSONL, chunked transactions, per-row errors) and streamed
+export of whole tables. Both sides work a chunk at a time, so memory use does
+not grow with the file or the table.
+"""
+import csv
+import io
+import json
+import sqlite3
+
+import duplicates
+import moderation
+import passwords
+
+FORMATS = ("csv", "jsonl")
+ROLES = ("user", "moderator", "admin")
+MAX_REPORTED_ERRORS = 1000
+
+# Never leaves the database, whatever the caller asks for
+EXCLUDED_COLUMNS = {"users": {"password"}}
+
+
+def guess_format(filename, default="csv"):
+    for fmt in FORMATS:
+        if (filename or "").lower().endswith("." + fmt):
+            return fmt
+    return default
+
+
+def read_records(stream, fmt):
+    """
+    Yields (line, record, error) from a text stream; record is a dict, or None with
+    an error message when the line can't be parsed.
+    """
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        try:
+            for record in reader:
+                yield reader.line_num, record, None
+        except csv.Error as e:
+            # The reader can't resynchronise after this, so it ends the import
+            yield reader.line_num, None, f"malformed CSV: {e}"
+    elif fmt == "jsonl":
+        for line, text in enumerate(stream, 1):
+            if not text.strip():
+                continue
+            try:
+                record = json.loads(text)
+            except ValueError as e:
+                yield line, None, f"invalid JSON: {e}"
+                continue
+            if isinstance(record, dict):
+                yield line, record, None
+            else:
+                yield line, None, "expected a JSON object"
+    else:
+        raise ValueError(f"unsupported format: {fmt}")
+
+
+def _text(record, field, required=True):
+    value = record.get(field)
+    value = "" if value is None else str(value).strip()
+    if required and not value:
+        raise ValueError(f"{field} is required")
+    return value
+
+
+def _user(record):
+    password = _text(record, "password")
+    if len(password) < 6:
+        raise ValueError("password must be at least 6 characters")
+    role = _text(record, "role", required=False) or "user"
+    if role not in ROLES:
+        raise ValueError(f"unknown role: {role}")
+    return (_text(record, "fullname"), _text(record, "email"), password, role)
+
+
+def _suggestion(record):
+    user_id = _text(record, "user_id")
+    if not user_id.isdigit():
+        raise ValueError("user_id must be a number")
+    status = _text(record, "status", required=False) or "pending"
+    if status not in moderation.STATUSES:
+        raise ValueError(f"unknown status: {status}")
+    title, description = _text(record, "title"), _text(record, "description")
+    return (int(user_id), _text(record, "fullname"), _text(record, "email"), _text(record, "sdg_category"),
+            title, description, status)
+
+
+IMPORTS = {
+    "users": (_user, "INSERT INTO users (fullname, email, password, role) VALUES (?, ?, ?, ?)"),
+    "suggestions": (_suggestion, '''
+        INSERT INTO suggestions (user_id, fullname, email, sdg_category, title, description, status)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    '''),
+}
+
+
+class ImportReport:
+
+    def __init__(self, table):
+        self.table = table
+        self.imported = 0
+        self.failed = 0
+        self.errors = []  # [(line, message)], the first MAX_REPORTED_ERRORS only
+
+    def error(self, line, message):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, message))
+
+    def as_dict(self):
+        return {
+            "table": self.table,
+            "imported": self.imported,
+            "failed": self.failed,
+            "errors": [{"line": line, "error": message} for line, message in sorted(self.errors)],
+            "errors_truncated": self.failed > len(self.errors),
+        }
+
+
+def import_records(writer, table, records, chunk_size=1000, duplicate_threshold=0.5, hasher=None):
+    """
+    Insert `records` (from read_records) into `table`, one transaction per chunk. Bad
+    rows (validation, duplicate email, ...) are reported and skipped; the rest land.
+    Plain passwords are hashed with `hasher` (a passwords.Hasher); values that are
+    already scrypt hashes, e.g. from another install's export, are stored as they are.
+    """
+    if table not in IMPORTS:
+        raise ValueError(f"cannot import into {table}")
+    validate, insert = IMPORTS[table]
+    report = ImportReport(table)
+    hasher = hasher or passwords.Hasher(workers=0)
+
+    chunk = []
+    for line, record, error in records:
+        if error:
+            report.error(line, error)
+            continue
+        try:
+            row = validate(record)
+        except ValueError as e:
+            report.error(line, str(e))
+            continue
+        # Signatures are pure CPU: compute them before the chunk takes the write lock
+        sig = duplicates.signature(f"{row[4]} {row[5]}") if table == "suggestions" else None
+        chunk.append((line, row, sig))
+        if len(chunk) >= chunk_size:
+            _write_chunk(writer, insert, _hashed(table, chunk, hasher), report, duplicate_threshold)
+            chunk = []
+    if chunk:
+        _write_chunk(writer, insert, _hashed(table, chunk, hasher), report, duplicate_threshold)
+    return report
+
+
+def _hashed(table, chunk, hasher):
+    # The whole chunk goes to the hasher's workers at once, outside the write lock
+    if table != "users":
+        return chunk
+    plain = [i for i, (_, row, _) in enumerate(chunk) if not passwords.is_hashed(row[2])]
+    hashes = hasher.hash_many([chunk[i][1][2] for i in plain])
+    for i, password_hash in zip(plain, hashes):
+        line, row, sig = chunk[i]
+        chunk[i] = (line, (row[0], row[1], password_hash, row[3]), sig)
+    return chunk
+
+
+def _write_chunk(writer, insert, chunk, report, duplicate_threshold):
+    with writer.transaction() as cur:
+        for line, row, sig in chunk:
+            try:
+                cur.execute(insert, row)
+            except sqlite3.IntegrityError as e:
+                # Only this statement is undone; the chunk's transaction carries on
+                report.error(line, "email already exists" if "users.email" in str(e) else str(e))
+                continue
+            if sig is not None:
+                duplicates.check_and_index(cur.connection, cur.lastrowid, row[4], row[5],
+                                           duplicate_threshold, sig)
+            report.imported += 1
+
+
+def exportable_tables(con):
+    rows = con.execute("SELECT name, sql FROM sqlite_schema WHERE type = 'table' ORDER BY name").fetchall()
+    virtual = [name for name, sql in rows if sql and sql.upper().startswith("CREATE VIRTUAL")]
+    # Leave out SQLite's own tables and the shadow tables behind the FTS index
+    return [name for name, _ in rows
+            if not name.startswith("sqlite_") and name not in virtual
+            and not any(name.startswith(v + "_") for v in virtual)]
+
+
+def export_columns(con, table):
+    if table not in exportable_tables(con):
+        raise ValueError(f"cannot export {table}")
+    hidden = EXCLUDED_COLUMNS.get(table, set())
+    return [row[1] for row in con.execute(f'PRAGMA table_info("{table}")') if row[1] not in hidden]
+
+
+def _cell(value):
+    return value.hex() if isinstance(value, bytes) else value
+
+
+def _export_key(con, table):
+    # What the table is stored in order of: the rowid, or a WITHOUT ROWID table's primary key
+    sql = con.execute("SELECT sql FROM sqlite_schema WHERE type = 'table' AND name = ?", (table,)).fetchone()[0]
+    if "WITHOUT ROWID" not in sql.upper():
+        return ["rowid"]
+    return [row[1] for row in sorted(con.execute(f'PRAGMA table_info("{table}")'), key=lambda row: row[5])
+            if row[5]]
+
+
+def export_rows(connect, table, fmt, chunk_rows=1000):
+    """
+    Yields the table as text chunks of about `chunk_rows` rows. `connect()` is a context
+    manager giving a connection, held only while a chunk is read: each chunk is a short
+    query resuming after the last key seen, so no read transaction stays open while the
+    caller sends a chunk (under a rollback journal, that read lock would block every
+    commit until a slow client caught up). So there is no single snapshot: rows written
+    meanwhile may or may not be included, but none is exported twice.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"unsupported format: {fmt}")
+    with connect() as con:
+        columns = export_columns(con, table)
+        key = _export_key(con, table)
+    keys = ", ".join(f'"{column}"' for column in key)
+    quoted = ", ".join(f'"{column}"' for column in columns)
+    # In storage order, so each chunk is an index seek and there is no sort
+    first = f'SELECT {keys}, {quoted} FROM "{table}" ORDER BY {keys} LIMIT ?'
+    after = f'SELECT {keys}, {quoted} FROM "{table}" WHERE ({keys}) > ({", ".join("?" * len(key))}) ' \
+            f'ORDER BY {keys} LIMIT ?'
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if fmt == "csv" else None
+    if writer:
+        writer.writerow(columns)
+    last = None
+    while True:
+        with connect() as con:
+            rows = con.execute(first if last is None else after, (*(last or ()), chunk_rows)).fetchall()
+        if not rows:
+            break
+        last = rows[-1][:len(key)]
+        for row in (row[len(key):] for row in rows):
+            if writer:
+                writer.writerow([_cell(value) for value in row])
+            else:
+                buffer.write(json.dumps(dict(zip(columns, map(_cell, row))), ensure_ascii=False) + "\n")
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
@@ -0,0 +1,112 @@
+"""
+Per-table data versions and the rendered-page cache built on them. Triggers
+bump data_versions.version on every insert, update and delete, so "has anything
+this page shows changed?" is answered without reading the page's rows.
+"""
+import collections
+import hashlib
+import threading
+import time
+
+# Tables with a version counter; the triggers are created by migration 8
+TABLES = ("users", "suggestions", "activities")
+
+
+class DataVersions:
+    """
+    The current version of every table, from a connection of its own. PRAGMA
+    data_version tells us whether any connection (this process's writer, another
+    worker) committed since we last looked; only then is data_versions re-read.
+    Between checks, at most one per `check_interval`, no query at all: our own
+    writer calls invalidate() after each commit, so this process sees its own
+    writes at once and other processes' within `check_interval`.
+    """
+
+    def __init__(self, connect, check_interval=0.5):
+        self.connect = connect  # opens a new autocommit connection
+        self.check_interval = check_interval
+
+        self._lock = threading.Lock()
+        self._con = None
+        self._versions = None
+        self._data_version = None
+        self._checked = 0.0
+        self._stale = True
+
+        self.hits = 0
+        self.checks = 0
+        self.reloads = 0
+
+    def current(self):
+        """{table: version}. Don't modify the returned dict."""
+        with self._lock:
+            now = time.monotonic()
+            if not self._stale and now - self._checked < self.check_interval:
+                self.hits += 1
+                return self._versions
+            if self._con is None:
+                self._con = self.connect()
+            data_version = self._con.execute("PRAGMA data_version").fetchone()[0]
+            self._checked = now
+            self.checks += 1
+            if self._stale or data_version != self._data_version:
+                self._stale = False
+                self._data_version = data_version
+                self._versions = dict(self._con.execute("SELECT name, version FROM data_versions").fetchall())
+                self.reloads += 1
+            return self._versions
+
+    def invalidate(self):
+        # Called after a commit in this process
+        self._stale = True
+
+    def close(self):
+        with self._lock:
+            if self._con is not None:
+                self._con.close()
+                self._con = None
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "checks": self.checks, "reloads": self.reloads}
+
+
+def etag(*parts):
+    return hashlib.blake2b(repr(parts).encode(), digest_size=12).hexdigest()
+
+
+class PageCache:
+    """LRU of rendered pages: key -> (etag, body, mimetype). An entry is used only while its etag still matches."""
+
+    def __init__(self, size=256):
+        self.size = size
+        self._lock = threading.Lock()
+        self._pages = collections.OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, tag):
+        with self._lock:
+            page = self._pages.get(key)
+            if page is None or page[0] != tag:
+                self.misses += 1
+                return None
+            self._pages.move_to_end(key)
+            self.hits += 1
+            return page
+
+    def put(self, key, tag, body, mimetype):
+        with self._lock:
+            self._pages[key] = (tag, body, mimetype)
+            self._pages.move_to_end(key)
+            while len(self._pages) > self.size:
+                self._pages.popitem(last=False)
+
+    def close(self):
+        with self._lock:
+            self._pages.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"pages": len(self._pages), "hits": self.hits, "misses": self.misses}